@@ -6,6 +6,7 @@ from chrismas_songs import ALL_SONGS
 from interactive.animation import Flicker
 from interactive.button import ButtonController
 from interactive.environment import are_pins_available
+from interactive.frame import FrameClock
 from interactive.led import Led
 from interactive.log import set_log_level, INFO
 from interactive.melody import Melody, decode_melody, MelodySequence
@@ -93,17 +94,12 @@ if __name__ == '__main__':
     yellow_animation = AnimationSequence(*yellow_animations, advance_interval=3)
 
 
-    async def animate_leds() -> None:
-        if not runner.cancel and ANIMATE_LEDS:
-            if red_animation:
-                red_animation.animate()
-            if green_animation:
-                green_animation.animate()
-            if yellow_animation:
-                yellow_animation.animate()
-
-
-    runner.add_loop_task(animate_leds)
+    # Step every animation on a common frame so the LEDs and pixels stay smooth.
+    frame_clock = FrameClock()
+    if ANIMATE_LEDS:
+        frame_clock.add_animation(red_animation)
+        frame_clock.add_animation(green_animation)
+        frame_clock.add_animation(yellow_animation)
 
     pixels = new_pixels(PIXELS_PIN, 8, brightness=PIXELS_BRIGHTNESS)
     animations = [
@@ -121,14 +117,10 @@ if __name__ == '__main__':
     ]
     animation = AnimationSequence(*animations, advance_interval=5)
 
+    if ANIMATE_PIXELS:
+        frame_clock.add_animation(animation)
 
-    async def animate_pixels() -> None:
-        if not runner.cancel and ANIMATE_PIXELS:
-            if animation:
-                animation.animate()
-
-
-    runner.add_loop_task(animate_pixels)
+    frame_clock.register(runner)
 
 
     async def callback() -> None:
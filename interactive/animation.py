@@ -1,7 +1,43 @@
 import array
 import random
 
-from interactive.polyfills.animation import Animation
+from interactive.compositor import colour_to_rgb
+from interactive.polyfills.animation import Animation, AMBER, WHITE
+
+# The number of brightness multipliers, which must be a power of 2.
+FLICKER_SCALES = 256
+# The number of random bytes in the noise table of Flame and Lightning, which must
+# be a power of 2.
+NOISE_SIZE = 256
+
+
+def _new_noise(low: int = 0, high: int = 255) -> bytearray:
+    """
+    Returns a table of NOISE_SIZE random bytes between low and high.
+    """
+    return bytearray(random.randint(low, high) for _ in range(NOISE_SIZE))
+
+
+def _new_palette(colour, white: bool) -> array.array:
+    """
+    Returns a table of 256 0xRRGGBB colours, one for each level, that goes from black
+    to the colour and, if white is set, on to white for the top half of the levels.
+    """
+    red, green, blue = colour_to_rgb(colour)
+    palette = array.array("I")
+    for level in range(256):
+        if not white:
+            r, g, b = red * level // 255, green * level // 255, blue * level // 255
+        elif level < 128:
+            r, g, b = red * level // 127, green * level // 127, blue * level // 127
+        else:
+            level -= 128
+            r = red + (255 - red) * level // 127
+            g = green + (255 - green) * level // 127
+            b = blue + (255 - blue) * level // 127
+        palette.append((r << 16) | (g << 8) | b)
+
+    return palette
 
 
 class Flicker(Animation):
@@ -9,6 +45,13 @@ class Flicker(Animation):
     This flickers each neopixel that is "on" (has a brightness > 0). This function
     by default flickers each pixel but is configurable using every. The flicker
     sets the brightness of the pixels to a random value between base and (base + flame).
+
+    As this is the most used animation, drawing avoids floating point and tuples. A
+    table of FLICKER_SCALES brightness multipliers, each a random level between base
+    and (base + flame) in 16 bit fixed point, is made up front. Each frame walks the
+    table from a random position with a random odd stride, so every pixel gets a
+    different entry, and replaces one entry so the table slowly changes. Each pixel
+    is written as a single 0xRRGGBB integer.
     """
 
     def __init__(
@@ -18,9 +61,11 @@ class Flicker(Animation):
         self._spacing = spacing
         self._base = base
         self._flame = flame
-        self._red = array.array("I", [0 for _ in range(size)])
-        self._green = array.array("I", [0 for _ in range(size)])
-        self._blue = array.array("I", [0 for _ in range(size)])
+        # One byte per channel per pixel as the colours are 8 bit.
+        self._red = bytearray(size)
+        self._green = bytearray(size)
+        self._blue = bytearray(size)
+        self._scales = array.array("I", [self._new_scale() for _ in range(FLICKER_SCALES)])
         super().__init__(pixel_object, speed, color, name=name)
         self.set_all(color)
 
@@ -46,13 +91,30 @@ class Flicker(Animation):
         for i in range(self._size):
             self.set(i, colour)  # show all colors
 
+    def _new_scale(self) -> int:
+        """
+        Returns a random brightness between base and (base + flame), limited to 255,
+        as a multiplier where (colour * multiplier) >> 16 == colour * brightness // 255.
+        """
+        level = min(self._base + random.randint(0, self._flame), 255)
+        return (level * 65536 + 254) // 255
+
     def draw(self):
+        scales = self._scales
+        mask = FLICKER_SCALES - 1
+        position = random.randint(0, mask)
+        stride = random.randint(0, mask) | 1
+        scales[position] = self._new_scale()
+
+        red = self._red
+        green = self._green
+        blue = self._blue
+        pixel_object = self.pixel_object
         for i in range(0, self._size, self._spacing):
-            brightness = random.randint(0, self._flame)
-            r = int(self._red[i] * (self._base + brightness) / 255) & 0xFF  # 8-bit red dimmed to brightness
-            g = int(self._green[i] * (self._base + brightness) / 255) & 0xFF  # 8-bit green dimmed to brightness
-            b = int(self._blue[i] * (self._base + brightness) / 255) & 0xFF  # 8-bit blue dimmed to brightness
-            self.pixel_object[i] = (r, g, b)
+            scale = scales[position]
+            position = (position + stride) & mask
+            pixel_object[i] = ((red[i] * scale >> 16) << 16) | ((green[i] * scale >> 16) << 8) | (
+                    blue[i] * scale >> 16)
 
     def __len__(self):
         """
@@ -65,3 +127,158 @@ class Flicker(Animation):
 
     def __setitem__(self, index: int, colour):
         self.set(index, colour)
+
+
+class Flame(Animation):
+    """
+    Flame draws a fire rising up the strip, from the first pixel to the last or the
+    other way if reverse is set. Each pixel has a heat from 0 to 255; every draw
+    each pixel cools a little, the heat rises and spreads up the strip and now and
+    then a spark adds heat near the bottom. The heat is shown with a table of 256
+    colours worked out up front, going from black through the colour to white.
+
+    Everything is done with integers on bytearrays so it is fast enough for long
+    strips. The random amounts come from a table of NOISE_SIZE random bytes that is
+    walked from a random position with a random odd stride each draw, with one
+    entry replaced each draw, so random is only called a few times per draw.
+
+    :param cooling: How quickly the flame cools, higher gives shorter flames.
+    :param sparking: The chance out of 255 of a new spark each draw, higher gives a
+        livelier flame.
+    """
+
+    def __init__(self, pixel_object, speed, color=AMBER, cooling=55, sparking=120, reverse=False, name=None):
+        size = len(pixel_object)
+        self._size = size
+        self._reverse = reverse
+        # The most a pixel cools in a draw, plus one, scaled so long strips still
+        # have long flames.
+        self._cooling = cooling * 10 // max(size, 1) + 3
+        self._sparking = sparking
+        # Sparks start within the bottom seven pixels, there are none on an empty strip.
+        self._sparks = min(7, size)
+        self._heat = bytearray(size)
+        self._noise = _new_noise()
+        self._palette = _new_palette(color, True)
+        super().__init__(pixel_object, speed, color, name=name)
+
+    def draw(self):
+        noise = self._noise
+        mask = NOISE_SIZE - 1
+        position = random.randint(0, mask)
+        stride = random.randint(0, mask) | 1
+        noise[position] = random.randint(0, 255)
+
+        heat = self._heat
+        size = self._size
+        cooling = self._cooling
+        for i in range(size):
+            value = heat[i] - (noise[position] * cooling >> 8)
+            heat[i] = value if value > 0 else 0
+            position = (position + stride) & mask
+
+        if self._sparks and noise[position] < self._sparking:
+            spark = noise[(position + stride) & mask] % self._sparks
+            value = heat[spark] + 160 + noise[(position + stride + stride) & mask] % 96
+            heat[spark] = value if value < 256 else 255
+
+        # The heat rises from the top down, so each pixel is written as it is worked out.
+        palette = self._palette
+        pixel_object = self.pixel_object
+        last = size - 1 if self._reverse else 0
+        for i in range(size - 1, 1, -1):
+            value = (heat[i - 1] + heat[i - 2] + heat[i - 2]) // 3
+            heat[i] = value
+            pixel_object[last - i if last else i] = palette[value]
+
+        for i in range(min(size, 2)):
+            pixel_object[last - i if last else i] = palette[heat[i]]
+
+    def reset(self):
+        self._heat[:] = bytes(self._size)
+
+
+class Lightning(Animation):
+    """
+    Lightning strikes a random part of the strip with a few quick flashes, each of
+    which fades out, and then waits a random number of draws before the next
+    strike. The strip is left dark between flashes.
+
+    A flash fades by multiplying its level by decay / 256 each draw and each lit
+    pixel is looked up in a table of the colour at 256 levels, after scaling the
+    level by an entry in a table of random bytes so the flash is uneven. Nothing is
+    written while the strip is dark.
+
+    :param flashes: The most flashes in a strike.
+    :param delay: The most draws between strikes, the least is half of it.
+    :param decay: How much of the level is left after each draw, out of 256.
+    """
+
+    def __init__(self, pixel_object, speed, color=WHITE, flashes=4, delay=50, decay=160, name=None):
+        self._size = len(pixel_object)
+        self._flashes = flashes
+        self._delay = delay
+        self._decay = decay
+        self._noise = _new_noise(128)
+        self._palette = _new_palette(color, False)
+        # The level of the current flash, 0 when dark.
+        self._level = 0
+        # The number of flashes left in the current strike.
+        self._remaining = 0
+        # The number of draws to wait before the next flash or strike.
+        self._wait = 0
+        # The pixels lit by the current flash.
+        self._start = 0
+        self._end = 0
+        super().__init__(pixel_object, speed, color, name=name)
+
+    def draw(self):
+        if self._level:
+            self._level = self._level * self._decay >> 8
+            if self._level < 16:
+                self._level = 0
+                self._clear()
+            else:
+                self._light()
+            return
+
+        if self._wait:
+            self._wait -= 1
+            return
+
+        if not self._remaining:
+            self._remaining = random.randint(1, self._flashes)
+            self._wait = random.randint(self._delay // 2, self._delay)
+            return
+
+        size = self._size
+        if not size:
+            return
+
+        self._remaining -= 1
+        self._start = random.randint(0, size - 1)
+        self._end = min(self._start + random.randint(size // 4 + 1, size), size)
+        self._level = random.randint(192, 255)
+        self._wait = random.randint(1, 3)
+        self._light()
+
+    def _light(self) -> None:
+        noise = self._noise
+        mask = NOISE_SIZE - 1
+        position = random.randint(0, mask)
+        level = self._level
+        palette = self._palette
+        pixel_object = self.pixel_object
+        for i in range(self._start, self._end):
+            pixel_object[i] = palette[level * noise[position] >> 8]
+            position = (position + 1) & mask
+
+    def _clear(self) -> None:
+        pixel_object = self.pixel_object
+        for i in range(self._start, self._end):
+            pixel_object[i] = 0
+
+    def reset(self):
+        self._level = 0
+        self._remaining = 0
+        self._wait = 0
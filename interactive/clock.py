@@ -0,0 +1,164 @@
+# This file contains an NTP style clock synchronisation estimator. Each node only
+# has its own time.monotonic() which starts from an arbitrary point and runs at a
+# slightly different rate to every other node. ClockSync estimates the offset and
+# drift between the local clock and the coordinator's clock so that every node can
+# agree on a common time base; the coordinator's monotonic clock.
+#
+# A sample is four timestamps, all in nanoseconds:
+#
+#   t1 - local time the request was sent.
+#   t2 - coordinator time the request was received.
+#   t3 - coordinator time the response was sent.
+#   t4 - local time the response was received.
+#
+# The offset is ((t2 - t1) + (t3 - t4)) // 2 and the round trip delay is
+# (t4 - t1) - (t3 - t2). A sample with a long delay is likely to have been held up
+# in one direction more than the other, which skews the offset, so only the sample
+# with the shortest delay out of the recent samples is used. The offset and drift
+# are then smoothed so that a single bad sample cannot make the clock jump. The
+# drift is measured over at least CLOCK_DRIFT_INTERVAL seconds as the jitter
+# between samples taken close together would swamp it.
+#
+# Timestamps and offsets are kept as integer nanoseconds because the float returned
+# by time.monotonic() on CircuitPython loses millisecond precision after a few hours.
+# Only the drift, a small ratio, is a float. Callers that need precision should use
+# synced_now_ns() and to_local_ns() and only divide by NS_PER_SECOND at the end.
+import time
+
+from interactive.control import NS_PER_SECOND, CLOCK_SAMPLE_COUNT, CLOCK_OFFSET_GAIN, CLOCK_DRIFT_GAIN, \
+    CLOCK_DRIFT_INTERVAL, CLOCK_MAX_DRIFT
+
+
+class ClockSync:
+    """
+    ClockSync keeps a smoothed estimate of the offset and drift between the local
+    monotonic clock and a reference clock, normally the coordinator's. Samples are
+    added with add_sample() and synced_now() returns the current time on the
+    reference clock. Until the first sample is added synced_now() is the local time.
+
+    ClockSync does not send any messages itself; the DatagramService sends the sync
+    requests and passes the responses to add_sample().
+    """
+
+    def __init__(self, sample_count: int = CLOCK_SAMPLE_COUNT):
+        if sample_count <= 0:
+            raise ValueError("sample_count must be greater than 0")
+
+        self.sample_count = sample_count
+        self.synced = False
+        # Recent samples as (delay, offset, local time) tuples, all in nanoseconds.
+        self.__samples = []
+        self.__offset_ns = 0
+        self.__drift = 0.0
+        self.__reference_ns = 0
+        # The measured offset and local time the current drift interval started.
+        self.__drift_offset_ns = 0
+        self.__drift_reference_ns = 0
+
+    @property
+    def offset(self) -> float:
+        """
+        The current offset to the reference clock in seconds.
+        """
+        return self.__predict_offset_ns(time.monotonic_ns()) / NS_PER_SECOND
+
+    @property
+    def drift(self) -> float:
+        """
+        The estimated drift to the reference clock, in seconds per second.
+        """
+        return self.__drift
+
+    @property
+    def delay(self) -> [None, float]:
+        """
+        The shortest round trip delay of the recent samples in seconds, which is
+        also the worst case error of the offset. None if there are no samples.
+        """
+        if not self.__samples:
+            return None
+
+        return min(sample[0] for sample in self.__samples) / NS_PER_SECOND
+
+    def __predict_offset_ns(self, local_ns: int) -> int:
+        return self.__offset_ns + int(self.__drift * (local_ns - self.__reference_ns))
+
+    def add_sample(self, t1: int, t2: int, t3: int, t4: int) -> None:
+        """
+        Adds the timestamps from a single request and response, all in nanoseconds.
+        t1 and t4 are on the local clock, t2 and t3 are on the reference clock.
+        """
+        delay = (t4 - t1) - (t3 - t2)
+        if delay < 0:
+            # Not possible unless a timestamp is wrong.
+            return
+
+        offset = ((t2 - t1) + (t3 - t4)) // 2
+
+        self.__samples.append((delay, offset, t4))
+        if len(self.__samples) > self.sample_count:
+            self.__samples.pop(0)
+
+        for sample in self.__samples:
+            if sample[0] < delay:
+                # This sample was slower than a recent one so tells us nothing new.
+                return
+
+        if not self.synced:
+            self.__offset_ns = offset
+            self.__reference_ns = t4
+            self.__drift_offset_ns = offset
+            self.__drift_reference_ns = t4
+            self.synced = True
+            return
+
+        elapsed = t4 - self.__drift_reference_ns
+        if elapsed >= CLOCK_DRIFT_INTERVAL * NS_PER_SECOND:
+            measured = (offset - self.__drift_offset_ns) / elapsed
+            drift = self.__drift + CLOCK_DRIFT_GAIN * (measured - self.__drift)
+            self.__drift = max(-CLOCK_MAX_DRIFT, min(CLOCK_MAX_DRIFT, drift))
+            self.__drift_offset_ns = offset
+            self.__drift_reference_ns = t4
+
+        predicted = self.__predict_offset_ns(t4)
+        self.__offset_ns = predicted + int(CLOCK_OFFSET_GAIN * (offset - predicted))
+        self.__reference_ns = t4
+
+    def synced_now_ns(self) -> int:
+        """
+        Returns the current time on the reference clock, in nanoseconds.
+        """
+        now = time.monotonic_ns()
+        return now + self.__predict_offset_ns(now)
+
+    def synced_now(self) -> float:
+        """
+        Returns the current time on the reference clock, in seconds.
+        """
+        return self.synced_now_ns() / NS_PER_SECOND
+
+    def to_local_ns(self, synced_ns: int) -> int:
+        """
+        Converts a time on the reference clock into the equivalent local
+        time.monotonic_ns() value, both in nanoseconds.
+        """
+        return synced_ns - self.__predict_offset_ns(time.monotonic_ns())
+
+    def to_local(self, synced_time: float) -> float:
+        """
+        Converts a time on the reference clock into the equivalent local
+        time.monotonic() value, both in seconds.
+        """
+        return synced_time - self.offset
+
+    def reset(self) -> None:
+        """
+        Forgets all samples, for example when the coordinator changes.
+        """
+        self.synced = False
+        self.__samples.clear()
+        self.__offset_ns = 0
+        self.__drift = 0.0
+        self.__reference_ns = 0
+        self.__drift_offset_ns = 0
+        self.__drift_reference_ns = 0
@@ -0,0 +1,531 @@
+# This file contains a compositor that lets several animations share a strip of
+# pixels, or drive many strips, without each one writing to the strip itself.
+#
+# Each animation draws into its own layer, which looks like a strip of pixels to the
+# animation but is just a bytearray. Every frame the Compositor animates each of its
+# animations without showing them and, for each strip where a layer was drawn,
+# blends the layers in the order they were added into the strip's framebuffer.
+# The framebuffer is then written to the strip with a single show(), so animations
+# no longer fight over a strip and each strip is written at most once per frame.
+# The framebuffer is compared with the last frame written so a strip is not
+# written at all when the frame is unchanged, and otherwise only the pixels that
+# changed are set before the show(). A strip can have a ColourCorrection which is
+# applied to each pixel as it is written, see correction.py.
+#
+# Layers are RGB. On RGBW strips (bpp of 4) greys, where red, green and blue are
+# equal, are written to the white LED alone, as the NeoPixel library does for RGB
+# colours, so the white correction table applies to them. Other colours are
+# written with the white LED off.
+#
+# A Layer uses three bytes per pixel. For long strips a PaletteLayer uses one byte
+# per pixel, an index into a palette of up to 256 colours, and each pixel is looked
+# up in the palette as it is blended, so no three byte copy of the layer is ever
+# made. Animations whose colours keep changing soon fill the
+# palette, so once it is full the entries no pixel uses any more are reused, and
+# if every entry is in use a colour is drawn as the nearest colour in the palette.
+#
+# The blend modes are:
+#
+#   BLEND_OVER - lit pixels in the layer replace the pixels below; black is clear.
+#   BLEND_ADD  - the layer is added to the pixels below, limited to 255.
+#   BLEND_MAX  - the brightest of the layer and the pixels below.
+#   BLEND_MASK - the pixels below are dimmed by the layer, so black hides them
+#                and white leaves them unchanged.
+from interactive.correction import ColourCorrection
+from interactive.runner import Runner
+
+BLEND_OVER = 0
+BLEND_ADD = 1
+BLEND_MAX = 2
+BLEND_MASK = 3
+
+# The largest palette a PaletteLayer can have, as each pixel is one byte.
+PALETTE_SIZE = 256
+
+# Leaves a channel unchanged when a strip has no correction.
+_IDENTITY = bytes(range(256))
+
+
+def colour_to_rgb(colour) -> (int, int, int):
+    """
+    Returns the red, green and blue of a colour given either as a 0xRRGGBB integer
+    or a tuple. The white of RGBW tuples is ignored.
+    """
+    if isinstance(colour, int):
+        return (colour >> 16) & 0xFF, (colour >> 8) & 0xFF, colour & 0xFF
+
+    return colour[0] & 0xFF, colour[1] & 0xFF, colour[2] & 0xFF
+
+
+class BaseLayer:
+    """
+    The parts of a layer that do not depend on how its pixels are stored. A layer
+    supports the parts of the NeoPixel interface that animations use: len(),
+    indexing and slicing, fill() and show(). Showing a layer does nothing; the
+    Compositor writes the strip.
+    """
+
+    def __init__(self, size: int, blend: int = BLEND_OVER):
+        """
+        :param size: The number of pixels.
+        :param blend: How the layer is blended with the layers below it.
+        """
+        self.blend = blend
+        self.changed = False
+        self._visible = True
+        self.auto_write = False
+        self.brightness = 1.0
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def n(self) -> int:
+        return self._size
+
+    @property
+    def visible(self) -> bool:
+        return self._visible
+
+    @visible.setter
+    def visible(self, value: bool) -> None:
+        self._visible = value
+        self.changed = True
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            for i, colour in zip(range(*index.indices(self._size)), value):
+                self._set(i, colour)
+        else:
+            if index < 0:
+                index += self._size
+            if index < 0 or index >= self._size:
+                raise IndexError("Layer: Index %s is out of bounds!" % index)
+            self._set(index, value)
+
+        self.changed = True
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+
+        if index < 0:
+            index += self._size
+        if index < 0 or index >= self._size:
+            raise IndexError("Layer: Index %s is out of bounds!" % index)
+
+        return self._get(index)
+
+    def _set(self, index: int, colour) -> None:
+        raise NotImplementedError()
+
+    def _get(self, index: int) -> (int, int, int):
+        raise NotImplementedError()
+
+    def blend_into(self, buffer: bytearray) -> None:
+        """
+        Blends the layer into the buffer, three bytes per pixel, with its blend mode.
+        """
+        raise NotImplementedError()
+
+    def show(self) -> None:
+        pass
+
+    def write(self) -> None:
+        pass
+
+
+class Layer(BaseLayer):
+    """
+    A Layer is drawn into by an animation in place of a strip of pixels. Each
+    pixel is stored as three bytes; red, green and blue.
+    """
+
+    def __init__(self, size: int, blend: int = BLEND_OVER):
+        super().__init__(size, blend)
+        self.buffer = bytearray(size * 3)
+
+    def _set(self, index: int, colour) -> None:
+        i = index * 3
+        self.buffer[i], self.buffer[i + 1], self.buffer[i + 2] = colour_to_rgb(colour)
+
+    def _get(self, index: int) -> (int, int, int):
+        i = index * 3
+        return self.buffer[i], self.buffer[i + 1], self.buffer[i + 2]
+
+    def fill(self, colour) -> None:
+        self.buffer[:] = bytes(colour_to_rgb(colour)) * self._size
+        self.changed = True
+
+    def blend_into(self, buffer: bytearray) -> None:
+        blend = _BLENDS.get(self.blend)
+        if blend is None:
+            raise ValueError("Compositor: Unknown blend mode %s" % self.blend)
+
+        blend(buffer, self.buffer)
+
+
+def _blend_over(buffer: bytearray, source: bytearray) -> None:
+    for i in range(0, len(buffer), 3):
+        if source[i] or source[i + 1] or source[i + 2]:
+            buffer[i:i + 3] = source[i:i + 3]
+
+
+def _blend_add(buffer: bytearray, source: bytearray) -> None:
+    for i in range(len(buffer)):
+        value = buffer[i] + source[i]
+        buffer[i] = value if value < 256 else 255
+
+
+def _blend_max(buffer: bytearray, source: bytearray) -> None:
+    for i in range(len(buffer)):
+        if source[i] > buffer[i]:
+            buffer[i] = source[i]
+
+
+def _blend_mask(buffer: bytearray, source: bytearray) -> None:
+    for i in range(len(buffer)):
+        buffer[i] = buffer[i] * source[i] // 255
+
+
+_BLENDS = {
+    BLEND_OVER: _blend_over,
+    BLEND_ADD: _blend_add,
+    BLEND_MAX: _blend_max,
+    BLEND_MASK: _blend_mask,
+}
+
+
+class PaletteLayer(BaseLayer):
+    """
+    A PaletteLayer stores each pixel as a single byte index into a palette of up to
+    256 colours, which uses much less memory than a Layer for long strips. Colours
+    set on the layer are added to the palette as they are first used, or an
+    animation can set the palette with set_colour() and draw the indices directly.
+    Index 0 is black to start with.
+
+    Once the palette is full, entries that no pixel uses are reused for new
+    colours, so an animation drawing the indices directly should set the palette
+    after drawing with colours. The used entries are only looked for once a frame;
+    when none are free the nearest colour in the palette is used instead.
+    """
+
+    def __init__(self, size: int, blend: int = BLEND_OVER, colours: int = PALETTE_SIZE):
+        """
+        :param size: The number of pixels.
+        :param blend: How the layer is blended with the layers below it.
+        :param colours: The number of colours in the palette, up to 256.
+        """
+        if colours <= 0 or colours > PALETTE_SIZE:
+            raise ValueError("colours must be between 1 and %s" % PALETTE_SIZE)
+
+        super().__init__(size, blend)
+        self.indices = bytearray(size)
+        self.palette = bytearray(colours * 3)
+        # Maps each 0xRRGGBB colour in the palette to its index.
+        self._lookup = {0: 0}
+        self._colours = colours
+        # The number of palette entries in use.
+        self._used = 1
+        # Entries no pixel used when the full palette was last looked through.
+        self._free: list[int] = []
+        # Whether the full palette has been looked through since the last frame.
+        self._scanned = False
+
+    def set_colour(self, index: int, colour) -> None:
+        """
+        Sets the colour of a palette index, changing every pixel that uses it.
+        """
+        if index < 0 or index >= self._colours:
+            raise IndexError("Layer: Palette index %s is out of bounds!" % index)
+
+        i = index * 3
+        previous = (self.palette[i] << 16) | (self.palette[i + 1] << 8) | self.palette[i + 2]
+        if self._lookup.get(previous) == index:
+            del self._lookup[previous]
+
+        r, g, b = colour_to_rgb(colour)
+        self.palette[i], self.palette[i + 1], self.palette[i + 2] = r, g, b
+        self._lookup[(r << 16) | (g << 8) | b] = index
+        self._used = max(self._used, index + 1)
+        self.changed = True
+
+    def index_of(self, colour) -> int:
+        """
+        Returns the palette index of the colour, adding it to the palette if it is
+        not there. When the palette is full an entry no pixel uses is reused, or if
+        there are none the index of the nearest colour is returned.
+        """
+        r, g, b = colour_to_rgb(colour)
+        packed = (r << 16) | (g << 8) | b
+        index = self._lookup.get(packed)
+        if index is not None:
+            return index
+
+        if self._used < self._colours:
+            index = self._used
+        else:
+            if not self._free and not self._scanned:
+                self.__reclaim()
+            if not self._free:
+                return self.__nearest(r, g, b)
+            index = self._free.pop()
+
+        self.set_colour(index, packed)
+        return index
+
+    def __reclaim(self) -> None:
+        """
+        Finds the palette entries that no pixel uses so they can be reused.
+        """
+        self._scanned = True
+        in_use = bytearray(self._colours)
+        for index in self.indices:
+            in_use[index] = 1
+
+        palette = self.palette
+        for index in range(self._colours - 1, -1, -1):
+            if not in_use[index]:
+                self._free.append(index)
+                # Stop the old colour finding the entry before it is reused.
+                i = index * 3
+                previous = (palette[i] << 16) | (palette[i + 1] << 8) | palette[i + 2]
+                if self._lookup.get(previous) == index:
+                    del self._lookup[previous]
+
+    def __nearest(self, r: int, g: int, b: int) -> int:
+        """
+        Returns the index of the palette colour closest to the colour.
+        """
+        palette = self.palette
+        index = 0
+        closest = None
+        for i in range(0, self._colours * 3, 3):
+            distance = (palette[i] - r) ** 2 + (palette[i + 1] - g) ** 2 + (palette[i + 2] - b) ** 2
+            if closest is None or distance < closest:
+                closest = distance
+                index = i // 3
+
+        return index
+
+    def _set(self, index: int, colour) -> None:
+        self.indices[index] = self.index_of(colour)
+
+    def _get(self, index: int) -> (int, int, int):
+        i = self.indices[index] * 3
+        return self.palette[i], self.palette[i + 1], self.palette[i + 2]
+
+    def fill(self, colour) -> None:
+        self.indices[:] = bytes([self.index_of(colour)]) * self._size
+        self._scanned = False
+        self.changed = True
+
+    def blend_into(self, buffer: bytearray) -> None:
+        """
+        Blends the layer into the buffer, three bytes per pixel, looking each pixel
+        up in the palette as it goes.
+        """
+        blend = _PALETTE_BLENDS.get(self.blend)
+        if blend is None:
+            raise ValueError("Compositor: Unknown blend mode %s" % self.blend)
+
+        # The pixels will have been redrawn by the next frame.
+        self._scanned = False
+        blend(buffer, self.indices, self.palette)
+
+
+def _blend_palette_over(buffer: bytearray, indices: bytearray, palette: bytearray) -> None:
+    i = 0
+    for index in indices:
+        p = index * 3
+        if palette[p] or palette[p + 1] or palette[p + 2]:
+            buffer[i] = palette[p]
+            buffer[i + 1] = palette[p + 1]
+            buffer[i + 2] = palette[p + 2]
+        i += 3
+
+
+def _blend_palette_add(buffer: bytearray, indices: bytearray, palette: bytearray) -> None:
+    i = 0
+    for index in indices:
+        p = index * 3
+        for j in range(3):
+            value = buffer[i + j] + palette[p + j]
+            buffer[i + j] = value if value < 256 else 255
+        i += 3
+
+
+def _blend_palette_max(buffer: bytearray, indices: bytearray, palette: bytearray) -> None:
+    i = 0
+    for index in indices:
+        p = index * 3
+        for j in range(3):
+            if palette[p + j] > buffer[i + j]:
+                buffer[i + j] = palette[p + j]
+        i += 3
+
+
+def _blend_palette_mask(buffer: bytearray, indices: bytearray, palette: bytearray) -> None:
+    i = 0
+    for index in indices:
+        p = index * 3
+        for j in range(3):
+            buffer[i + j] = buffer[i + j] * palette[p + j] // 255
+        i += 3
+
+
+_PALETTE_BLENDS = {
+    BLEND_OVER: _blend_palette_over,
+    BLEND_ADD: _blend_palette_add,
+    BLEND_MAX: _blend_palette_max,
+    BLEND_MASK: _blend_palette_mask,
+}
+
+
+class Compositor:
+    """
+    Compositor owns a framebuffer for each strip of pixels and blends the layers
+    drawn by its animations into it, writing each strip once per frame. Create a
+    layer with new_layer(), draw into it with an animation, add the animation with
+    add_animation() and then either call animate() every loop or register() with a
+    Runner.
+    """
+
+    class Strip:
+        def __init__(self, pixels):
+            self.pixels = pixels
+            self.buffer = bytearray(len(pixels) * 3)
+            # The frame last written to the strip, None until the first frame.
+            self.written = None
+            self.correction = None
+            # Greys are written to the white LED of RGBW strips.
+            self.rgbw = getattr(pixels, "bpp", 3) == 4
+            self.layers: list[BaseLayer] = []
+
+    def __init__(self):
+        self.__runner = None
+        self._strips: list[Compositor.Strip] = []
+        self._animations = []
+
+    def new_layer(self, pixels, blend: int = BLEND_OVER) -> Layer:
+        """
+        Returns a new layer above the existing layers of the strip.
+
+        :param pixels: The strip of pixels the layer is shown on.
+        :param blend: How the layer is blended with the layers below it.
+        """
+        layer = Layer(len(pixels), blend)
+        self.__get_strip(pixels).layers.append(layer)
+        return layer
+
+    def new_palette_layer(self, pixels, blend: int = BLEND_OVER, colours: int = PALETTE_SIZE) -> PaletteLayer:
+        """
+        Returns a new palette layer above the existing layers of the strip.
+
+        :param pixels: The strip of pixels the layer is shown on.
+        :param blend: How the layer is blended with the layers below it.
+        :param colours: The number of colours in the palette, up to 256.
+        """
+        layer = PaletteLayer(len(pixels), blend, colours)
+        self.__get_strip(pixels).layers.append(layer)
+        return layer
+
+    def set_correction(self, pixels, correction: [None, ColourCorrection]) -> None:
+        """
+        Sets the colour correction applied as frames are written to the strip, or
+        None to write the colours unchanged. The whole strip is written next frame.
+        """
+        strip = self.__get_strip(pixels)
+        strip.correction = correction
+        strip.written = None
+        for layer in strip.layers:
+            layer.changed = True
+
+    def __get_strip(self, pixels) -> Strip:
+        strip = next((strip for strip in self._strips if strip.pixels is pixels), None)
+        if strip is None:
+            pixels.auto_write = False
+            strip = Compositor.Strip(pixels)
+            self._strips.append(strip)
+
+        return strip
+
+    def add_animation(self, animation) -> None:
+        """
+        Adds an animation, or animation sequence, that draws into one of the layers.
+        """
+        self._animations.append(animation)
+
+    def register(self, runner: Runner) -> None:
+        """
+        Registers this Compositor instance as a task with the provided Runner.
+
+        :param runner: the runner to register with.
+        """
+        self.__runner = runner
+        runner.add_loop_task(self.__loop)
+
+    async def __loop(self) -> None:
+        if not self.__runner.cancel:
+            self.animate()
+
+    def animate(self) -> None:
+        """
+        Animates every animation and writes the strips that changed.
+        """
+        for animation in self._animations:
+            animation.animate(False)
+
+        for strip in self._strips:
+            if any(layer.changed for layer in strip.layers):
+                self.compose(strip)
+                self.write(strip)
+
+    @staticmethod
+    def compose(strip: Strip) -> None:
+        """
+        Blends the visible layers of the strip into its framebuffer.
+        """
+        buffer = strip.buffer
+        buffer[:] = bytes(len(buffer))
+        for layer in strip.layers:
+            layer.changed = False
+            if layer.visible:
+                layer.blend_into(buffer)
+
+    @staticmethod
+    def write(strip: Strip) -> None:
+        """
+        Writes the pixels of the framebuffer that changed since the last frame to the
+        strip, corrected if the strip has a correction, and shows it. Nothing is
+        written if the frame has not changed. On RGBW strips greys are written as
+        (0, 0, 0, white), corrected by the white table.
+        """
+        buffer = strip.buffer
+        written = strip.written
+        if written == buffer:
+            return
+
+        correction = strip.correction
+        if correction is None:
+            red = green = blue = white = _IDENTITY
+        else:
+            red, green, blue, white = correction.red, correction.green, correction.blue, correction.white
+        rgbw = strip.rgbw
+
+        pixels = strip.pixels
+        for index in range(len(pixels)):
+            i = index * 3
+            if written is None or written[i] != buffer[i] or written[i + 1] != buffer[i + 1] or \
+                    written[i + 2] != buffer[i + 2]:
+                if rgbw and buffer[i] == buffer[i + 1] == buffer[i + 2]:
+                    pixels[index] = (0, 0, 0, white[buffer[i]])
+                else:
+                    pixels[index] = (red[buffer[i]] << 16) | (green[buffer[i + 1]] << 8) | blue[buffer[i + 2]]
+        pixels.show()
+
+        if written is None:
+            strip.written = bytearray(buffer)
+        else:
+            written[:] = buffer
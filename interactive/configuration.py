@@ -13,6 +13,25 @@ FIELD_COORDINATOR = "coordinator"
 NODE_NAME = "<hostname>"
 NODE_ROLE = "<host role>"
 NODE_COORDINATOR = None  # The I.P. Address of the coordinator node.
+# The addresses of every coordinator when more than one is used. Nodes fail over
+# to the next one when their coordinator stops answering, and coordinators copy
+# the directory from each other so any of them can answer lookups.
+NODE_COORDINATORS = []
+
+# The path, without an extension, that a desktop coordinator keeps its directory
+# at (<path>.snapshot and <path>.journal) so it can restart without waiting for
+# every node's next heartbeat, for example "/var/lib/interactive/directory". The
+# directory is not kept if this is None.
+DIRECTORY_JOURNAL = None
+
+# Send node to node messages using the compact binary encoding rather than JSON.
+# Receiving nodes always accept both so this can be turned on node by node.
+BINARY_MESSAGES = False
+
+# Record how long every loop and scheduled task takes, and how late the loop wakes
+# up, for the /metrics route. Timing adds a little to every loop so it is off unless
+# someone is looking at the metrics.
+TASK_METRICS = False
 
 REPORT_RAM = False
 REPORT_RAM_PERIOD = 5  # This is the period in seconds between each report.
@@ -66,12 +85,15 @@ class Config:
     """
 
     def __init__(self):
+        self.task_metrics = False
         self.report_ram = False
         self.report_ram_period = 9999
         self.garbage_collect = False
         self.garbage_collect_period = 9999
         self.network = False
         self.directory = False
+        self.directory_journal = None
+        self.datagram = False
         self.button_pin = None
         self.button_single_press = None
         self.button_multi_press = None
@@ -89,6 +111,8 @@ class Config:
 
     def __str__(self):
         return f"""
+          Metrics:
+            Task timings ....... : {self.task_metrics}
           Ram:
             Report ............. : {self.report_ram}
             Period ............. : {self.report_ram_period} seconds
@@ -98,6 +122,8 @@ class Config:
           Network:
             Enabled ............ : {self.network}
             Directory Service .. : {self.directory}
+            Directory Journal .. : {self.directory_journal}
+            Datagram Service ... : {self.datagram}
           Button: 
             Pin ................ : {self.button_pin}
           Buzzer: 
@@ -119,7 +145,7 @@ class Config:
 
 
 def get_node_config(network=False, directory=False, button=True, buzzer=True, audio=True, ultrasonic=True,
-                    trigger=True) -> Config:
+                    trigger=True, datagram=False) -> Config:
     if REPORT_RAM:
         report_memory_usage("get_node_config")
 
@@ -128,6 +154,11 @@ def get_node_config(network=False, directory=False, button=True, buzzer=True, au
     if network:
         config.network = True
         config.directory = directory  # Only allow the directory service if the network is enabled.
+        if directory:
+            config.directory_journal = DIRECTORY_JOURNAL
+        config.datagram = datagram  # Only allow the datagram service if the network is enabled.
+
+    config.task_metrics = TASK_METRICS
 
     if REPORT_RAM:
         config.report_ram = True
@@ -24,11 +24,62 @@ BUTTON_LONG_DURATION_MS = 2000
 # * * * * *    D I R E C T O R Y    * * * * *
 # How long a registered name lasts before expiry
 DIRECTORY_EXPIRY_DURATION = 120  # 2 minutes
-# The frequency that the directory controller will check for name expiry (every 2 minutes)
-DIRECTORY_EXPIRY_FREQUENCY = 1 / DIRECTORY_EXPIRY_DURATION
+# The frequency that the directory controller will check for name expiry. Only the
+# names that are due are checked so this can be frequent (every second).
+DIRECTORY_EXPIRY_FREQUENCY = 1
+# The number of recent changes kept so nodes can fetch just the changes since their version.
+DIRECTORY_CHANGE_LOG_SIZE = 64
+# How long a node caches an address looked up from the coordinator. This is well
+# below the expiry duration so a node that has gone away is noticed quickly.
+DIRECTORY_RESOLVER_TTL = DIRECTORY_EXPIRY_DURATION / 4  # 30 seconds
+# How long a node caches that a name is not known to the coordinator.
+DIRECTORY_RESOLVER_NEGATIVE_TTL = 5  # seconds
+# Addresses that have been used are refreshed in the background this close to expiry.
+DIRECTORY_RESOLVER_REFRESH_AHEAD = DIRECTORY_RESOLVER_TTL / 4  # 7.5 seconds
+DIRECTORY_RESOLVER_REFRESH_FREQUENCY = 1
+DIRECTORY_RESOLVER_SIZE = 32  # The maximum number of cached names.
+DIRECTORY_JOURNAL_FLUSH_FREQUENCY = 1
+DIRECTORY_JOURNAL_COMPACT_SIZE = 1000  # The number of journal records before a new snapshot is written.
+# Heartbeats are not journaled, so a snapshot is also written at least this often
+# (in seconds) to keep the saved expiry times close to the real ones.
+DIRECTORY_JOURNAL_SNAPSHOT_PERIOD = 60
+# Coordinators copy the changes from one peer coordinator at this frequency, taking turns.
+DIRECTORY_REPLICATION_FREQUENCY = 1
+# How long to leave a peer coordinator that could not be reached before trying it again.
+DIRECTORY_REPLICATION_BACKOFF = 10  # seconds
+# Directory changes are sent to subscribers at this frequency.
+DIRECTORY_SUBSCRIPTION_FREQUENCY = 10
+# Subscribers that have not been sent anything for this long are sent a keep alive.
+DIRECTORY_SUBSCRIPTION_KEEPALIVE = 15  # seconds
+# Each subscriber holds a socket open, which are in short supply on a microcontroller.
+DIRECTORY_MAX_SUBSCRIBERS = 4
 
 # * * * * *    N E T W O R K    * * * * *
 SEND_MESSAGE_TIMEOUT = 2  # seconds
 NETWORK_PORT_MICROCONTROLLER = 80
 NETWORK_PORT_DESKTOP = 5001
 NETWORK_HEARTBEAT_FREQUENCY = 1 / (DIRECTORY_EXPIRY_DURATION / 2)  # every 60 seconds.
+
+# * * * * *    D A T A G R A M S    * * * * *
+NETWORK_PORT_DATAGRAM = 5002
+DATAGRAM_BROADCAST_ADDRESS = "255.255.255.255"
+DATAGRAM_BUFFER_SIZE = 256  # bytes, larger datagrams are truncated.
+DATAGRAM_MAX_PER_POLL = 16  # Limits how many datagrams are processed before yielding.
+DATAGRAM_DISCOVERY_FREQUENCY = 1 / 5  # every 5 seconds until a coordinator answers.
+# How far in the future a group trigger starts; long enough for every node to receive it.
+TRIGGER_FANOUT_DELAY = 0.25  # seconds
+
+# * * * * *    C L O C K    * * * * *
+CLOCK_SYNC_FREQUENCY = 1 / 2  # every 2 seconds.
+CLOCK_SAMPLE_COUNT = 8  # The number of recent samples to pick the shortest delay from.
+CLOCK_OFFSET_GAIN = 0.5  # How much of the measured offset error is applied per sample.
+CLOCK_DRIFT_GAIN = 0.25  # How much of the measured drift error is applied per interval.
+CLOCK_DRIFT_INTERVAL = 16  # seconds, the minimum time to measure the drift over.
+CLOCK_MAX_DRIFT = 0.001  # Crystals are accurate to well within 1000ppm.
+
+# * * * * *    F R A M E S    * * * * *
+FRAME_RATE = 30  # The target number of frames per second for animations.
+FRAME_SAMPLE_COUNT = 64  # The number of recent frames the frame rate and frame times are measured over.
+FRAME_CACHE_BUDGET = 16 * 1024  # bytes, the most memory recorded animation frames can use.
+FRAME_CACHE_IDLE_RESTART = 0.5  # seconds, a cached animation not animated for this long restarts from black.
+COLOUR_GAMMA = 2.6  # The default gamma used to correct pixel colours.
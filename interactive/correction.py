@@ -0,0 +1,66 @@
+# This file contains the gamma and white balance correction of pixel colours.
+# LEDs are linear, so a colour value of 128 is half the light of 255, but eyes are
+# not, so without correction dim colours look too bright and mixed colours look
+# washed out. Different strips also have slightly different coloured LEDs. Rather
+# than baking corrected values into every colour constant, a ColourCorrection is
+# given to the Compositor for a strip and applied as the frame is written.
+#
+# Each channel has a 256 entry table, worked out once, so correcting a pixel is
+# three table lookups rather than a power and a multiply per channel:
+#
+#   table[value] = round(((value / 255) ** gamma) * 255 * balance)
+#
+# where balance scales that channel to correct the white point of the strip. On
+# RGBW strips the Compositor writes greys to the white LED, through the white
+# table, and everything else through the red, green and blue tables.
+from interactive.control import COLOUR_GAMMA
+
+
+def new_correction_table(gamma: float = COLOUR_GAMMA, balance: float = 1.0) -> bytes:
+    """
+    Returns a 256 entry table that gamma corrects and then scales a colour channel.
+
+    :param gamma: The gamma, 1.0 leaves the value unchanged.
+    :param balance: How much to scale the channel by, from 0.0 to 1.0.
+    """
+    if gamma <= 0:
+        raise ValueError("gamma must be greater than 0")
+
+    balance = min(max(balance, 0.0), 1.0)
+    return bytes(int(((value / 255) ** gamma) * 255 * balance + 0.5) for value in range(256))
+
+
+class ColourCorrection:
+    """
+    ColourCorrection holds the red, green, blue and white correction tables of a
+    strip. The Compositor applies it when writing a frame; correct() applies it to
+    a single colour, including the white of RGBW colours.
+    """
+
+    def __init__(self, gamma: float = COLOUR_GAMMA, red: float = 1.0, green: float = 1.0, blue: float = 1.0,
+                 white: float = 1.0):
+        """
+        :param gamma: The gamma of every channel.
+        :param red: The white balance of the red channel, from 0.0 to 1.0.
+        :param green: The white balance of the green channel, from 0.0 to 1.0.
+        :param blue: The white balance of the blue channel, from 0.0 to 1.0.
+        :param white: The balance of the white channel of RGBW strips, from 0.0 to 1.0.
+        """
+        self.red = new_correction_table(gamma, red)
+        self.green = new_correction_table(gamma, green)
+        self.blue = new_correction_table(gamma, blue)
+        self.white = new_correction_table(gamma, white)
+
+    def correct(self, colour):
+        """
+        Returns the corrected colour in the same form, a 0xRRGGBB integer or an
+        RGB or RGBW tuple, as given.
+        """
+        if isinstance(colour, int):
+            return (self.red[(colour >> 16) & 0xFF] << 16) | (self.green[(colour >> 8) & 0xFF] << 8) | self.blue[
+                colour & 0xFF]
+
+        if len(colour) == 4:
+            return self.red[colour[0]], self.green[colour[1]], self.blue[colour[2]], self.white[colour[3]]
+
+        return self.red[colour[0]], self.green[colour[1]], self.blue[colour[2]]
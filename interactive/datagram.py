@@ -0,0 +1,499 @@
+# The datagram service is a lightweight UDP alternative to the HTTP register,
+# unregister and heartbeat messages provided by the DirectoryService. Each
+# message is a single small datagram so there is no TCP connection to set up
+# and no HTTP request to parse on the coordinator. It also supports finding
+# the coordinator by broadcasting a discovery datagram which means that
+# NODE_COORDINATOR does not need to be hard-coded on every node.
+#
+# The datagrams are plain text fields separated by a tab character:
+#
+#   R <name> <role> <address>   - Register with the coordinator.
+#   U <name> <role> <address>   - Unregister from the coordinator.
+#   H <name> <role> <address>   - Heartbeat to the coordinator.
+#   D                           - Discovery request, broadcast by a node.
+#   C <address>                 - Discovery response, sent by the coordinator.
+#   T <name> <delay> <start>    - Trigger after delay seconds, sent by the coordinator.
+#   S <t1>                      - Clock sync request, sent by a node.
+#   Y <t1> <t2> <t3>            - Clock sync response, sent by the coordinator.
+#
+# The trigger start and the clock sync timestamps are integer nanoseconds on the
+# monotonic clock of the sender (see clock.py). A node with a synced clock starts a
+# trigger at the start time, otherwise it falls back to the delay.
+#
+# If BINARY_MESSAGES is set then the register, unregister, heartbeat and trigger datagrams
+# are sent using the binary encoding from wire.py instead. Binary datagrams always
+# start with the WIRE_VERSION byte so the coordinator accepts either format.
+#
+import struct
+import time
+
+from adafruit_httpserver import GET, Request, Response, Route, NOT_FOUND_404, BAD_REQUEST_400
+
+from interactive import configuration
+from interactive.clock import ClockSync
+from interactive.configuration import NODE_COORDINATOR, BINARY_MESSAGES
+from interactive.control import NETWORK_PORT_DATAGRAM, NETWORK_HEARTBEAT_FREQUENCY, DATAGRAM_BROADCAST_ADDRESS, \
+    DATAGRAM_BUFFER_SIZE, DATAGRAM_MAX_PER_POLL, DATAGRAM_DISCOVERY_FREQUENCY, TRIGGER_FANOUT_DELAY, NS_PER_SECOND, \
+    CLOCK_SYNC_FREQUENCY
+from interactive.directory import DirectoryController
+from interactive.environment import is_running_under_test, is_running_on_desktop
+from interactive.log import info, debug, error
+from interactive.network import get_address, schedule_trigger, NO, TRIGGERED
+from interactive.polyfills.network import new_datagram_socket
+from interactive.runner import Runner
+from interactive.scheduler import new_scheduled_task, terminate_on_cancel
+from interactive.wire import MESSAGE_REGISTER, MESSAGE_UNREGISTER, MESSAGE_HEARTBEAT, MESSAGE_TRIGGER, FIELD_MESSAGE, \
+    FIELD_NAME, FIELD_ROLE, FIELD_ADDRESS, FIELD_DELAY, FIELD_START_NS, is_binary, encode_directory_message, \
+    encode_trigger_message, decode_message
+
+# collections.abc is not available in CircuitPython.
+if is_running_on_desktop():
+    from collections.abc import Callable
+
+# CircuitPython's struct raises ValueError rather than having its own error.
+_STRUCT_ERROR = getattr(struct, "error", ValueError)
+
+DATAGRAM_REGISTER = "R"
+DATAGRAM_UNREGISTER = "U"
+DATAGRAM_HEARTBEAT = "H"
+DATAGRAM_DISCOVER = "D"
+DATAGRAM_COORDINATOR = "C"
+DATAGRAM_TRIGGER = "T"
+DATAGRAM_SYNC_REQUEST = "S"
+DATAGRAM_SYNC_RESPONSE = "Y"
+
+DATAGRAM_SEPARATOR = "\t"
+
+# Maps between the text datagram messages and the binary message types.
+_DATAGRAM_TO_MESSAGE = {
+    DATAGRAM_REGISTER: MESSAGE_REGISTER,
+    DATAGRAM_UNREGISTER: MESSAGE_UNREGISTER,
+    DATAGRAM_HEARTBEAT: MESSAGE_HEARTBEAT,
+    DATAGRAM_TRIGGER: MESSAGE_TRIGGER,
+}
+_MESSAGE_TO_DATAGRAM = dict((message, datagram) for datagram, message in _DATAGRAM_TO_MESSAGE.items())
+
+
+def encode_datagram(*fields: str) -> bytes:
+    """
+    Encodes the message type and its fields into a datagram.
+    """
+    return DATAGRAM_SEPARATOR.join(fields).encode("utf-8")
+
+
+def decode_datagram(data) -> [str]:
+    """
+    Decodes a datagram into the message type followed by its fields.
+    """
+    return bytes(data).decode("utf-8").split(DATAGRAM_SEPARATOR)
+
+
+def _decode_binary_datagram(data, sender) -> [None, [str]]:
+    """
+    Decodes a binary datagram into the same fields as the text datagram, or None if
+    it is not a datagram message.
+    """
+    decoded = decode_message(data)
+    if decoded[FIELD_MESSAGE] not in _MESSAGE_TO_DATAGRAM:
+        debug(f"Ignoring unsupported binary datagram from {sender}")
+        return None
+
+    if decoded[FIELD_MESSAGE] == MESSAGE_TRIGGER:
+        fields = [DATAGRAM_TRIGGER, decoded[FIELD_NAME], str(decoded[FIELD_DELAY])]
+        if decoded[FIELD_START_NS]:
+            fields.append(str(decoded[FIELD_START_NS]))
+        return fields
+
+    return [_MESSAGE_TO_DATAGRAM[decoded[FIELD_MESSAGE]],
+            decoded[FIELD_NAME], decoded[FIELD_ROLE], decoded[FIELD_ADDRESS]]
+
+
+def _get_datagram_host() -> str:
+    if is_running_under_test():
+        return "127.0.0.1"
+    else:
+        return "0.0.0.0"
+
+
+def _get_coordinator_host(coordinator: str) -> str:
+    """
+    The coordinator is stored as the HTTP address of the node which may include
+    the port. Datagrams are always sent to the datagram port so drop it.
+    """
+    return coordinator.split(":")[0]
+
+
+class DatagramService:
+    """
+    DatagramService provides the register, unregister and heartbeat messages of the
+    DirectoryService using UDP datagrams rather than HTTP requests. A node sends
+    datagrams to the coordinator and the coordinator feeds the details it receives
+    into a DirectoryController; typically the one owned by the DirectoryService so
+    the existing HTTP lookup routes continue to work.
+
+    When constructed with a DirectoryController the service acts as a coordinator;
+    it updates the directory and answers discovery requests. When constructed with
+    no coordinator and discover set, the node will broadcast discovery requests
+    until a coordinator responds.
+
+    A coordinator can also trigger every node with a given role at the same instant
+    using trigger_role(). Nodes pass a trigger_callback to be called when triggered.
+
+    Nodes constructed with a ClockSync regularly exchange timestamps with the
+    coordinator to keep the clock synced to the coordinator's clock.
+
+    Instances of this class will need to register() with a Runner in order to work.
+    """
+
+    def __init__(self, directory: DirectoryController = None, coordinator: str = NODE_COORDINATOR,
+                 discover: bool = False, port: int = NETWORK_PORT_DATAGRAM,
+                 coordinator_port: int = NETWORK_PORT_DATAGRAM, broadcast: str = DATAGRAM_BROADCAST_ADDRESS,
+                 trigger_callback: Callable[[], None] = None, clock: ClockSync = None):
+        """
+        :param directory:        The directory to update; only specified for a coordinator.
+        :param coordinator:      The address of the coordinator; None if not known.
+        :param discover:         Whether to broadcast for the coordinator if it is not known.
+        :param port:             The port this node listens on for datagrams.
+        :param coordinator_port: The port the coordinator listens on for datagrams.
+        :param broadcast:        The address discovery requests are sent to.
+        :param trigger_callback: Called when a trigger datagram is received.
+        :param clock:            The clock to sync with the coordinator; only for nodes.
+        """
+        if trigger_callback is not None:
+            if not callable(trigger_callback):
+                raise ValueError("trigger_callback must be Callable")
+
+        self.__runner = None
+        self.__socket = None
+        self.__buffer = bytearray(DATAGRAM_BUFFER_SIZE)
+        self.__requires_register_with_coordinator = True
+        self.__requires_unregister_from_coordinator = False
+        self.directory = directory
+        self.coordinator = coordinator
+        self.discover = discover
+        self.port = port
+        self.coordinator_port = coordinator_port
+        self.broadcast = broadcast
+        self.trigger_callback = trigger_callback
+        self.clock = clock
+        # The address each node sent its datagrams from, used to send triggers.
+        self.__endpoints: dict[str, tuple] = {}
+        # The handler of each type of datagram.
+        self.__handlers = {
+            DATAGRAM_REGISTER: self.__receive_register,
+            DATAGRAM_UNREGISTER: self.__receive_unregister,
+            DATAGRAM_HEARTBEAT: self.__receive_heartbeat,
+            DATAGRAM_DISCOVER: self.__receive_discover,
+            DATAGRAM_COORDINATOR: self.__receive_coordinator,
+            DATAGRAM_TRIGGER: self.__receive_trigger,
+            DATAGRAM_SYNC_REQUEST: self.__receive_sync_request,
+            DATAGRAM_SYNC_RESPONSE: self.__receive_sync_response,
+        }
+        if directory is not None:
+            # Forget the address of nodes the directory removes or that expire.
+            directory.add_listener(self.__directory_changed)
+
+    def __directory_changed(self, version: int, name: str, role: str, address: [None, str]) -> None:
+        if address is None:
+            self.__endpoints.pop(name, None)
+
+    def get_routes(self) -> [Route]:
+        """
+        The built-in routes supported by the DatagramService.
+        """
+        return [
+            Route("/trigger/role/<role>", GET, lambda req, role: trigger_role(req, self, role), append_slash=True),
+        ]
+
+    def register(self, runner: Runner) -> None:
+        """
+        Registers this DatagramService instance as a task with the provided Runner.
+        Multiple separate tasks are registered with the runner.
+        * One to receive and process incoming datagrams; this also handles
+          unregistering from the coordinator during cancellation.
+        * One to send the regular register and heartbeat messages.
+        * One to broadcast discovery requests (only if discovery is enabled).
+        * One to send clock sync requests (only if there is a clock).
+        """
+        self.__runner = runner
+        self.__socket = new_datagram_socket(_get_datagram_host(), self.port)
+
+        runner.add_loop_task(self.__serve_datagrams)
+
+        scheduled_task = (
+            new_scheduled_task(
+                self.__heartbeat,
+                terminate_on_cancel(self.__runner),
+                NETWORK_HEARTBEAT_FREQUENCY))
+        runner.add_task(scheduled_task)
+
+        if self.discover:
+            scheduled_task = (
+                new_scheduled_task(
+                    self.__discover,
+                    terminate_on_cancel(self.__runner),
+                    DATAGRAM_DISCOVERY_FREQUENCY))
+            runner.add_task(scheduled_task)
+
+        if self.clock is not None:
+            scheduled_task = (
+                new_scheduled_task(
+                    self.__sync_clock,
+                    terminate_on_cancel(self.__runner),
+                    CLOCK_SYNC_FREQUENCY))
+            runner.add_task(scheduled_task)
+
+    async def __serve_datagrams(self) -> None:
+        """
+        Processes all waiting datagrams, up to a limit so other tasks can run. On
+        cancellation this unregisters from the coordinator and closes the socket.
+        """
+        if self.__socket is None:
+            return
+
+        if self.__runner.cancel:
+            self.__unregister_from_coordinator()
+            self.__socket.close()
+            self.__socket = None
+            return
+
+        for _ in range(DATAGRAM_MAX_PER_POLL):
+            try:
+                size, sender = self.__socket.recvfrom_into(self.__buffer)
+            except OSError:
+                # Nothing waiting to be read.
+                return
+
+            try:
+                self.receive_datagram(memoryview(self.__buffer)[:size], sender)
+            except Exception as e:
+                error(f"Failed to process datagram from {sender}: {e}")
+
+    async def __heartbeat(self) -> None:
+        """
+        Registers with the coordinator the first time it is called and sends
+        heartbeat messages after that.
+        """
+        if self.coordinator is None:
+            debug("No coordinator known, ignoring heartbeat.")
+            return
+
+        if self.__requires_register_with_coordinator:
+            self.__send_to_coordinator(DATAGRAM_REGISTER)
+            self.__requires_register_with_coordinator = False
+            self.__requires_unregister_from_coordinator = True
+        else:
+            self.__send_to_coordinator(DATAGRAM_HEARTBEAT)
+
+    async def __discover(self) -> None:
+        """
+        Broadcasts a discovery request until a coordinator is known.
+        """
+        if self.coordinator is not None:
+            return
+
+        info("Broadcasting for a coordinator...")
+        self.send_datagram(encode_datagram(DATAGRAM_DISCOVER), (self.broadcast, self.coordinator_port))
+
+    async def __sync_clock(self) -> None:
+        """
+        Sends a clock sync request to the coordinator.
+        """
+        if self.coordinator is None:
+            return
+
+        self.send_datagram(
+            encode_datagram(DATAGRAM_SYNC_REQUEST, str(time.monotonic_ns())),
+            (_get_coordinator_host(self.coordinator), self.coordinator_port))
+
+    def __unregister_from_coordinator(self) -> None:
+        if not self.__requires_unregister_from_coordinator:
+            debug("Nodes does not require un-registration, ignoring.")
+            return
+
+        self.__send_to_coordinator(DATAGRAM_UNREGISTER)
+        self.__requires_unregister_from_coordinator = False
+        self.__requires_register_with_coordinator = True
+
+    def __send_to_coordinator(self, message: str) -> None:
+        details = configuration.details()
+        name, role, address = details[configuration.FIELD_NAME], details[configuration.FIELD_ROLE], get_address()
+
+        data = None
+        if BINARY_MESSAGES:
+            try:
+                data = encode_directory_message(_DATAGRAM_TO_MESSAGE[message], name, role, address)
+            except (ValueError, _STRUCT_ERROR, OSError) as e:
+                debug(f"Sending {message} as text as it cannot be encoded: {e}")
+
+        if data is None:
+            data = encode_datagram(message, name, role, address)
+
+        self.send_datagram(data, (_get_coordinator_host(self.coordinator), self.coordinator_port))
+
+    def send_datagram(self, data: bytes, address) -> None:
+        """
+        Sends a single datagram to the given (host, port) address. Errors are
+        logged and swallowed as datagram delivery is never guaranteed anyway.
+        """
+        if self.__socket is None:
+            return
+
+        try:
+            self.__socket.sendto(data, address)
+        except OSError as e:
+            error(f"Failed to send datagram to {address}: {e}")
+
+    def receive_datagram(self, data, sender) -> None:
+        """
+        Handles a single datagram received from the sender.
+
+        :param data:   The contents of the datagram.
+        :param sender: The (host, port) address the datagram was sent from.
+        """
+        received_ns = time.monotonic_ns()
+        fields = _decode_binary_datagram(data, sender) if is_binary(data) else decode_datagram(data)
+        if fields is None:
+            return
+
+        handler = self.__handlers.get(fields[0])
+        if handler is None:
+            debug(f"Ignoring unknown datagram {fields[0]} from {sender}")
+            return
+
+        handler(fields, sender, received_ns)
+
+    def __receive_trigger(self, fields: [str], sender, received_ns: int) -> None:
+        if self.trigger_callback is None or len(fields) < 3:
+            return
+
+        delay = float(fields[2])
+        if len(fields) >= 4 and self.clock is not None and self.clock.synced:
+            # Worked out in integer nanoseconds so no precision is lost.
+            delay = (self.clock.to_local_ns(int(fields[3])) - received_ns) / NS_PER_SECOND
+        schedule_trigger(self.trigger_callback, delay)
+
+    def __receive_sync_response(self, fields: [str], sender, received_ns: int) -> None:
+        if self.clock is not None and len(fields) >= 4:
+            self.clock.add_sample(int(fields[1]), int(fields[2]), int(fields[3]), received_ns)
+
+    def __receive_coordinator(self, fields: [str], sender, received_ns: int) -> None:
+        if self.coordinator is None and len(fields) >= 2:
+            self.coordinator = fields[1]
+            if self.clock is not None:
+                self.clock.reset()
+            info(f"Discovered coordinator {self.coordinator}")
+
+    # The messages below are only handled by a coordinator.
+
+    def __receive_discover(self, fields: [str], sender, received_ns: int) -> None:
+        if self.directory is not None:
+            self.send_datagram(encode_datagram(DATAGRAM_COORDINATOR, get_address()), sender)
+
+    def __receive_sync_request(self, fields: [str], sender, received_ns: int) -> None:
+        if self.directory is not None and len(fields) >= 2:
+            self.send_datagram(
+                encode_datagram(DATAGRAM_SYNC_RESPONSE, fields[1], str(received_ns), str(time.monotonic_ns())),
+                sender)
+
+    def __receive_register(self, fields: [str], sender, received_ns: int) -> None:
+        if self.__has_details(fields, sender):
+            name, role, address = fields[1], fields[2], fields[3]
+            self.directory.register_endpoint(address, name, role)
+            self.__endpoints[name.strip().lower()] = sender
+            info(f'Registered node: {name}, role: {role}, address: {address}')
+
+    def __receive_heartbeat(self, fields: [str], sender, received_ns: int) -> None:
+        if self.__has_details(fields, sender):
+            name, role, address = fields[1], fields[2], fields[3]
+            self.directory.heartbeat_from_endpoint(address, name, role)
+            self.__endpoints[name.strip().lower()] = sender
+
+    def __receive_unregister(self, fields: [str], sender, received_ns: int) -> None:
+        if self.__has_details(fields, sender):
+            name = fields[1]
+            self.directory.unregister_endpoint(name)
+            self.__endpoints.pop(name.strip().lower(), None)
+            info(f'unregistered node: {name}')
+
+    def __has_details(self, fields: [str], sender) -> bool:
+        """
+        Whether this is a coordinator and the datagram has a name, role and address.
+        """
+        if self.directory is None:
+            return False
+
+        if len(fields) < 4:
+            debug(f"Ignoring malformed datagram from {sender}")
+            return False
+
+        return True
+
+    def trigger_role(self, role: str, delay: float = TRIGGER_FANOUT_DELAY) -> int:
+        """
+        Triggers every node registered with the given role so they all start at
+        the same instant; delay seconds from now. Each datagram carries the time
+        remaining until that shared start time, measured just before it is sent,
+        so nodes later in the list are not started late. Nodes with a synced clock
+        use the start time included in the datagram instead, which also removes
+        the time the datagram took to arrive. Sending a datagram does
+        not wait for the node so the whole fan out takes a few milliseconds even
+        for a large number of nodes.
+
+        Nodes must be running a DatagramService to receive the trigger. Nodes that
+        registered with datagrams are sent the trigger at the address they send
+        from. Nodes that registered over HTTP have no known datagram address, so
+        they are sent it on the host they registered with at this service's port,
+        NETWORK_PORT_DATAGRAM unless another port was given. Returns the number of
+        nodes that were sent the trigger.
+
+        :param role:  The role of the nodes to trigger.
+        :param delay: How long in the future, in seconds, the nodes should start.
+        """
+        if self.directory is None:
+            raise ValueError("Only a coordinator can trigger a role")
+
+        endpoints = self.directory.lookup_endpoints_by_role(role)
+        if not endpoints:
+            return 0
+
+        name = configuration.details()[configuration.FIELD_NAME]
+        start_ns = time.monotonic_ns() + int(delay * NS_PER_SECOND)
+        for endpoint, address in endpoints.items():
+            target = self.__endpoints.get(endpoint)
+            if target is None:
+                # Registered over HTTP so assume the standard datagram port.
+                target = (_get_coordinator_host(address), self.port)
+
+            remaining = max(start_ns - time.monotonic_ns(), 0) / NS_PER_SECOND
+            if BINARY_MESSAGES:
+                data = encode_trigger_message(name, remaining, start_ns)
+            else:
+                data = encode_datagram(DATAGRAM_TRIGGER, name, str(remaining), str(start_ns))
+
+            self.send_datagram(data, target)
+
+        info(f"Triggered {len(endpoints)} nodes with role {role}")
+        return len(endpoints)
+
+
+def trigger_role(request: Request, service: DatagramService, role: str):
+    """
+    Triggers all nodes with the given role to start at the same time. An optional
+    delay query parameter specifies the number of seconds until they start, for
+    example /trigger/role/path?delay=1.5
+    """
+    if request.method != GET:
+        return Response(request, NO, status=NOT_FOUND_404)
+
+    try:
+        delay = float(request.query_params.get("delay", TRIGGER_FANOUT_DELAY))
+    except ValueError:
+        return Response(request, "INVALID_DELAY", status=BAD_REQUEST_400)
+
+    try:
+        count = service.trigger_role(role, delay)
+    except ValueError:
+        return Response(request, NO, status=NOT_FOUND_404)
+
+    return Response(request, f"{TRIGGERED} {count}")
@@ -1,21 +1,60 @@
+import json
 import time
+from random import randint
 
 from adafruit_httpserver import GET, Response, POST, Request, NOT_FOUND_404, OK_200, BAD_REQUEST_400, \
-    PUT, Route, JSONResponse
+    PUT, Route, JSONResponse, Status, SSEResponse, SERVICE_UNAVAILABLE_503
 
 from interactive import configuration
-from interactive.configuration import NODE_COORDINATOR
-from interactive.control import DIRECTORY_EXPIRY_DURATION, DIRECTORY_EXPIRY_FREQUENCY, NETWORK_HEARTBEAT_FREQUENCY
+from interactive.configuration import NODE_COORDINATOR, NODE_COORDINATORS, BINARY_MESSAGES
+from interactive.control import DIRECTORY_EXPIRY_DURATION, DIRECTORY_EXPIRY_FREQUENCY, NETWORK_HEARTBEAT_FREQUENCY, \
+    DIRECTORY_CHANGE_LOG_SIZE, DIRECTORY_RESOLVER_TTL, DIRECTORY_RESOLVER_NEGATIVE_TTL, \
+    DIRECTORY_RESOLVER_REFRESH_AHEAD, DIRECTORY_RESOLVER_REFRESH_FREQUENCY, DIRECTORY_RESOLVER_SIZE, \
+    DIRECTORY_REPLICATION_FREQUENCY, DIRECTORY_REPLICATION_BACKOFF, DIRECTORY_SUBSCRIPTION_FREQUENCY, \
+    DIRECTORY_SUBSCRIPTION_KEEPALIVE, DIRECTORY_MAX_SUBSCRIBERS
 from interactive.environment import is_running_on_desktop
 from interactive.log import info, debug
-from interactive.network import YES, NO, OK, send_message, get_address
+from interactive.metrics import increment, set_gauge, add_collector, remove_collector, METRIC_HEARTBEAT_FAILURES, \
+    METRIC_DIRECTORY_ENDPOINTS, METRIC_RESOLVER_LOOKUPS
+from interactive.network import YES, NO, OK, send_message, get_address, HEADER_CONTENT_TYPE
+from interactive.polyfills.heap import heappush, heappop
 from interactive.runner import Runner
 from interactive.scheduler import new_scheduled_task, terminate_on_cancel
+from interactive.wire import CONTENT_TYPE_BINARY, MESSAGE_REGISTER, MESSAGE_UNREGISTER, MESSAGE_HEARTBEAT, \
+    encode_directory_message, decode_message
 
 # collections.abc is not available in CircuitPython.
 if is_running_on_desktop():
     from collections.abc import Callable
 
+NOT_MODIFIED_304 = Status(304, "Not Modified")
+
+# Heartbeats that only carry the name of the node use this content type.
+CONTENT_TYPE_NAME = "text/plain"
+
+HEADER_ETAG = "ETag"
+HEADER_IF_NONE_MATCH = "If-None-Match"
+HEADER_LAST_EVENT_ID = "Last-Event-ID"
+
+EVENT_SNAPSHOT = "snapshot"
+EVENT_CHANGES = "changes"
+EVENT_ADDED = "added"
+EVENT_REMOVED = "removed"
+EVENT_PING = "ping"
+
+FIELD_VERSION = "version"
+FIELD_ADDED = "added"
+FIELD_REMOVED = "removed"
+FIELD_ENDPOINTS = "endpoints"
+FIELD_NOW = "now"
+
+# The details last accepted by each (coordinator, name), so heartbeats only need
+# to send the name while the details are unchanged.
+_registered: dict[tuple[str, str], dict] = {}
+
+_LABELS_HIT = 'result="hit"'
+_LABELS_MISS = 'result="miss"'
+
 
 # print(request)
 # print(f"METHOD ... : '{request.method}'")
@@ -32,18 +71,70 @@ class DirectoryController:
     on the network and where that information expires after a short time period.
     This class would typically be used in conjunction with DirectoryService which
     provides the networking support.
+
+    Expiry times are kept in a min-heap of (expiry_time, name) entries so checking
+    for expired endpoints only looks at those that are due rather than scanning the
+    whole directory. Re-registering an endpoint pushes a new entry and leaves the
+    old one in the heap; it is ignored when popped because it no longer matches the
+    endpoint's expiry time. Expiry is also checked before every lookup so a lookup
+    never returns an endpoint that has expired.
+
+    An index of role to endpoint names and addresses is kept up to date as endpoints
+    are added, changed and removed so lookups by role do not walk every endpoint.
+    The dictionaries returned by the lookups are cached until the directory changes;
+    a heartbeat that does not change an endpoint does not invalidate them. Callers
+    must not modify the returned dictionaries. The endpoints, the index and the
+    caches all share the same name, address and role strings, with one string per
+    role, so each endpoint costs as little memory as possible.
+
+    Every change increments the version and is recorded in a short change log so
+    changes_since() can return just the endpoints added and removed since a version
+    a node already has. The version starts at a random value so a node holding a
+    version from before a coordinator restart is very unlikely to match it.
+
+    To replicate between coordinators each endpoint also records the wall clock
+    time of the registration or heartbeat that last updated it, and the time it
+    was received by this coordinator. Peers ask for everything received since
+    they last asked, see replica_since(), and merge_replica() keeps whichever
+    update is newest. Unregistered endpoints leave a tombstone behind for the
+    expiry duration so a peer that has not yet seen the removal cannot bring the
+    endpoint back.
     """
 
     class Endpoint:
+        # Slots avoid a dictionary per endpoint on desktop coordinators; CircuitPython
+        # ignores them.
+        __slots__ = ("address", "name", "role", "expiry_time", "updated", "received")
+
         def __init__(self, address, name, role: str):
             self.address = address
             self.name = name
             self.role = role
             self.expiry_time = 0
+            self.updated = 0
+            self.received = 0
 
     def __init__(self):
         self.__runner = None
         self._directory: dict[str, DirectoryController.Endpoint] = {}
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._role_index: dict[str, dict[str, str]] = {}
+        self._roles: dict[str, str] = {}
+        self._all_cache: [None, dict[str, str]] = None
+        self._role_cache: dict[str, dict[str, str]] = {}
+        self.version = randint(0, 1 << 24)
+        # The version each role last changed at, so role lookups are not invalidated
+        # by changes to other roles. Roles with no endpoints are removed once their
+        # last change has left the change log.
+        self._role_versions: dict[str, int] = {}
+        # (version, name, role, address) for each change, the address is None if removed.
+        self._changes: list[tuple[int, str, str, [None, str]]] = []
+        # Set by DirectoryJournal.attach() to persist the changes.
+        self.journal = None
+        # The [updated, received] times of unregistered endpoints.
+        self._tombstones: dict[str, list[float]] = {}
+        # Called with (version, name, role, address) for every change.
+        self._listeners: list = []
 
     def register(self, runner: Runner) -> None:
         """
@@ -66,12 +157,166 @@ class DirectoryController:
         Removes all registered endpoints from this DirectoryController that
         have expired.
         """
-        info("Checking for endpoint expiration.")
+        debug("Checking for endpoint expiration.")
+        self._expire_due_endpoints()
+
+        if self._tombstones:
+            oldest = time.time() - DIRECTORY_EXPIRY_DURATION
+            for name in [name for name, times in self._tombstones.items() if times[1] < oldest]:
+                del self._tombstones[name]
+
+    def _expire_due_endpoints(self) -> None:
+        """
+        Pops the due entries off the expiry heap, removing the endpoints that
+        have expired. The cost is proportional to the number of due entries.
+        """
+        heap = self._expiry_heap
+        if not heap:
+            return
+
         now = time.monotonic()
-        to_remove = [name for name, endpoint in self._directory.items() if endpoint.expiry_time < now]
+        while heap and heap[0][0] < now:
+            expiry_time, name = heappop(heap)
+            endpoint = self._directory.get(name)
+            # Stale entries, from re-registration or unregistering, are simply dropped.
+            if endpoint is not None and endpoint.expiry_time == expiry_time:
+                self._remove_endpoint(name)
+                info(f"Endpoint expired: {name}")
+
+        # Each heartbeat leaves a stale entry behind, rebuild the heap if they build up.
+        if len(heap) > 4 * len(self._directory) + 16:
+            self._expiry_heap = []
+            for name, endpoint in self._directory.items():
+                heappush(self._expiry_heap, (endpoint.expiry_time, name))
+
+    def _set_endpoint(self, name: str, address: str, role: str) -> bool:
+        """
+        Adds or updates the endpoint along with the role index. The name, address
+        and role must already be normalised. Returns whether the endpoint was added
+        or its address or role changed.
+        """
+        # Share one string for each role between all of its endpoints.
+        role = self._roles.setdefault(role, role)
+        endpoint = self._directory.get(name)
+        if endpoint is None:
+            endpoint = DirectoryController.Endpoint(address, name, role)
+            self._directory[name] = endpoint
+
+        elif endpoint.address == address and endpoint.role == role:
+            return False
+
+        else:
+            if endpoint.role != role:
+                self.__remove_from_role_index(endpoint)
+                self._changed(name, endpoint.role, None)
+
+            endpoint.address = address
+            endpoint.role = role
+
+        if role not in self._role_index:
+            self._role_index[role] = {}
+
+        self._role_index[role][name] = address
+        self._changed(name, role, address)
+        return True
+
+    def _remove_endpoint(self, name: str) -> None:
+        """
+        Removes the endpoint, which must exist, along with its role index entry.
+        """
+        endpoint = self._directory.pop(name)
+        self.__remove_from_role_index(endpoint)
+        self._changed(name, endpoint.role, None)
+        if self.journal is not None:
+            self.journal.record_remove(name)
+
+    def __remove_from_role_index(self, endpoint: Endpoint) -> None:
+        names = self._role_index.get(endpoint.role)
+        if names is None:
+            return
+
+        names.pop(endpoint.name, None)
+        if not names:
+            del self._role_index[endpoint.role]
+            del self._roles[endpoint.role]
 
-        for name in to_remove:
-            del self._directory[name]
+    def _changed(self, name: str, role: str, address: [None, str]) -> None:
+        """
+        Called whenever an endpoint is added, changed or removed; the address
+        is None when removed. This bumps the version, records the change and
+        clears the cached lookups.
+        """
+        self.version += 1
+        self._role_versions[role] = self.version
+        self._changes.append((self.version, name, role, address))
+        while len(self._changes) > DIRECTORY_CHANGE_LOG_SIZE:
+            version, _, old_role, _ = self._changes.pop(0)
+            # Nothing can ask for the changes to an empty role once they are gone.
+            if old_role not in self._role_index and self._role_versions.get(old_role) == version:
+                del self._role_versions[old_role]
+
+        self._all_cache = None
+        self._role_cache.pop(role, None)
+
+        for listener in self._listeners:
+            listener(self.version, name, role, address)
+
+    def add_listener(self, listener: Callable[[int, str, str, [None, str]], None]) -> None:
+        """
+        Adds a function that is called with the version, name, role and address of
+        every endpoint that is added, changed or removed; the address is None when
+        removed. Listeners are called whilst the directory is being changed so
+        must be quick and must not change the directory.
+        """
+        self._listeners.append(listener)
+
+    def role_version(self, role: str) -> int:
+        """
+        Returns the version the role last changed at. This can be used as the
+        since version for changes_since() when the same role is specified.
+        """
+        return self._role_versions.get(role.strip().lower(), 0)
+
+    def changes_since(self, since: int, role: str = None) -> [None, dict]:
+        """
+        Returns the endpoints added and removed since the given version, in the form:
+        {
+            "version": 123,
+            "added": {"name_1": "ip:port"},
+            "removed": ["name_2"]
+        }
+
+        An endpoint that changed address is included in added. Only endpoints with
+        the role are included if a role is specified, and the version returned is
+        then the role version. None is returned if the changes are no longer known,
+        in which case the full directory should be fetched.
+        """
+        self._expire_due_endpoints()
+
+        if since > self.version:
+            return None
+
+        if since < self.version and (not self._changes or since < self._changes[0][0] - 1):
+            return None
+
+        if role is not None:
+            role = role.strip().lower()
+
+        added = {}
+        removed = {}
+        for version, name, changed_role, address in self._changes:
+            if version <= since or (role is not None and changed_role != role):
+                continue
+
+            if address is None:
+                added.pop(name, None)
+                removed[name] = True
+            else:
+                added[name] = address
+                removed.pop(name, None)
+
+        version = self.version if role is None else self._role_versions.get(role, since)
+        return {FIELD_VERSION: version, FIELD_ADDED: added, FIELD_REMOVED: list(removed.keys())}
 
     def register_endpoint(self, address: str, name: str, role: str):
         """
@@ -95,15 +340,30 @@ class DirectoryController:
         if len(lookup) <= 0:
             return
 
-        if lookup not in self._directory:
-            self._directory[lookup] = (
-                DirectoryController.Endpoint(address.strip().lower(), lookup, role.strip().lower()))
+        self.__set_endpoint_expiry(
+            lookup, address.strip().lower(), role.strip().lower(), DIRECTORY_EXPIRY_DURATION, time.time())
 
-        self._directory[lookup].address = address.strip().lower()
-        self._directory[lookup].role = role.strip().lower()
-        self._directory[lookup].expiry_time = time.monotonic() + DIRECTORY_EXPIRY_DURATION
+    def restore_endpoint(self, address: str, name: str, role: str, remaining: float) -> None:
+        """
+        Adds an endpoint, already normalised, that expires in the remaining number
+        of seconds rather than the usual expiry duration. This is used to restore
+        a directory that was saved before the coordinator restarted. The update
+        time is not known so any update from a peer coordinator replaces it.
+        """
+        self.__set_endpoint_expiry(name, address, role, remaining, 0)
+
+    def __set_endpoint_expiry(self, name: str, address: str, role: str, duration: float, updated: float) -> None:
+        changed = self._set_endpoint(name, address, role)
 
-        return
+        endpoint = self._directory[name]
+        endpoint.expiry_time = time.monotonic() + duration
+        endpoint.updated = updated
+        endpoint.received = time.time()
+        self._tombstones.pop(name, None)
+        heappush(self._expiry_heap, (endpoint.expiry_time, name))
+        # Only changes are journaled; the journal snapshots the extended expiry times.
+        if changed and self.journal is not None:
+            self.journal.record_set(name, address, role, endpoint.expiry_time)
 
     def unregister_endpoint(self, name):
         """
@@ -119,19 +379,102 @@ class DirectoryController:
         if lookup not in self._directory:
             return
 
-        del self._directory[lookup]
+        self._remove_endpoint(lookup)
+        now = time.time()
+        self._tombstones[lookup] = [now, now]
+
+    def replica_since(self, since: float) -> dict:
+        """
+        Returns the endpoints and removals received since the given time, which
+        is a "now" value returned by an earlier call, in the form:
+        {
+            "now": 1700000000.0,
+            "endpoints": {"name_1": ["ip:port", "role", updated, remaining]},
+            "removed": {"name_2": updated}
+        }
+
+        The remaining time is the number of seconds until the endpoint expires.
+        Pass 0 to return everything.
+        """
+        self._expire_due_endpoints()
+
+        now = time.monotonic()
+        endpoints = {}
+        for name, endpoint in self._directory.items():
+            if endpoint.received >= since:
+                endpoints[name] = [endpoint.address, endpoint.role, endpoint.updated, endpoint.expiry_time - now]
+
+        removed = dict((name, times[0]) for name, times in self._tombstones.items() if times[1] >= since)
+        return {FIELD_NOW: time.time(), FIELD_ENDPOINTS: endpoints, FIELD_REMOVED: removed}
+
+    def merge_replica(self, replica: dict) -> None:
+        """
+        Merges the endpoints and removals returned by replica_since() on a peer
+        coordinator, keeping whichever of each endpoint was updated most recently.
+        """
+        for name, (address, role, updated, remaining) in replica.get(FIELD_ENDPOINTS, {}).items():
+            endpoint = self._directory.get(name)
+            if remaining <= 0 or (endpoint is not None and endpoint.updated >= updated):
+                continue
+
+            tombstone = self._tombstones.get(name)
+            if tombstone is not None and tombstone[0] >= updated:
+                continue
+
+            self.__set_endpoint_expiry(name, address, role, remaining, updated)
+
+        for name, updated in replica.get(FIELD_REMOVED, {}).items():
+            endpoint = self._directory.get(name)
+            if endpoint is not None and endpoint.updated > updated:
+                continue
+
+            tombstone = self._tombstones.get(name)
+            if tombstone is not None and tombstone[0] >= updated:
+                continue
+
+            if endpoint is not None:
+                self._remove_endpoint(name)
+            self._tombstones[name] = [updated, time.time()]
+
+    def refresh_endpoint(self, name: str, address: str = None, role: str = None) -> bool:
+        """
+        Extends the expiry of a registered endpoint. The name is looked up exactly
+        as given, without normalising it, so this is the cheapest way to handle a
+        heartbeat. Returns False if no endpoint has this name, or if an address or
+        role is given that differs from the registered one, in which case the
+        endpoint needs to be registered instead.
+        """
+        endpoint = self._directory.get(name)
+        if endpoint is None:
+            return False
+
+        if (address is not None and address != endpoint.address) or (role is not None and role != endpoint.role):
+            return False
+
+        endpoint.expiry_time = time.monotonic() + DIRECTORY_EXPIRY_DURATION
+        endpoint.updated = endpoint.received = time.time()
+        heappush(self._expiry_heap, (endpoint.expiry_time, name))
+        return True
 
     def heartbeat_from_endpoint(self, address, name, role):
         """
-        Simply forwards to register_endpoint()
+        Extends the expiry of the endpoint if it is registered with the same
+        details, otherwise forwards to register_endpoint().
         """
+        if name is not None and self.refresh_endpoint(name, address, role):
+            return
+
         return self.register_endpoint(address, name, role)
 
     def lookup_all_endpoints(self) -> dict[str, str]:
         """
         Returns the address for all the known nodes.
         """
-        return dict((name, endpoint.address) for name, endpoint in self._directory.items())
+        self._expire_due_endpoints()
+        if self._all_cache is None:
+            self._all_cache = dict((name, endpoint.address) for name, endpoint in self._directory.items())
+
+        return self._all_cache
 
     def lookup_endpoint_by_name(self, name) -> [None, str]:
         """
@@ -144,6 +487,7 @@ class DirectoryController:
         if len(lookup) <= 0:
             return
 
+        self._expire_due_endpoints()
         if lookup not in self._directory:
             return None
 
@@ -160,7 +504,18 @@ class DirectoryController:
         if len(lookup) <= 0:
             return
 
-        return dict((name, endpoint.address) for name, endpoint in self._directory.items() if endpoint.role == lookup)
+        self._expire_due_endpoints()
+        endpoints = self._role_cache.get(lookup)
+        if endpoints is None:
+            # Unknown roles are not cached so they cannot fill up the cache.
+            names = self._role_index.get(lookup)
+            if names is None:
+                return {}
+
+            endpoints = dict(names)
+            self._role_cache[lookup] = endpoints
+
+        return endpoints
 
 
 class DirectoryService:
@@ -180,14 +535,33 @@ class DirectoryService:
 
     Instances of this class will need to register() with a Runner in
     order to work.
+
+    If a DirectoryJournal is provided, the directory is restored from it
+    when registered and every change is then written to it so a restarted
+    coordinator carries on where it left off.
+
+    A coordinator given the addresses of its peer coordinators copies the
+    changes from each of them in turn so every coordinator can answer
+    lookups. A node with more than one coordinator in NODE_COORDINATORS
+    registers with the next one when its coordinator stops answering.
     """
 
-    def __init__(self):
+    def __init__(self, journal=None, peers: list[str] = None):
         self.__runner = None
         self.__requires_register_with_coordinator = NODE_COORDINATOR is not None
         self.__requires_unregister_from_coordinator = NODE_COORDINATOR is not None
         self.__requires_heartbeat_messages = False
         self.directory = DirectoryController()
+        self.subscriptions = DirectorySubscriptions(self.directory)
+        self.journal = journal
+        self.coordinator = NODE_COORDINATOR
+        self.peers = list(peers) if peers else []
+        # The "now" returned by each peer the last time its changes were copied.
+        self.__peer_since: dict[str, float] = {}
+        # When each peer that could not be reached can be tried again.
+        self.__peer_retry: dict[str, float] = {}
+        self.__next_peer = 0
+        self.__collector = None
 
     def get_routes(self) -> [Route]:
         """
@@ -199,8 +573,12 @@ class DirectoryService:
             Route("/unregister", [GET, POST], lambda req: unregister(req, self.directory), append_slash=True),
             Route("/heartbeat", [GET, POST], lambda req: heartbeat(req, self.directory), append_slash=True),
             Route("/lookup/all", GET, lambda req: lookup_all(req, self.directory), append_slash=True),
-            Route("/lookup/name/<name>", GET, lambda req, n: lookup_name(req, self.directory, n), append_slash=True),
-            Route("/lookup/role/<role>", GET, lambda req, r: lookup_role(req, self.directory, r), append_slash=True),
+            Route("/lookup/name/<name>", GET,
+                  lambda req, name: lookup_name(req, self.directory, name), append_slash=True),
+            Route("/lookup/role/<role>", GET,
+                  lambda req, role: lookup_role(req, self.directory, role), append_slash=True),
+            Route("/replicate", GET, lambda req: replicate(req, self.directory), append_slash=True),
+            Route("/subscribe", GET, lambda req: subscribe(req, self.subscriptions), append_slash=True),
         ]
 
     def register(self, runner: Runner) -> None:
@@ -211,9 +589,24 @@ class DirectoryService:
         * One to manage the registration of the node with a coordinator, including sending
           regular heartbeat messages.
         * One to unregister when the task is cancelled.
+        * One to write the journal, if there is one.
+        * One to copy the changes from peer coordinators, if there are any.
+        * One to send the changes to subscribers.
         """
         self.__runner = runner
         self.directory.register(runner)
+        self.subscriptions.register(runner)
+        # Keep the bound method so the same one can be removed again.
+        self.__collector = self.__collect_metrics
+        add_collector(self.__collector)
+
+        if self.journal is not None:
+            self.journal.attach(self.directory)
+            self.journal.register(runner)
+
+        if self.peers:
+            runner.add_task(
+                new_scheduled_task(self.__replicate, terminate_on_cancel(runner), DIRECTORY_REPLICATION_FREQUENCY))
 
         runner.add_loop_task(self.__handle_cancellation)
 
@@ -226,6 +619,9 @@ class DirectoryService:
                     NETWORK_HEARTBEAT_FREQUENCY))
             runner.add_task(scheduled_task)
 
+    def __collect_metrics(self) -> None:
+        set_gauge(METRIC_DIRECTORY_ENDPOINTS, len(self.directory.lookup_all_endpoints()))
+
     async def __handle_cancellation(self) -> None:
         """
         Handles unregistering with the coordinator during shutdown.
@@ -235,6 +631,12 @@ class DirectoryService:
             # a task scheduler which checks for cancellation and
             # prevents client code running in such a scenario.
             await self.__unregister_from_coordinator()
+            if self.journal is not None:
+                self.journal.close()
+            self.subscriptions.close()
+            if self.__collector is not None:
+                remove_collector(self.__collector)
+                self.__collector = None
 
     async def __heartbeat(self) -> None:
         """
@@ -244,10 +646,61 @@ class DirectoryService:
         check. Therefore, the cancellation is checked __serve_requests()
         """
         if self.__requires_heartbeat_messages:
-            send_heartbeat_message(NODE_COORDINATOR)
+            if send_heartbeat_message(self.coordinator) == NO:
+                increment(METRIC_HEARTBEAT_FAILURES)
+                self.__fail_over()
 
         await self.__register_with_coordinator()
 
+    def __fail_over(self) -> bool:
+        """
+        Moves on to the next coordinator, if there is more than one, so the node
+        registers with it. Returns True if the coordinator changed.
+        """
+        coordinators = [NODE_COORDINATOR] + [node for node in NODE_COORDINATORS if node != NODE_COORDINATOR]
+        if len(coordinators) < 2:
+            return False
+
+        index = coordinators.index(self.coordinator) if self.coordinator in coordinators else -1
+        self.coordinator = coordinators[(index + 1) % len(coordinators)]
+        info(f"Failing over to coordinator {self.coordinator}")
+        self.__requires_register_with_coordinator = True
+        self.__requires_heartbeat_messages = False
+        return True
+
+    async def __replicate(self) -> None:
+        """
+        Copies the changes from the next peer coordinator that is not backing off.
+        On desktop the message is sent from a worker thread so this coordinator
+        keeps answering requests, including those from a peer that is asking it
+        for changes at the same time; otherwise two coordinators asking each other
+        would both wait for the message timeout. On a microcontroller the message
+        blocks, so only one peer is asked each time.
+        """
+        now = time.monotonic()
+        for _ in range(len(self.peers)):
+            peer = self.peers[self.__next_peer % len(self.peers)]
+            self.__next_peer += 1
+            if self.__peer_retry.get(peer, 0) > now:
+                continue
+
+            try:
+                since = self.__peer_since.get(peer, 0)
+                if is_running_on_desktop():
+                    import asyncio
+                    replica = await asyncio.to_thread(send_replicate_message, peer, since)
+                else:
+                    replica = send_replicate_message(peer, since)
+
+                self.directory.merge_replica(replica)
+                self.__peer_since[peer] = replica[FIELD_NOW]
+                self.__peer_retry.pop(peer, None)
+            except Exception as e:
+                debug(f"Failed to replicate from {peer}: {e}")
+                self.__peer_retry[peer] = now + DIRECTORY_REPLICATION_BACKOFF
+
+            return
+
     async def __register_with_coordinator(self):
         """
         Registers this node with the controller node.
@@ -256,7 +709,9 @@ class DirectoryService:
             debug("Nodes does not require registration, ignoring.")
             return
 
-        send_register_message(NODE_COORDINATOR)
+        if send_register_message(self.coordinator) == NO and self.__fail_over():
+            return
+
         self.__requires_register_with_coordinator = False
         self.__requires_unregister_from_coordinator = True
         self.__requires_heartbeat_messages = True
@@ -270,12 +725,303 @@ class DirectoryService:
             debug("Nodes does not require un-registration, ignoring.")
             return
 
-        send_unregister_message(NODE_COORDINATOR)
+        send_unregister_message(self.coordinator)
         self.__requires_unregister_from_coordinator = False
         self.__requires_register_with_coordinator = True
         self.__requires_heartbeat_messages = False
 
 
+class DirectorySubscriptions:
+    """
+    DirectorySubscriptions streams the changes made to a DirectoryController to
+    subscribers as server-sent events, so dashboards and nodes tracking their
+    peers do not have to keep polling /lookup/all. Each subscriber can be limited
+    to a single role. The events are:
+
+      snapshot - {"version": 123, "endpoints": {"name": "ip:port"}}, sent first.
+      changes  - the same as DirectoryController.changes_since(), sent first
+                 instead of the snapshot when resuming from a known version.
+      added    - {"name": "name", "role": "role", "address": "ip:port"}, sent
+                 when an endpoint appears or changes address.
+      removed  - {"name": "name", "role": "role"}, sent when an endpoint is
+                 unregistered or expires.
+      ping     - sent when nothing else has been sent for a while, so closed
+                 connections are noticed.
+
+    Every event has the directory version as its id so a client that reconnects
+    sends it back as the Last-Event-ID header and only receives what it missed.
+
+    Changes are queued by a listener on the DirectoryController and sent by a
+    scheduled task, so the requests that change the directory are never held
+    up writing to subscribers. Nothing is queued when there are no subscribers.
+    """
+
+    class Subscriber:
+        def __init__(self, response: SSEResponse, role: [None, str], since: [None, int]):
+            self.response = response
+            self.role = role
+            self.since = since
+            # The version the subscriber is up to date with, None until the first events are sent.
+            self.version = None
+            self.last_sent = time.monotonic()
+
+    def __init__(self, directory: DirectoryController):
+        self.directory = directory
+        self._subscribers: list[DirectorySubscriptions.Subscriber] = []
+        self._pending: list[tuple[int, str, str, [None, str]]] = []
+        directory.add_listener(self.__changed)
+
+    def register(self, runner: Runner) -> None:
+        """
+        Registers the task which sends the changes with the provided Runner.
+        """
+        runner.add_task(
+            new_scheduled_task(self.__send_events, terminate_on_cancel(runner), DIRECTORY_SUBSCRIPTION_FREQUENCY))
+
+    def subscribe(self, request: Request, role: str = None, since: int = None) -> Response:
+        """
+        Returns the response that streams the changes, optionally only those for
+        the role and starting from the since version.
+        """
+        if len(self._subscribers) >= DIRECTORY_MAX_SUBSCRIBERS:
+            return Response(request, "TOO_MANY_SUBSCRIBERS", status=SERVICE_UNAVAILABLE_503)
+
+        response = SSEResponse(request)
+        self._subscribers.append(DirectorySubscriptions.Subscriber(response, role, since))
+        return response
+
+    def close(self) -> None:
+        """
+        Closes every subscriber's connection.
+        """
+        for subscriber in self._subscribers:
+            try:
+                subscriber.response.close()
+            except Exception:
+                pass
+
+        self._subscribers.clear()
+        self._pending.clear()
+
+    def __changed(self, version: int, name: str, role: str, address: [None, str]) -> None:
+        if self._subscribers:
+            self._pending.append((version, name, role, address))
+
+    def __send_first_events(self, subscriber: Subscriber) -> None:
+        """
+        Sends the changes since the version the subscriber resumed from or, if
+        they are not known, a snapshot of the endpoints.
+        """
+        directory = self.directory
+        if subscriber.since is not None:
+            changes = directory.changes_since(subscriber.since, subscriber.role)
+            if changes is not None:
+                subscriber.response.send_event(json.dumps(changes), event=EVENT_CHANGES, id=directory.version)
+                return
+
+        if subscriber.role is None:
+            endpoints = directory.lookup_all_endpoints()
+        else:
+            endpoints = directory.lookup_endpoints_by_role(subscriber.role)
+
+        snapshot = {FIELD_VERSION: directory.version, FIELD_ENDPOINTS: endpoints}
+        subscriber.response.send_event(json.dumps(snapshot), event=EVENT_SNAPSHOT, id=directory.version)
+
+    async def __send_events(self) -> None:
+        """
+        Sends the queued changes to every subscriber, removing the subscribers
+        whose connection has closed.
+        """
+        if not self._subscribers:
+            return
+
+        pending = self._pending
+        self._pending = []
+        now = time.monotonic()
+        for subscriber in list(self._subscribers):
+            try:
+                if subscriber.version is None:
+                    self.__send_first_events(subscriber)
+                    subscriber.version = self.directory.version
+                    subscriber.last_sent = now
+
+                for version, name, role, address in pending:
+                    if version <= subscriber.version or (subscriber.role is not None and role != subscriber.role):
+                        continue
+
+                    if address is None:
+                        data = json.dumps({"name": name, "role": role})
+                        subscriber.response.send_event(data, event=EVENT_REMOVED, id=version)
+                    else:
+                        data = json.dumps({"name": name, "role": role, "address": address})
+                        subscriber.response.send_event(data, event=EVENT_ADDED, id=version)
+                    subscriber.last_sent = now
+
+                if pending:
+                    subscriber.version = max(subscriber.version, pending[-1][0])
+
+                if subscriber.last_sent < now and now - subscriber.last_sent >= DIRECTORY_SUBSCRIPTION_KEEPALIVE:
+                    subscriber.response.send_event("", event=EVENT_PING)
+                    subscriber.last_sent = now
+
+            except Exception as e:
+                debug(f"Removing subscriber: {e}")
+                self._subscribers.remove(subscriber)
+                try:
+                    subscriber.response.close()
+                except Exception:
+                    pass
+
+
+class DirectoryResolver:
+    """
+    DirectoryResolver is used by a node to find the address of another node by
+    name without asking the coordinator every time. Addresses returned by the
+    coordinator are cached for DIRECTORY_RESOLVER_TTL and names the coordinator
+    does not know are cached for DIRECTORY_RESOLVER_NEGATIVE_TTL so a node that
+    keeps asking for a missing peer does not keep asking the coordinator.
+
+    Once registered with a Runner, addresses that have been used are refreshed in
+    the background shortly before they expire so a node talking regularly to the
+    same peers only waits on the coordinator for the first lookup. If the
+    coordinator cannot be reached the last known address is used for as long as
+    the peer could still be registered (DIRECTORY_EXPIRY_DURATION).
+
+    Lookups are blocking HTTP requests, so a refresh stalls every other task for
+    up to SEND_MESSAGE_TIMEOUT while it waits on the coordinator. To limit this
+    only one address is refreshed each time, and refreshes stop for
+    DIRECTORY_RESOLVER_NEGATIVE_TTL after a lookup fails so an unreachable
+    coordinator does not stall the node every DIRECTORY_RESOLVER_REFRESH_FREQUENCY.
+
+    At most DIRECTORY_RESOLVER_SIZE names are cached; when full the entry that
+    expires soonest is replaced.
+    """
+
+    class Entry:
+        def __init__(self, address: [None, str], expiry_time: float, stale_time: float):
+            self.address = address
+            self.expiry_time = expiry_time
+            self.stale_time = stale_time
+            self.used = False
+
+    def __init__(self, coordinator: str = NODE_COORDINATOR,
+                 lookup: Callable[[str, str], [None, str]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param coordinator: The node to look names up with.
+        :param lookup: Looks up a name with a node, returning the address or None
+                       if the name is not known; raises an exception if the node
+                       cannot be reached. Defaults to send_lookup_name_message().
+        :param clock: Returns the current time in seconds.
+        """
+        self.coordinator = coordinator
+        self.__lookup = lookup if lookup is not None else send_lookup_name_message
+        self.__clock = clock
+        self._cache: dict[str, DirectoryResolver.Entry] = {}
+        # No background refreshes are made before this time after a lookup fails.
+        self.__refresh_time = 0
+
+    def register(self, runner: Runner) -> None:
+        """
+        Registers the background refresh as a task with the provided Runner.
+        """
+        runner.add_task(
+            new_scheduled_task(self.__refresh, terminate_on_cancel(runner), DIRECTORY_RESOLVER_REFRESH_FREQUENCY))
+
+    def resolve(self, name: str) -> [None, str]:
+        """
+        Returns the address for the name, or None if it is not known.
+        """
+        if name is None:
+            return None
+
+        name = name.strip().lower()
+        if len(name) <= 0:
+            return None
+
+        now = self.__clock()
+        entry = self._cache.get(name)
+        if entry is not None and now < entry.expiry_time:
+            increment(METRIC_RESOLVER_LOOKUPS, labels=_LABELS_HIT)
+            entry.used = True
+            return entry.address
+
+        increment(METRIC_RESOLVER_LOOKUPS, labels=_LABELS_MISS)
+        entry = self.__fetch(name, entry, now)
+        entry.used = True
+        return entry.address
+
+    def invalidate(self, name: str = None) -> None:
+        """
+        Removes the name from the cache, for example after a message to its address
+        failed, or removes every name if no name is given.
+        """
+        if name is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(name.strip().lower(), None)
+
+    def __fetch(self, name: str, entry: [None, Entry], now: float) -> Entry:
+        """
+        Looks the name up with the coordinator and caches the result.
+        """
+        try:
+            address = self.__lookup(self.coordinator, name)
+        except Exception as e:
+            debug(f"Failed to lookup {name}: {e}")
+            self.__refresh_time = now + DIRECTORY_RESOLVER_NEGATIVE_TTL
+            if entry is not None and entry.address is not None and now < entry.stale_time:
+                entry.expiry_time = max(entry.expiry_time, now + DIRECTORY_RESOLVER_NEGATIVE_TTL)
+                return entry
+
+            address = None
+
+        if address is None:
+            entry = DirectoryResolver.Entry(None, now + DIRECTORY_RESOLVER_NEGATIVE_TTL,
+                                            now + DIRECTORY_RESOLVER_NEGATIVE_TTL)
+        else:
+            entry = DirectoryResolver.Entry(address, now + DIRECTORY_RESOLVER_TTL, now + DIRECTORY_EXPIRY_DURATION)
+
+        if name not in self._cache and len(self._cache) >= DIRECTORY_RESOLVER_SIZE:
+            soonest = None
+            for key, value in self._cache.items():
+                if soonest is None or value.expiry_time < self._cache[soonest].expiry_time:
+                    soonest = key
+
+            del self._cache[soonest]
+
+        self._cache[name] = entry
+        return entry
+
+    async def __refresh(self) -> None:
+        """
+        Refreshes the used address that is closest to expiry and removes entries
+        that can no longer be used. Only one address is refreshed each time so the
+        other tasks are never held up by more than one lookup, and none are whilst
+        the coordinator has recently failed to answer.
+        """
+        now = self.__clock()
+        due_name = None
+        due = None
+        removed = []
+        for name, entry in self._cache.items():
+            if now >= entry.stale_time:
+                removed.append(name)
+            elif entry.used and entry.address is not None and \
+                    entry.expiry_time - now < DIRECTORY_RESOLVER_REFRESH_AHEAD:
+                if due is None or entry.expiry_time < due.expiry_time:
+                    due_name = name
+                    due = entry
+
+        for name in removed:
+            del self._cache[name]
+
+        if due is not None and now >= self.__refresh_time:
+            # Only refresh again if the address is used again.
+            due.used = False
+            self.__fetch(due_name, due, now)
+
+
 ###############################################################
 # ***** D I R E C T O R Y    S E R V I C E    R O U T E S *****
 ###############################################################
@@ -331,6 +1077,33 @@ def heartbeat(request: Request, directory: DirectoryController):
     return __standard_directory_method(request, directory, send_heartbeat_message, receive_heartbeat_message)
 
 
+def __versioned_lookup(request: Request, directory: DirectoryController, endpoints: dict, version: int,
+                       role: str = None):
+    """
+    Returns the endpoints with the version as an ETag. If the request has a
+    matching If-None-Match header a 304 is returned with no body instead. If the
+    request has a since query parameter then only the changes since that version
+    are returned, see DirectoryController.changes_since(), unless they are no
+    longer known in which case all the endpoints are returned.
+    """
+    etag = f'"{version}"'
+    headers = {HEADER_ETAG: etag}
+    if request.headers.get(HEADER_IF_NONE_MATCH) == etag:
+        return Response(request, "", status=NOT_MODIFIED_304, headers=headers)
+
+    since = request.query_params.get("since")
+    if since is not None:
+        try:
+            changes = directory.changes_since(int(since), role)
+        except ValueError:
+            return Response(request, "INVALID_VERSION", status=BAD_REQUEST_400)
+
+        if changes is not None:
+            return JSONResponse(request, changes, headers=headers)
+
+    return JSONResponse(request, endpoints, headers=headers)
+
+
 def lookup_all(request: Request, directory: DirectoryController):
     """
     Return all known nodes as a JSON response in the following form:
@@ -339,11 +1112,15 @@ def lookup_all(request: Request, directory: DirectoryController):
         "name_2": "ip:port",
         "name_3": "ip:port",
     }
+
+    The directory version is returned as the ETag. Passing it back as the since
+    query parameter, for example /lookup/all?since=123, returns just the changes.
     """
     if request.method != GET:
         return Response(request, NO, status=NOT_FOUND_404)
 
-    return JSONResponse(request, directory.lookup_all_endpoints())
+    endpoints = directory.lookup_all_endpoints()
+    return __versioned_lookup(request, directory, endpoints, directory.version)
 
 
 def lookup_name(request: Request, directory: DirectoryController, name: str):
@@ -370,28 +1147,117 @@ def lookup_role(request: Request, directory: DirectoryController, role: str):
         "name_2": "ip:port",
         "name_3": "ip:port",
     }
+
+    The version the role last changed at is returned as the ETag and can be
+    passed back as the since query parameter to return just the changes.
     """
     if request.method != GET:
         return Response(request, NO, status=NOT_FOUND_404)
 
-    return JSONResponse(request, directory.lookup_endpoints_by_role(role))
+    endpoints = directory.lookup_endpoints_by_role(role)
+    if endpoints is None:
+        return JSONResponse(request, {})
+
+    return __versioned_lookup(request, directory, endpoints, directory.role_version(role), role)
+
+
+def replicate(request: Request, directory: DirectoryController):
+    """
+    Returns the endpoints and removals received since the time given by the
+    since query parameter, as returned by DirectoryController.replica_since().
+    This is used by peer coordinators to copy the directory.
+    """
+    if request.method != GET:
+        return Response(request, NO, status=NOT_FOUND_404)
+
+    try:
+        since = float(request.query_params.get("since") or 0)
+    except ValueError:
+        return Response(request, "INVALID_SINCE", status=BAD_REQUEST_400)
+
+    return JSONResponse(request, directory.replica_since(since))
+
+
+def subscribe(request: Request, subscriptions: DirectorySubscriptions):
+    """
+    Streams the directory changes as server-sent events, see DirectorySubscriptions.
+    The role query parameter only streams the changes for that role and the since
+    query parameter, or the Last-Event-ID header sent by a reconnecting client,
+    resumes from that version. For example: /subscribe?role=path&since=123
+    """
+    if request.method != GET:
+        return Response(request, NO, status=NOT_FOUND_404)
+
+    role = request.query_params.get("role")
+    if role is not None:
+        role = role.strip().lower()
+
+    since = request.query_params.get("since") or request.headers.get(HEADER_LAST_EVENT_ID)
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return Response(request, "INVALID_VERSION", status=BAD_REQUEST_400)
+
+    return subscriptions.subscribe(request, role, since)
 
 
 ###################################################################
 # ***** D I R E C T O R Y    S E R V I C E    M E S S A G E S *****
 ###################################################################
 
-def send_register_message(node: str) -> str:
+def _send_directory_message(node: str, path: str, message: int, data: dict) -> Response:
     """
-    Sends a register message to the specified node.
+    Sends the node details to the specified node. When BINARY_MESSAGES is set the
+    details are sent using the compact binary encoding, falling back to JSON if
+    they cannot be encoded (for example the address is not an IPv4 address).
+    """
+    if BINARY_MESSAGES:
+        try:
+            payload = encode_directory_message(
+                message, data[configuration.FIELD_NAME], data[configuration.FIELD_ROLE], data["address"])
+            return send_message(host=node, path=path, method=POST, data=payload, content_type=CONTENT_TYPE_BINARY)
+        except ValueError:
+            pass
+
+    return send_message(host=node, path=path, method=POST, json=data)
+
+
+def _get_directory_details(details: dict = None) -> dict:
+    """
+    Returns the details to send in a directory message; those of this node
+    unless other details are provided.
+    """
+    if details is not None:
+        return details
+
+    data = configuration.details()
+    data["address"] = get_address()
+    return data
+
+
+def _parse_directory_message(request: Request) -> dict:
+    """
+    Returns the body of the request as a dictionary; decoding it based on the content type.
+    """
+    if request.headers.get(HEADER_CONTENT_TYPE) == CONTENT_TYPE_BINARY:
+        return decode_message(request.body)
+
+    return request.json()
+
+
+def send_register_message(node: str, details: dict = None) -> str:
+    """
+    Sends a register message to the specified node. The details (name, role
+    and address) default to those of this node.
     """
     info(f"Registering with {node}...")
 
     try:
-        data = configuration.details()
-        data["address"] = get_address()
-        with send_message(host=node, path='/register', json=data) as response:
-            if response._status == OK_200:
+        data = _get_directory_details(details)
+        with _send_directory_message(node, '/register', MESSAGE_REGISTER, data) as response:
+            if response.status_code == OK_200.code:
+                _registered[(node, data[configuration.FIELD_NAME])] = data
                 return YES
             else:
                 return NO
@@ -409,6 +1275,9 @@ def receive_register_message(request: Request, directory: DirectoryController) -
         "name": "node_name",
         "role": "node_role"
     }
+
+    The body can also use the binary encoding from wire.py if the request has
+    a Content-Type of CONTENT_TYPE_BINARY.
     """
     info("Registering node...")
 
@@ -419,7 +1288,7 @@ def receive_register_message(request: Request, directory: DirectoryController) -
         raise ValueError("No directory controller specified")
 
     try:
-        data = request.json()
+        data = _parse_directory_message(request)
         if "address" not in data:
             return Response(request, "NO_ADDRESS_SPECIFIED", status=BAD_REQUEST_400)
 
@@ -438,17 +1307,18 @@ def receive_register_message(request: Request, directory: DirectoryController) -
     return Response(request, OK)
 
 
-def send_unregister_message(node: str) -> str:
+def send_unregister_message(node: str, details: dict = None) -> str:
     """
-    Sends an unregister message to the specified node.
+    Sends an unregister message to the specified node. The details (name, role
+    and address) default to those of this node.
     """
     info(f"Registering from {node}...")
 
     try:
-        data = configuration.details()
-        data["address"] = get_address()
-        with send_message(host=node, path='/unregister', json=data) as response:
-            if response._status == OK_200:
+        data = _get_directory_details(details)
+        _registered.pop((node, data[configuration.FIELD_NAME]), None)
+        with _send_directory_message(node, '/unregister', MESSAGE_UNREGISTER, data) as response:
+            if response.status_code == OK_200.code:
                 return YES
             else:
                 return NO
@@ -474,7 +1344,7 @@ def receive_unregister_message(request: Request, directory: DirectoryController)
         raise ValueError("No directory controller specified")
 
     try:
-        data = request.json()
+        data = _parse_directory_message(request)
         if "name" not in data:
             return Response(request, "NO_NAME_SPECIFIED", status=BAD_REQUEST_400)
 
@@ -487,17 +1357,31 @@ def receive_unregister_message(request: Request, directory: DirectoryController)
     return Response(request, OK)
 
 
-def send_heartbeat_message(node: str) -> str:
+def send_heartbeat_message(node: str, details: dict = None) -> str:
     """
-    Sends a heartbeat message to the specified node.
+    Sends a heartbeat message to the specified node. The details (name, role
+    and address) default to those of this node. Once the node has accepted
+    the details only the name is sent, for as long as the details do not
+    change. If the node no longer knows the name, for example because it has
+    restarted, the heartbeat is sent again with all the details.
     """
     info(f"Heartbeat with {node}...")
 
     try:
-        data = configuration.details()
-        data["address"] = get_address()
-        with send_message(host=node, path='/heartbeat', json=data) as response:
-            if response._status == OK_200:
+        data = _get_directory_details(details)
+        key = (node, data[configuration.FIELD_NAME])
+        if _registered.get(key) == data:
+            name = bytes(data[configuration.FIELD_NAME].strip().lower(), "utf-8")
+            with send_message(host=node, path='/heartbeat', method=POST, data=name,
+                              content_type=CONTENT_TYPE_NAME) as response:
+                if response.status_code == OK_200.code:
+                    return YES
+                elif response.status_code != NOT_FOUND_404.code:
+                    return NO
+
+        with _send_directory_message(node, '/heartbeat', MESSAGE_HEARTBEAT, data) as response:
+            if response.status_code == OK_200.code:
+                _registered[key] = data
                 return YES
             else:
                 return NO
@@ -508,13 +1392,52 @@ def send_heartbeat_message(node: str) -> str:
 
 def receive_heartbeat_message(request: Request, directory: DirectoryController) -> Response:
     """
-    This simply re-routes to register as it is effectively the same.
-
-    FUTURE: We could at some future point put in an optimisation here to
-            lookup whether an item has already been registered. If such
-            a case, we would already have the address, name and role so
-            as long as at least one of or name was registered, the other
-            data would become optional.
+    Heartbeats are by far the most common message so a heartbeat with a
+    Content-Type of CONTENT_TYPE_NAME only carries the name of the node. The
+    name is looked up exactly as sent, with no parsing or normalising, and
+    its expiry extended. If the name is not registered NOT_FOUND_404 is
+    returned so the node can send its details instead.
+
+    A heartbeat with the details re-routes to register as it is effectively
+    the same.
     """
+    if request is None:
+        raise ValueError("No request specified")
+
+    if directory is None:
+        raise ValueError("No directory controller specified")
+
+    if request.headers.get(HEADER_CONTENT_TYPE) == CONTENT_TYPE_NAME:
+        if directory.refresh_endpoint(str(request.body, "utf-8")):
+            return Response(request, OK)
+
+        return Response(request, "UNKNOWN_NAME", status=NOT_FOUND_404)
+
     info("Received heartbeat message...")
     return receive_register_message(request, directory)
+
+
+def send_lookup_name_message(node: str, name: str) -> [None, str]:
+    """
+    Looks up the address of the named node with the specified node, returning
+    None if the name is not known. Unlike the other messages, failures raise an
+    exception so callers can tell an unreachable node from an unknown name.
+    """
+    with send_message(host=node, path=f"/lookup/name/{name}") as response:
+        if response.status_code != OK_200.code:
+            raise ValueError(f"Lookup of {name} failed with status {response.status_code}")
+
+        return response.json().get("address")
+
+
+def send_replicate_message(node: str, since: float) -> dict:
+    """
+    Returns the endpoints and removals the specified coordinator has received
+    since the given time, which is in that coordinator's clock. Failures raise
+    an exception.
+    """
+    with send_message(host=node, path=f"/replicate?since={since!r}") as response:
+        if response.status_code != OK_200.code:
+            raise ValueError(f"Replicate failed with status {response.status_code}")
+
+        return response.json()
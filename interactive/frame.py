@@ -0,0 +1,164 @@
+# This file contains a frame clock that steps every animation on a common frame
+# boundary. Without it each animation is stepped from its own loop task and shows
+# its own pixels, so strips are written at unrelated times and a busy loop, such
+# as one serving network requests, makes some animations stutter more than others.
+#
+# The FrameClock is registered with the Runner and once every 1 / FRAME_RATE
+# seconds it animates each of its animations without showing them, animates each
+# of its compositors and then shows every strip that was drawn, once. Animations
+# still only draw at their own speed; the frame clock just decides when.
+#
+# When the loop falls behind, the missed frames are skipped rather than drawn
+# back to back to catch up, so the animations keep their pace. The recent frame
+# times and frame rate are kept so stats() can report them, and they are also
+# recorded as metrics labelled with the name of the clock.
+import time
+
+from interactive.control import FRAME_RATE, FRAME_SAMPLE_COUNT
+from interactive.environment import is_running_on_desktop
+from interactive.metrics import observe, increment, set_gauge, add_collector, remove_collector, \
+    METRIC_FRAME_SECONDS, METRIC_FRAMES_SKIPPED, METRIC_FRAMES_PER_SECOND
+from interactive.runner import Runner
+
+# collections.abc is not available in CircuitPython.
+if is_running_on_desktop():
+    from collections.abc import Callable
+
+
+class FrameClock:
+    """
+    FrameClock steps all of its animations and compositors once per frame at the
+    target frame rate and shows each strip or LED that was drawn once per frame.
+    Add animations and animation sequences with add_animation(), compositors with
+    add_compositor(), and then register() with a Runner.
+    """
+
+    def __init__(self, fps: float = FRAME_RATE, clock: Callable[[], float] = time.monotonic,
+                 name: str = "frame"):
+        """
+        :param fps: The target number of frames per second.
+        :param clock: Returns the current time in seconds.
+        :param name: The name the metrics are labelled with, unique to each clock.
+        """
+        if fps <= 0:
+            raise ValueError("fps must be greater than 0")
+
+        self.fps = fps
+        self.name = name
+        self.frames = 0
+        self.skipped = 0
+        self.__runner = None
+        self.__clock = clock
+        self.__interval = 1 / fps
+        self.__next_frame = None
+        self.__labels = f'clock="{name}"'
+        self.__collector = None
+        self._animations = []
+        self._compositors = []
+        # The start and duration of the recent frames, used as ring buffers.
+        self.__starts = [0.0] * FRAME_SAMPLE_COUNT
+        self.__durations = [0.0] * FRAME_SAMPLE_COUNT
+
+    def add_animation(self, animation) -> None:
+        """
+        Adds an animation, or animation sequence, to step every frame.
+        """
+        self._animations.append(animation)
+
+    def add_compositor(self, compositor) -> None:
+        """
+        Adds a compositor to step every frame.
+        """
+        self._compositors.append(compositor)
+
+    def register(self, runner: Runner) -> None:
+        """
+        Registers this FrameClock instance as a task with the provided Runner.
+
+        :param runner: the runner to register with.
+        """
+        self.__runner = runner
+        runner.add_loop_task(self.__loop)
+        # Keep the bound method so the same one can be removed again.
+        self.__collector = self.__collect_metrics
+        add_collector(self.__collector)
+
+    async def __loop(self) -> None:
+        if not self.__runner.cancel:
+            self.tick()
+        elif self.__collector is not None:
+            remove_collector(self.__collector)
+            self.__collector = None
+
+    def __collect_metrics(self) -> None:
+        set_gauge(METRIC_FRAMES_PER_SECOND, self.stats()["fps"], self.__labels)
+
+    def tick(self) -> bool:
+        """
+        Steps a frame if one is due, skipping any frames that were missed. Returns
+        whether a frame was stepped.
+        """
+        now = self.__clock()
+        if self.__next_frame is None:
+            self.__next_frame = now
+
+        if now < self.__next_frame:
+            return False
+
+        missed = int((now - self.__next_frame) / self.__interval)
+        if missed:
+            self.skipped += missed
+            increment(METRIC_FRAMES_SKIPPED, missed, self.__labels)
+        self.__next_frame += (missed + 1) * self.__interval
+
+        self.step()
+
+        duration = self.__clock() - now
+        sample = self.frames % FRAME_SAMPLE_COUNT
+        self.__starts[sample] = now
+        self.__durations[sample] = duration
+        self.frames += 1
+        observe(METRIC_FRAME_SECONDS, duration, self.__labels)
+        return True
+
+    def step(self) -> None:
+        """
+        Steps every animation and compositor and then shows each strip that was drawn.
+        """
+        drawn = []
+        for animation in self._animations:
+            if animation.animate(False):
+                # Sequences draw with their current animation.
+                pixels = getattr(animation, "current_animation", animation).pixel_object
+                if not any(pixels is strip for strip in drawn):
+                    drawn.append(pixels)
+
+        for compositor in self._compositors:
+            compositor.animate()
+
+        for pixels in drawn:
+            pixels.show()
+
+    def stats(self) -> dict:
+        """
+        Returns the achieved frames per second and the 50th, 95th and 99th percentile
+        frame times in seconds over the recent frames, along with the total number of
+        frames stepped and skipped.
+        """
+        count = min(self.frames, FRAME_SAMPLE_COUNT)
+        stats = {"fps": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "frames": self.frames, "skipped": self.skipped}
+        if count == 0:
+            return stats
+
+        durations = sorted(self.__durations[:count])
+        stats["p50"] = durations[int(count * 0.50)]
+        stats["p95"] = durations[min(int(count * 0.95), count - 1)]
+        stats["p99"] = durations[min(int(count * 0.99), count - 1)]
+
+        if count > 1:
+            newest = self.__starts[(self.frames - 1) % FRAME_SAMPLE_COUNT]
+            oldest = self.__starts[(self.frames - count) % FRAME_SAMPLE_COUNT]
+            if newest > oldest:
+                stats["fps"] = (count - 1) / (newest - oldest)
+
+        return stats
@@ -0,0 +1,378 @@
+# This file contains a cache of pre-rendered animation frames. Animations such as
+# Chase, Comet, Rainbow and ColorCycle draw exactly the same frames every cycle,
+# so rather than working out every pixel each frame on the Pico they can be drawn
+# once, with record(), and then played back with a CachedAnimation.
+#
+# Most animations move on one step each frame, but some, such as Rainbow and
+# Pulse, work out where they are from adafruit_led_animation's monotonic_ms().
+# Recording draws the frames as fast as it can, so whilst recording monotonic_ms()
+# is replaced with a clock that moves on by exactly the animation's speed each
+# frame. The recorded frames are then those drawn live when every frame is on
+# time, and frames should be a whole number of the animation's period.
+#
+# Frames are delta encoded: each frame only holds the runs of pixels that changed
+# from the frame before. The first frame holds the changes from black and one more
+# frame, after the last, holds the changes from the last frame back to the first
+# so playback loops. A frame is a list of runs, each of which is:
+#
+#   skip (2 bytes), count (2 bytes), count * (red, green, blue)
+#
+# where skip is the number of unchanged pixels before the run. All values are
+# little endian. Playing a frame back into a Layer is a slice copy per run, and
+# into a strip is one write per changed pixel.
+#
+# As each frame only holds the changes, playback relies on the strip holding the
+# frame before. Anything else drawing on the strip, such as another animation in
+# an AnimationSequence, breaks that, so a CachedAnimation clears the strip and
+# starts again from the first frame when it is filled, reset or has not been
+# animated for FRAME_CACHE_IDLE_RESTART seconds, which is how it notices that it
+# has become the active animation again.
+#
+# Caching only pays for animations that work out many pixels each frame. The
+# desktop benchmark, tests/benchmarks/animation_render.py, has the cached Comet
+# about 30% slower than the live one as a Comet only redraws its short tail, so
+# measure on the device before caching an animation that changes few pixels.
+#
+# Sequences can be recorded at boot or recorded on desktop with the real
+# adafruit_led_animation library and saved with write(), then loaded on the Pico
+# with read(). A FrameCache keeps the sequences within a memory budget, removing
+# the least recently used sequence first.
+import array
+import sys
+import time
+
+from interactive.compositor import Layer
+from interactive.control import FRAME_CACHE_BUDGET, FRAME_CACHE_IDLE_RESTART, NS_PER_SECOND
+from interactive.environment import is_running_on_desktop
+from interactive.polyfills.animation import Animation, BLACK
+
+# collections.abc is not available in CircuitPython.
+if is_running_on_desktop():
+    from collections.abc import Callable
+
+FILE_MAGIC = b"IFC1"
+
+_MAX_RUN = 0xFFFF
+
+
+class FrameSequence:
+    """
+    A FrameSequence holds the delta encoded frames of an animation for a strip
+    of size pixels.
+    """
+
+    def __init__(self, size: int, data: bytearray, offsets: array.array):
+        """
+        :param size: The number of pixels.
+        :param data: The runs of every frame, one after the other, followed by the
+            runs that loop from the last frame back to the first.
+        :param offsets: Where each frame, and the loop, starts in the data, plus the
+            end of the data.
+        """
+        self.size = size
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        """
+        Number of frames.
+        """
+        return len(self.offsets) - 2
+
+    @property
+    def nbytes(self) -> int:
+        """
+        The memory used by the frames in bytes.
+        """
+        return len(self.data) + len(self.offsets) * 4
+
+    def play(self, frame: int, pixel_object) -> None:
+        """
+        Applies the changes of the frame to the pixel object, which must hold the
+        frame before it, or black for the first frame. Playing frame len(self)
+        changes the last frame back to the first.
+        """
+        data = self.data
+        position = self.offsets[frame]
+        end = self.offsets[frame + 1]
+        index = 0
+        layer = pixel_object.buffer if isinstance(pixel_object, Layer) else None
+        while position < end:
+            index += data[position] | (data[position + 1] << 8)
+            count = data[position + 2] | (data[position + 3] << 8)
+            position += 4
+            if layer is not None:
+                layer[index * 3:(index + count) * 3] = data[position:position + count * 3]
+                position += count * 3
+                index += count
+            else:
+                for _ in range(count):
+                    pixel_object[index] = (data[position] << 16) | (data[position + 1] << 8) | data[position + 2]
+                    position += 3
+                    index += 1
+
+        if layer is not None:
+            pixel_object.changed = True
+
+    def write(self, path: str) -> None:
+        """
+        Saves the sequence to a file so it can be read() on another device.
+        """
+        with open(path, "wb") as file:
+            file.write(FILE_MAGIC)
+            file.write(self.size.to_bytes(2, "little"))
+            file.write(len(self).to_bytes(2, "little"))
+            for offset in self.offsets:
+                file.write(offset.to_bytes(4, "little"))
+            file.write(self.data)
+
+    @staticmethod
+    def read(path: str):
+        """
+        Returns the sequence saved in the file with write().
+        """
+        with open(path, "rb") as file:
+            if file.read(4) != FILE_MAGIC:
+                raise ValueError("FrameCache: %s is not a frame sequence" % path)
+
+            size = int.from_bytes(file.read(2), "little")
+            frames = int.from_bytes(file.read(2), "little")
+            header = file.read((frames + 2) * 4)
+            data = bytearray(file.read())
+
+        if len(header) != (frames + 2) * 4:
+            raise ValueError("FrameCache: %s is truncated" % path)
+
+        offsets = array.array("I", [int.from_bytes(header[i:i + 4], "little") for i in range(0, len(header), 4)])
+        if len(data) != offsets[-1]:
+            raise ValueError("FrameCache: %s is truncated" % path)
+
+        return FrameSequence(size, data, offsets)
+
+
+def __encode(previous: bytes, frame: bytes, data: bytearray) -> None:
+    """
+    Appends the runs of pixels that changed between the two frames to the data.
+    """
+    size = len(frame) // 3
+    last = 0
+    index = 0
+    while index < size:
+        i = index * 3
+        if previous[i:i + 3] == frame[i:i + 3]:
+            index += 1
+            continue
+
+        start = index
+        while index < size and index - start < _MAX_RUN:
+            i = index * 3
+            if previous[i:i + 3] == frame[i:i + 3]:
+                break
+            index += 1
+
+        skip = start - last
+        while skip > _MAX_RUN:
+            # An empty run just to skip further than will fit in one run.
+            data.extend(_MAX_RUN.to_bytes(2, "little") + b"\x00\x00")
+            skip -= _MAX_RUN
+
+        data.extend(skip.to_bytes(2, "little") + (index - start).to_bytes(2, "little"))
+        data.extend(frame[start * 3:index * 3])
+        last = index
+
+
+class _FrameClock:
+    """
+    Stands in for monotonic_ms() whilst recording, returning the time of the frame
+    being drawn.
+    """
+
+    def __init__(self, start: int):
+        self.now = start
+
+    def __call__(self) -> int:
+        return self.now
+
+
+def __clocked_modules(animation) -> list:
+    """
+    Returns the loaded modules that the animation could read monotonic_ms() from:
+    its own and those of adafruit_led_animation.
+    """
+    names = [getattr(type(animation), "__module__", None)]
+    names.extend(name for name in sys.modules if name.startswith("adafruit_led_animation"))
+    modules = []
+    for name in names:
+        module = sys.modules.get(name)
+        if module is not None and module not in modules and hasattr(module, "monotonic_ms"):
+            modules.append(module)
+    return modules
+
+
+def record(animation, frames: int, step: int = None) -> FrameSequence:
+    """
+    Draws the number of frames of the animation and returns them as a FrameSequence.
+    The animation must draw the same frames every cycle and frames should be a whole
+    number of cycles so that playback loops smoothly. The animation is drawn into
+    a Layer, so its pixel object is not changed.
+
+    :param step: The milliseconds monotonic_ms() moves on between frames. The
+        default is the speed of the animation.
+    """
+    if frames <= 0:
+        raise ValueError("frames must be greater than 0")
+
+    modules = __clocked_modules(animation)
+    if step is None:
+        step = int(getattr(animation, "speed", 0) * 1000)
+    clocks = [module.monotonic_ms for module in modules]
+    clock = _FrameClock(clocks[0]() if clocks else 0)
+
+    pixel_object = animation.pixel_object
+    layer = Layer(len(pixel_object))
+    rendered = []
+    animation.pixel_object = layer
+    for module in modules:
+        module.monotonic_ms = clock
+    try:
+        for _ in range(frames):
+            animation.draw()
+            animation.after_draw()
+            rendered.append(bytes(layer.buffer))
+            clock.now += step
+    finally:
+        animation.pixel_object = pixel_object
+        for module, monotonic_ms in zip(modules, clocks):
+            module.monotonic_ms = monotonic_ms
+
+    return encode(rendered)
+
+
+def encode(frames: list) -> FrameSequence:
+    """
+    Returns the frames, each three bytes per pixel, as a FrameSequence.
+    """
+    if not frames:
+        raise ValueError("There must be at least one frame")
+
+    data = bytearray()
+    offsets = array.array("I")
+    previous = bytes(len(frames[0]))
+    for frame in frames + [frames[0]]:
+        offsets.append(len(data))
+        __encode(previous, frame, data)
+        previous = frame
+    offsets.append(len(data))
+
+    return FrameSequence(len(frames[0]) // 3, data, offsets)
+
+
+class CachedAnimation(Animation):
+    """
+    Plays back a FrameSequence at the speed of the animation, looping at the end.
+    Playback starts again from black whenever the animation becomes active again.
+    """
+
+    def __init__(self, pixel_object, speed, sequence: FrameSequence, name=None):
+        if len(pixel_object) != sequence.size:
+            raise ValueError("FrameCache: The sequence is for %s pixels" % sequence.size)
+
+        self.sequence = sequence
+        # The next frame to play, 0 until the pixels have been cleared for the first frame.
+        self._frame = 0
+        self.__last_animate_ns = None
+        self.__idle_restart_ns = int(FRAME_CACHE_IDLE_RESTART * NS_PER_SECOND)
+        super().__init__(pixel_object, speed, BLACK, name=name)
+
+    def animate(self, show=True):
+        # Only the active animation in a sequence is animated, so a gap means
+        # something else may have drawn on the strip in the meantime.
+        now_ns = time.monotonic_ns()
+        last_ns = self.__last_animate_ns
+        if last_ns is not None and now_ns - last_ns > self.__idle_restart_ns:
+            self._frame = 0
+        self.__last_animate_ns = now_ns
+        return super().animate(show)
+
+    def fill(self, color):
+        super().fill(color)
+        self._frame = 0
+
+    def draw(self):
+        frames = len(self.sequence)
+        if self._frame == 0:
+            self.pixel_object.fill(BLACK)
+            self.sequence.play(0, self.pixel_object)
+            self._frame = 1
+        elif self._frame == frames:
+            self.sequence.play(frames, self.pixel_object)
+            self._frame = 1
+            self.cycle_complete = True
+        else:
+            self.sequence.play(self._frame, self.pixel_object)
+            self._frame += 1
+
+    def reset(self):
+        self._frame = 0
+
+
+class FrameCache:
+    """
+    FrameCache keeps recorded FrameSequences by name within a memory budget. When
+    adding a sequence would go over the budget the least recently used sequences
+    are removed. A sequence that is still being played is not affected by being
+    removed, the memory is just freed once it stops.
+    """
+
+    def __init__(self, budget: int = FRAME_CACHE_BUDGET):
+        """
+        :param budget: The maximum number of bytes of frames to keep.
+        """
+        self.budget = budget
+        self.nbytes = 0
+        self._sequences: dict[str, FrameSequence] = {}
+        # Names from least to most recently used.
+        self._order: list[str] = []
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sequences
+
+    def get(self, name: str, render: Callable[[], FrameSequence] = None) -> [None, FrameSequence]:
+        """
+        Returns the named sequence. If it is not cached and render is given, render
+        is called to record it and the result is added to the cache.
+        """
+        sequence = self._sequences.get(name)
+        if sequence is not None:
+            self._order.remove(name)
+            self._order.append(name)
+            return sequence
+
+        if render is None:
+            return None
+
+        sequence = render()
+        self.add(name, sequence)
+        return sequence
+
+    def add(self, name: str, sequence: FrameSequence) -> None:
+        """
+        Adds the sequence, removing the least recently used sequences to make room.
+        Sequences larger than the whole budget are not kept.
+        """
+        self.remove(name)
+        if sequence.nbytes > self.budget:
+            return
+
+        while self.nbytes + sequence.nbytes > self.budget:
+            self.remove(self._order[0])
+
+        self._sequences[name] = sequence
+        self._order.append(name)
+        self.nbytes += sequence.nbytes
+
+    def remove(self, name: str) -> None:
+        sequence = self._sequences.pop(name, None)
+        if sequence is not None:
+            self._order.remove(name)
+            self.nbytes -= sequence.nbytes
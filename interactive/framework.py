@@ -1,7 +1,10 @@
-from interactive.configuration import Config
+import time
+
+from interactive.configuration import Config, NODE_COORDINATOR, NODE_COORDINATORS
 from interactive.environment import is_running_on_desktop
 from interactive.log import info, debug, critical, CRITICAL
 from interactive.memory import setup_memory_reporting
+from interactive.metrics import set_task_timings
 from interactive.runner import Runner
 
 if is_running_on_desktop():
@@ -25,6 +28,9 @@ class Interactive:
         critical('Running with config:')
         config.log(CRITICAL)
 
+        # Must be set before any tasks are created.
+        set_task_timings(config.task_metrics)
+
         self.runner = Runner()
 
         self.runner.cancel_on_exception = False
@@ -39,16 +45,46 @@ class Interactive:
             from interactive.network import NetworkController
             from interactive.polyfills.network import new_server
             self.server = new_server()
-            self.network_controller = NetworkController(self.server)
+            self.network_controller = NetworkController(self.server, self.__network_trigger)
             self.network_controller.register(self.runner)
 
         self.directory_service = None
+        # Ordinary nodes also run a DirectoryService to send heartbeats, so only a node
+        # without a coordinator, or one of NODE_COORDINATORS, is a coordinator.
+        self.is_coordinator = False
         if config.directory:
             from interactive.directory import DirectoryService
-            self.directory_service = DirectoryService()
+            # Desktop coordinators can persist the directory so they can restart quickly.
+            journal = None
+            if config.directory_journal is not None and is_running_on_desktop():
+                from interactive.journal import DirectoryJournal
+                journal = DirectoryJournal(config.directory_journal)
+            # Every other coordinator is a peer to copy the directory from.
+            from interactive.network import get_address
+            address = get_address()
+            peers = [node for node in NODE_COORDINATORS if node != address and node != address.split(":")[0]]
+            self.is_coordinator = NODE_COORDINATOR is None or len(peers) < len(NODE_COORDINATORS)
+            self.directory_service = DirectoryService(journal, peers)
             self.network_controller.server.add_routes(self.directory_service.get_routes())
             self.directory_service.register(self.runner)
 
+        self.clock = None
+        self.datagram_service = None
+        if config.datagram:
+            from interactive.datagram import DatagramService
+            # A coordinator never needs to discover one and its clock is the one every
+            # other node syncs to.
+            directory = self.directory_service.directory if self.is_coordinator else None
+            if directory is None:
+                from interactive.clock import ClockSync
+                self.clock = ClockSync()
+            self.datagram_service = DatagramService(
+                directory, discover=directory is None and NODE_COORDINATOR is None,
+                trigger_callback=self.__network_trigger, clock=self.clock)
+            if directory is not None:
+                self.network_controller.server.add_routes(self.datagram_service.get_routes())
+            self.datagram_service.register(self.runner)
+
         self.button = None
         self.button_controller = None
 
@@ -113,7 +149,8 @@ class Interactive:
                 duration=config.trigger_duration,
                 start=config.trigger_start,
                 run=config.trigger_run,
-                stop=config.trigger_stop)
+                stop=config.trigger_stop,
+                clock=self.clock.synced_now if self.clock else time.monotonic)
             self.runner.add_task(trigger_loop)
 
         setup_memory_reporting(self.runner)
@@ -142,6 +179,14 @@ class Interactive:
                 debug('Turning off the audio')
                 self.audio_controller.cancel()
 
+    def __network_trigger(self) -> None:
+        """
+        Called when another node triggers this one over the network.
+        """
+        if self.triggerable is not None:
+            info("Network trigger")
+            self.triggerable.triggered = True
+
     async def __trigger_handler(self, distance: float, actual: float) -> None:
         info(f"Distance {distance} handler triggered: {actual}")
         self.triggerable.triggered = True
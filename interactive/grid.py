@@ -0,0 +1,174 @@
+# This file contains a Grid, which lets animations draw on pixels arranged in rows
+# and columns, such as a matrix panel or several strips laid side by side, using x
+# and y rather than working out which pixel of which strip each one is.
+#
+# Working that out for every pixel of every frame is slow in Python, so the Grid
+# does it once, when it is created, and keeps the result as index tables: for each
+# grid pixel, in rows left to right and top to bottom, its index on its strip in
+# an array('H') and which strip it is on in a bytearray. Animations draw into the
+# Grid, either as a single strip of width * height pixels or with grid[x, y], and
+# each pixel set is written straight to its strip with two table lookups rather
+# than a call to the gridmap. A Grid can also be the pixels of a Compositor, so
+# the composed frame is scattered to the strips through the tables as it is
+# written.
+#
+# How the grid is laid out on the strips is given by a gridmap, a function from x
+# and y to the index of the pixel, as used by adafruit_pixelmap. The
+# horizontal_strip_gridmap and vertical_strip_gridmap functions cover strips
+# running across or down the grid, either serpentine or all in one direction.
+# When the grid is made from several strips, created with new_pixels(), the index
+# counts along the first strip and then carries on along the next.
+import array
+
+from interactive.environment import is_running_on_desktop
+from interactive.polyfills.pixelmap import horizontal_strip_gridmap
+
+# collections.abc is not available in CircuitPython.
+if is_running_on_desktop():
+    from collections.abc import Callable
+
+
+class Grid:
+    """
+    Grid lets an animation draw on width by height pixels spread over one or more
+    strips. It supports the parts of the NeoPixel interface that animations use:
+    len(), indexing and slicing, fill() and show(), and can also be indexed with
+    grid[x, y].
+    """
+
+    def __init__(self, strips, width: int, height: int, gridmap: Callable[[int, int], int] = None):
+        """
+        :param strips: The strip of pixels, or a list of strips in the order they are
+            counted by the gridmap.
+        :param width: The number of pixels across the grid.
+        :param height: The number of pixels down the grid.
+        :param gridmap: Returns the index of the pixel at x and y. The default is
+            horizontal_strip_gridmap(width), rows that alternate direction.
+        """
+        if width <= 0 or height <= 0:
+            raise ValueError("width and height must be greater than 0")
+
+        strips = list(strips) if isinstance(strips, (list, tuple)) else [strips]
+        size = sum(len(strip) for strip in strips)
+        if width * height > size:
+            raise ValueError("Grid: %s x %s pixels will not fit on %s pixels" % (width, height, size))
+
+        if len(strips) > 256:
+            raise ValueError("Grid: There can be no more than 256 strips")
+
+        self.width = width
+        self.height = height
+        self.strips = strips
+        self._size = width * height
+        # For each grid pixel, its index on its strip and which strip that is.
+        self.index = array.array("H")
+        self.strip = bytearray()
+
+        if gridmap is None:
+            gridmap = horizontal_strip_gridmap(width)
+
+        starts = [0]
+        for strip in strips:
+            starts.append(starts[-1] + len(strip))
+
+        used = bytearray(size)
+        for y in range(height):
+            for x in range(width):
+                index = gridmap(x, y)
+                if index < 0 or index >= size:
+                    raise ValueError("Grid: (%s, %s) maps to pixel %s which is out of bounds" % (x, y, index))
+                if used[index]:
+                    raise ValueError("Grid: (%s, %s) maps to pixel %s which is already used" % (x, y, index))
+                used[index] = 1
+
+                strip = 0
+                while index >= starts[strip + 1]:
+                    strip += 1
+                self.index.append(index - starts[strip])
+                self.strip.append(strip)
+
+        # The whole of every strip is in the grid, so fill() can fill the strips.
+        self._fills_strips = width * height == size
+
+        for strip in strips:
+            strip.auto_write = False
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def n(self) -> int:
+        return self._size
+
+    @property
+    def auto_write(self) -> bool:
+        return False
+
+    @auto_write.setter
+    def auto_write(self, value: bool) -> None:
+        # The strips are shown together by show(), never as each pixel is set.
+        pass
+
+    @property
+    def brightness(self) -> float:
+        return self.strips[0].brightness
+
+    @brightness.setter
+    def brightness(self, value: float) -> None:
+        for strip in self.strips:
+            strip.brightness = value
+
+    def index_of(self, x: int, y: int) -> int:
+        """
+        Returns the index of the pixel at x and y in the Grid.
+        """
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            raise IndexError("Grid: (%s, %s) is out of bounds!" % (x, y))
+
+        return y * self.width + x
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, tuple):
+            x, y = index
+            if x < 0 or x >= self.width or y < 0 or y >= self.height:
+                raise IndexError("Grid: (%s, %s) is out of bounds!" % (x, y))
+            index = y * self.width + x
+        elif isinstance(index, slice):
+            for i, colour in zip(range(*index.indices(self._size)), value):
+                self.strips[self.strip[i]][self.index[i]] = colour
+            return
+        else:
+            if index < 0:
+                index += self._size
+            if index < 0 or index >= self._size:
+                raise IndexError("Grid: Index %s is out of bounds!" % index)
+
+        self.strips[self.strip[index]][self.index[index]] = value
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            index = self.index_of(index[0], index[1])
+        elif isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        else:
+            if index < 0:
+                index += self._size
+            if index < 0 or index >= self._size:
+                raise IndexError("Grid: Index %s is out of bounds!" % index)
+
+        return self.strips[self.strip[index]][self.index[index]]
+
+    def fill(self, colour) -> None:
+        if self._fills_strips:
+            for strip in self.strips:
+                strip.fill(colour)
+        else:
+            for i in range(self._size):
+                self.strips[self.strip[i]][self.index[i]] = colour
+
+    def show(self) -> None:
+        for strip in self.strips:
+            strip.show()
+
+    def write(self) -> None:
+        self.show()
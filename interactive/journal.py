@@ -0,0 +1,201 @@
+# This file contains a journal that persists a coordinator's directory so that a
+# restarted coordinator knows every node straight away rather than waiting up to
+# a minute for each node's next heartbeat. It is only used on desktop coordinators
+# as the CircuitPython filesystem is read-only to code by default, and only when
+# DIRECTORY_JOURNAL is set to the path to keep it at in config.py.
+#
+# Two files are kept:
+#
+#   <path>.snapshot - the whole directory as JSON when it was last compacted.
+#   <path>.journal  - one JSON list per line for every change since the snapshot:
+#                       ["s", name, address, role, expires]  (set)
+#                       ["r", name]                          (remove)
+#
+# Expiry times are stored as wall clock times (time.time()) because the monotonic
+# clock starts again from an arbitrary point when the process restarts. On startup
+# the snapshot is loaded, the journal is replayed over it and every endpoint that
+# has not yet expired is restored with the time it had left.
+#
+# Changes are buffered in memory and appended to the journal by a scheduled task,
+# so requests never wait on the disk. Only the changes since the last flush can be
+# lost on a crash, and the next heartbeat from each node repairs those. Once the
+# journal has DIRECTORY_JOURNAL_COMPACT_SIZE records a new snapshot is written,
+# replacing the old one atomically, and the journal is truncated.
+#
+# Only endpoints being added, changed or removed are journaled, not heartbeats, so
+# a heartbeat does not cost a write. The expiry times heartbeats extend are saved
+# by also writing a snapshot every DIRECTORY_JOURNAL_SNAPSHOT_PERIOD seconds. An
+# endpoint whose saved expiry passes whilst the coordinator is stopped is simply
+# registered again by its next heartbeat.
+import json
+import os
+import time
+from collections.abc import Callable
+
+from interactive.control import DIRECTORY_JOURNAL_FLUSH_FREQUENCY, DIRECTORY_JOURNAL_COMPACT_SIZE, \
+    DIRECTORY_JOURNAL_SNAPSHOT_PERIOD
+from interactive.directory import DirectoryController
+from interactive.log import info, error
+from interactive.runner import Runner
+from interactive.scheduler import new_scheduled_task, terminate_on_cancel
+
+OPERATION_SET = "s"
+OPERATION_REMOVE = "r"
+
+
+class DirectoryJournal:
+    """
+    DirectoryJournal records the changes made to a DirectoryController so they can
+    be restored when the coordinator restarts. Use attach() to restore a directory
+    and start recording its changes, then register() with a Runner to write them.
+    """
+
+    def __init__(self, path: str, wall_clock: Callable[[], float] = time.time):
+        """
+        :param path: The path, without an extension, of the snapshot and journal files.
+        :param wall_clock: Returns the current wall clock time in seconds.
+        """
+        self.snapshot_path = path + ".snapshot"
+        self.journal_path = path + ".journal"
+        self.__wall_clock = wall_clock
+        self.__directory = None
+        self.__file = None
+        self.__pending: list[str] = []
+        self.__records = 0
+        # The wall clock time the last snapshot was written.
+        self.__snapshot_time = 0
+
+    def attach(self, directory: DirectoryController) -> int:
+        """
+        Restores the endpoints that have not expired into the directory and then
+        records all further changes to it. Returns the number of restored endpoints.
+        """
+        now = self.__wall_clock()
+        restored = 0
+        for name, (address, role, expires) in self.load().items():
+            if expires > now:
+                directory.restore_endpoint(address, name, role, expires - now)
+                restored += 1
+
+        info(f"Restored {restored} endpoints from {self.snapshot_path}")
+        self.__directory = directory
+        directory.journal = self
+        # Start from a clean journal so a restart never replays more than it needs to.
+        self.compact()
+        return restored
+
+    def register(self, runner: Runner) -> None:
+        """
+        Registers the task which writes the recorded changes with the provided Runner.
+        """
+        runner.add_task(
+            new_scheduled_task(self.__flush, terminate_on_cancel(runner), DIRECTORY_JOURNAL_FLUSH_FREQUENCY))
+
+    async def __flush(self) -> None:
+        self.flush()
+
+    def record_set(self, name: str, address: str, role: str, expiry_time: float) -> None:
+        """
+        Records that the endpoint was registered or changed. The expiry time is in
+        time.monotonic() seconds.
+        """
+        expires = self.__wall_clock() + expiry_time - time.monotonic()
+        self.__pending.append(json.dumps([OPERATION_SET, name, address, role, expires]))
+
+    def record_remove(self, name: str) -> None:
+        """
+        Records that the endpoint was removed.
+        """
+        self.__pending.append(json.dumps([OPERATION_REMOVE, name]))
+
+    def load(self) -> dict[str, list]:
+        """
+        Returns the endpoints in the snapshot with the journal replayed over them as
+        a dictionary of name to [address, role, expires]. Lines that cannot be read,
+        such as the last line if the coordinator stopped part way through writing
+        it, are ignored.
+        """
+        endpoints = {}
+        try:
+            with open(self.snapshot_path, "r") as file:
+                endpoints = json.load(file)
+        except OSError:
+            pass
+        except ValueError as e:
+            error(f"Ignoring unreadable snapshot {self.snapshot_path}: {e}")
+
+        try:
+            with open(self.journal_path, "r") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                        if record[0] == OPERATION_SET:
+                            endpoints[record[1]] = record[2:5]
+                        elif record[0] == OPERATION_REMOVE:
+                            endpoints.pop(record[1], None)
+                    except (ValueError, IndexError):
+                        pass
+        except OSError:
+            pass
+
+        return endpoints
+
+    def flush(self) -> None:
+        """
+        Appends the recorded changes to the journal, compacting it once it is large
+        or the last snapshot is DIRECTORY_JOURNAL_SNAPSHOT_PERIOD seconds old.
+        """
+        if self.__wall_clock() - self.__snapshot_time >= DIRECTORY_JOURNAL_SNAPSHOT_PERIOD:
+            self.compact()
+            return
+
+        if not self.__pending:
+            return
+
+        if self.__file is None:
+            self.__file = open(self.journal_path, "a")
+
+        self.__file.write("\n".join(self.__pending) + "\n")
+        self.__file.flush()
+        self.__records += len(self.__pending)
+        self.__pending.clear()
+
+        if self.__records >= DIRECTORY_JOURNAL_COMPACT_SIZE:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Writes the whole directory as a new snapshot and truncates the journal. The
+        snapshot is written to a temporary file first so a crash part way through
+        leaves the previous snapshot and journal intact.
+        """
+        if self.__directory is None:
+            return
+
+        self.__pending.clear()
+        self.__snapshot_time = self.__wall_clock()
+        offset = self.__snapshot_time - time.monotonic()
+        endpoints = dict(
+            (name, [endpoint.address, endpoint.role, endpoint.expiry_time + offset])
+            for name, endpoint in self.__directory._directory.items())
+
+        temporary_path = self.snapshot_path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(endpoints, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.snapshot_path)
+
+        if self.__file is not None:
+            self.__file.close()
+        self.__file = open(self.journal_path, "w")
+        self.__records = 0
+
+    def close(self) -> None:
+        """
+        Writes any recorded changes and closes the journal.
+        """
+        self.flush()
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
@@ -17,6 +17,8 @@ class Led:
         self.pin = pin
         self.auto_write = auto_write
         self._brightness = 1.0
+        # The brightness last shown, so unchanged brightness is not written again.
+        self._shown = None
         self.brightness = brightness
 
     def deinit(self) -> None:
@@ -56,11 +58,14 @@ class Led:
         return 1
 
     def show(self) -> None:
-        self.pin.show(self._brightness)
+        if self._brightness != self._shown:
+            self._shown = self._brightness
+            self.pin.show(self._brightness)
 
     def fill(self, color: ColorUnion):
         r, g, b, w = self._parse_color(color)
-        self.brightness = w / 0xFF
+        # Set directly rather than through the property so it is only shown once.
+        self._brightness = min(max(w / 0xFF, 0.0), 1.0)
         if self.auto_write:
             self.show()
 
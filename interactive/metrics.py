@@ -0,0 +1,204 @@
+# This module keeps a small set of counters, gauges and timings describing how a
+# node is performing and renders them in the Prometheus text exposition format
+# for the /metrics route. For example:
+#
+#   # TYPE interactive_requests_total counter
+#   interactive_requests_total 42
+#   # TYPE interactive_task_seconds summary
+#   interactive_task_seconds_count{task="__serve_requests"} 1024
+#   interactive_task_seconds_sum{task="__serve_requests"} 0.512
+#
+# Metrics are stored in a module level dictionary, like the log level, so any
+# module can record a value without having to be passed a registry. Rendering is
+# done by a generator, one metric at a time, so the whole page is never held in
+# RAM which matters on a Pico.
+#
+# Labels are passed as an already formatted string, such as 'task="blink"', to
+# avoid building a dictionary every time a value is recorded.
+#
+# Summaries keep the count, sum and the largest observation since the metrics
+# were last rendered, so the maximum shows recent spikes rather than the worst
+# value since the node started. As rendering resets the maximum, the metrics
+# should only be scraped by a single Prometheus server; with two, each would
+# only see the spikes since the other's last scrape.
+#
+# Task timings are recorded by every loop and scheduled task, which costs a little
+# on every loop, so they are only recorded once set_task_timings() turns them on.
+import gc
+
+from interactive.environment import is_running_on_desktop
+
+# collections.abc is not available in CircuitPython.
+if is_running_on_desktop():
+    from collections.abc import Callable, Generator
+
+COUNTER = "counter"
+GAUGE = "gauge"
+SUMMARY = "summary"
+
+# Summaries only report the maximum since the last render, which is the 1 quantile.
+_QUANTILE_MAX = 'quantile="1"'
+
+# The metrics recorded by the library itself.
+METRIC_TASK_SECONDS = "interactive_task_seconds"
+METRIC_LOOP_LAG_SECONDS = "interactive_loop_lag_seconds"
+METRIC_HEAP_FREE_BYTES = "interactive_heap_free_bytes"
+METRIC_HEAP_ALLOCATED_BYTES = "interactive_heap_allocated_bytes"
+METRIC_REQUESTS = "interactive_requests_total"
+METRIC_DIRECTORY_ENDPOINTS = "interactive_directory_endpoints"
+METRIC_HEARTBEAT_FAILURES = "interactive_heartbeat_failures_total"
+METRIC_TRIGGERS = "interactive_triggers_total"
+METRIC_RESOLVER_LOOKUPS = "interactive_resolver_lookups_total"
+METRIC_FRAME_SECONDS = "interactive_frame_seconds"
+METRIC_FRAMES_SKIPPED = "interactive_frames_skipped_total"
+METRIC_FRAMES_PER_SECOND = "interactive_frames_per_second"
+
+# Maps the metric name to its type and a dictionary of label strings to values.
+# Summary values are [count, sum, max] lists so they can be updated in place.
+_metrics: dict[str, list] = {}
+_collectors: list = []
+_task_timings = False
+
+
+def __get_values(name: str, metric_type: str) -> dict:
+    metric = _metrics.get(name)
+    if metric is None:
+        metric = [metric_type, {}]
+        _metrics[name] = metric
+
+    return metric[1]
+
+
+def increment(name: str, amount: float = 1, labels: str = "") -> None:
+    """
+    Adds the amount to a counter, creating the counter if it does not exist.
+    """
+    values = __get_values(name, COUNTER)
+    values[labels] = values.get(labels, 0) + amount
+
+
+def set_gauge(name: str, value: float, labels: str = "") -> None:
+    """
+    Sets a gauge to the current value, creating the gauge if it does not exist.
+    """
+    __get_values(name, GAUGE)[labels] = value
+
+
+def observe(name: str, value: float, labels: str = "") -> None:
+    """
+    Records a single observation, typically a duration in seconds, in a summary
+    which keeps the count, sum and maximum of the observations.
+    """
+    values = __get_values(name, SUMMARY)
+    summary = values.get(labels)
+    if summary is None:
+        values[labels] = [1, value, value]
+        return
+
+    summary[0] += 1
+    summary[1] += value
+    if value > summary[2]:
+        summary[2] = value
+
+
+def set_task_timings(enabled: bool) -> None:
+    """
+    Sets whether loop and scheduled tasks record their timings. Only tasks created
+    after this is called are affected.
+    """
+    global _task_timings
+    _task_timings = enabled
+
+
+def are_task_timings_enabled() -> bool:
+    """
+    Returns whether loop and scheduled tasks record their timings.
+    """
+    return _task_timings
+
+
+def get_value(name: str, labels: str = ""):
+    """
+    Returns the current value of a metric, or None if it has not been recorded.
+    """
+    metric = _metrics.get(name)
+    if metric is None:
+        return None
+
+    return metric[1].get(labels)
+
+
+def add_collector(collector: Callable[[], None]) -> None:
+    """
+    Adds a function that is called just before the metrics are rendered. This
+    is used for gauges, such as the directory size, that are cheaper to read
+    when they are needed than to keep up to date.
+    """
+    _collectors.append(collector)
+
+
+def remove_collector(collector: Callable[[], None]) -> None:
+    """
+    Removes a function added by add_collector() so it, and the object it belongs
+    to, are no longer kept once they are finished with. Removing a collector that
+    was not added does nothing.
+    """
+    for index, added in enumerate(_collectors):
+        if added is collector:
+            del _collectors[index]
+            return
+
+
+def reset() -> None:
+    """
+    Removes all recorded metrics and collectors and turns off task timings.
+    """
+    _metrics.clear()
+    _collectors.clear()
+    set_task_timings(False)
+
+
+def collect_heap() -> None:
+    """
+    Records the free and allocated heap. These are only available on a microcontroller.
+    """
+    if hasattr(gc, "mem_free"):
+        set_gauge(METRIC_HEAP_FREE_BYTES, gc.mem_free())
+        set_gauge(METRIC_HEAP_ALLOCATED_BYTES, gc.mem_alloc())
+
+
+def __format_labels(labels: str, extra: str = "") -> str:
+    if labels and extra:
+        return "{" + labels + "," + extra + "}"
+    elif labels or extra:
+        return "{" + (labels or extra) + "}"
+    else:
+        return ""
+
+
+def render() -> Generator[str, None, None]:
+    """
+    Returns a generator of the metrics in the text exposition format, one metric
+    per item, so they can be sent as a chunked response. The maximum of each
+    summary is reset once it has been rendered, so only one scraper should be
+    used.
+    """
+    collect_heap()
+    for collector in _collectors:
+        collector()
+
+    # Copy the names as metrics may be added whilst the response is sent.
+    for name in list(_metrics.keys()):
+        metric_type, values = _metrics[name]
+        lines = [f"# TYPE {name} {metric_type}\n"]
+        for labels, value in values.items():
+            if metric_type == SUMMARY:
+                count, total, maximum = value
+                lines.append(f"{name}_count{__format_labels(labels)} {count}\n")
+                lines.append(f"{name}_sum{__format_labels(labels)} {total}\n")
+                lines.append(f"{name}{__format_labels(labels, _QUANTILE_MAX)} {maximum}\n")
+                value[2] = 0
+            else:
+                lines.append(f"{name}{__format_labels(labels)} {value}\n")
+
+        yield "".join(lines)
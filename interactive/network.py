@@ -12,13 +12,14 @@ import time
 from random import randint
 
 from adafruit_httpserver import Route, GET, Server, REQUEST_HANDLED_RESPONSE_SENT, Response, JSONResponse, \
-    POST, Request, NOT_FOUND_404, FileResponse
+    POST, Request, NOT_FOUND_404, BAD_REQUEST_400, FileResponse, ChunkedResponse
 
 from interactive import configuration
 from interactive.configuration import NODE_COORDINATOR, get_node_config, NODE_NAME, NODE_ROLE, LOG_LEVEL
 from interactive.control import NETWORK_PORT_MICROCONTROLLER, NETWORK_PORT_DESKTOP, SEND_MESSAGE_TIMEOUT
 from interactive.environment import is_running_on_microcontroller, is_running_on_desktop, is_running_under_test
 from interactive.log import error
+from interactive.metrics import increment, render as render_metrics, METRIC_REQUESTS, METRIC_TRIGGERS
 from interactive.polyfills.cpu import info as cpu_info
 from interactive.polyfills.cpu import restart as cpu_restart
 from interactive.polyfills.led import onboard_led
@@ -39,6 +40,8 @@ TRIGGERED = "TRIGGERED"
 
 HEADER_NAME = 'name'  # Name of the sender.
 HEADER_ROLE = 'role'  # Role of the sender.
+HEADER_CONTENT_TYPE = 'Content-Type'
+CONTENT_TYPE_METRICS = "text/plain; version=0.0.4"
 
 HEADERS = {
     HEADER_NAME: configuration.NODE_NAME,
@@ -130,6 +133,7 @@ class NetworkController:
             Route("/name", GET, name, append_slash=True),
             Route("/role", GET, role, append_slash=True),
             Route("/details", GET, details, append_slash=True),
+            Route("/metrics", GET, metrics, append_slash=True),
             Route("/blink", GET, led_blink, append_slash=True),
             Route("/led/blink", GET, led_blink, append_slash=True),
             Route("/led/<state>", [GET, POST], led_state, append_slash=True),
@@ -162,8 +166,7 @@ class NetworkController:
             pool_result = self.server.poll()
 
             if pool_result == REQUEST_HANDLED_RESPONSE_SENT:
-                # Do something only after handling a request
-                pass
+                increment(METRIC_REQUESTS)
 
         except OSError as err:
             # Because on Windows we get annoying BlockingIOErrors when running the network,
@@ -179,14 +182,41 @@ class NetworkController:
         return trigger(request, self.trigger_callback)
 
 
+def schedule_trigger(trigger_callback: Callable[[], None], delay: float = 0.0) -> None:
+    """
+    Calls the trigger callback once the delay (in seconds) has elapsed. The delay
+    is used to start effects on multiple nodes at the same time so, rather than
+    waiting for the next pass of a triggered task, a dedicated task is created
+    that sleeps for exactly the delay.
+    """
+    increment(METRIC_TRIGGERS)
+    if delay <= 0:
+        trigger_callback()
+        return
+
+    import asyncio
+
+    async def delayed_trigger(seconds):
+        await asyncio.sleep(seconds)
+        trigger_callback()
+
+    asyncio.create_task(delayed_trigger(delay))
+
+
 def send_message(path: str, host: str = NODE_COORDINATOR,
                  protocol: str = "http", method="GET",
-                 data=None, json=None) -> Response:
+                 data=None, json=None, content_type: str = None) -> Response:
     """
     Sends a message with the provided payload to the specified node, ensuring headers are included.
+    The content type only needs to be specified when sending data that is not JSON.
     """
+    headers = HEADERS
+    if content_type is not None:
+        headers = HEADERS.copy()
+        headers[HEADER_CONTENT_TYPE] = content_type
+
     return requests.request(method, f"{protocol}://{host}/{path}",
-                            headers=HEADERS, data=data, json=json, timeout=SEND_MESSAGE_TIMEOUT)
+                            headers=headers, data=data, json=json, timeout=SEND_MESSAGE_TIMEOUT)
 
 
 ###########################################################
@@ -280,6 +310,17 @@ def details(request: Request):
     return Response(request, NO, status=NOT_FOUND_404)
 
 
+def metrics(request: Request):
+    """
+    Returns the node metrics in the Prometheus text format. The response is
+    chunked so the metrics are rendered one at a time rather than all at once.
+    """
+    if request.method == GET:
+        return ChunkedResponse(request, render_metrics, content_type=CONTENT_TYPE_METRICS)
+
+    return Response(request, NO, status=NOT_FOUND_404)
+
+
 def led_blink(request: Request):
     """
     Blinks the local LED.
@@ -302,11 +343,17 @@ def led_state(request: Request, state: str):
 
 def trigger(request: Request, trigger_callback: Callable[[], None]):
     """
-    Calls the trigger
+    Calls the trigger. An optional delay query parameter specifies the number
+    of seconds to wait before calling the trigger, for example /trigger?delay=1.5
     """
     if request.method == GET:
         if trigger_callback:
-            trigger_callback()
+            try:
+                delay = float(request.query_params.get("delay", 0))
+            except ValueError:
+                return Response(request, NO, status=BAD_REQUEST_400)
+
+            schedule_trigger(trigger_callback, delay)
             return Response(request, TRIGGERED)
         else:
             return Response(request, NO)
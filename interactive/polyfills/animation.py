@@ -106,6 +106,9 @@ else:
         def animate(self, show=True):
             pass
 
+        def after_draw(self):
+            pass
+
         def show(self):
             pass
 
@@ -0,0 +1,59 @@
+# Provides heappush() and heappop() for a min-heap stored in a list. Desktop Python
+# and some CircuitPython builds include the heapq module; where it is not available
+# a simple pure Python version with the same behaviour is used instead. The pure
+# Python versions are always defined, as _heappush() and _heappop(), so they can be
+# tested on desktop.
+
+
+def _heappush(heap: list, item) -> None:
+    """
+    Pushes the item onto the heap, maintaining the heap invariant.
+    """
+    heap.append(item)
+    index = len(heap) - 1
+    while index > 0:
+        parent = (index - 1) >> 1
+        if heap[parent] <= item:
+            break
+
+        heap[index] = heap[parent]
+        index = parent
+
+    heap[index] = item
+
+
+def _heappop(heap: list):
+    """
+    Pops and returns the smallest item from the heap, maintaining the heap invariant.
+    """
+    last = heap.pop()
+    if not heap:
+        return last
+
+    smallest = heap[0]
+    size = len(heap)
+    index = 0
+    while True:
+        child = 2 * index + 1
+        if child >= size:
+            break
+
+        if child + 1 < size and heap[child + 1] < heap[child]:
+            child += 1
+
+        if last <= heap[child]:
+            break
+
+        heap[index] = heap[child]
+        index = child
+
+    heap[index] = last
+    return smallest
+
+
+try:
+    from heapq import heappush, heappop
+
+except ImportError:
+    heappush = _heappush
+    heappop = _heappop
@@ -18,12 +18,17 @@ if are_pins_available():
         def __init__(self, pin: Pin):
             self.pin = pin
             self.pwm = pwmio.PWMOut(pin, frequency=1000)
+            self.duty_cycle = None
 
         def deinit(self) -> None:
             self.pin.deinit()
 
         def show(self, brightness: float) -> None:
-            self.pwm.duty_cycle = int(MAX_DUTY * brightness)
+            # Only write to the PWM when the duty cycle changes.
+            duty_cycle = int(MAX_DUTY * brightness)
+            if duty_cycle != self.duty_cycle:
+                self.duty_cycle = duty_cycle
+                self.pwm.duty_cycle = duty_cycle
 
 
     def __new_led_pin(pin: Pin) -> LedPin:
@@ -47,17 +52,22 @@ if are_pins_available():
 else:
     class LedPin:
         """
-        Stub implementation of Led for Desktop without pins. Does nothing.
+        Stub implementation of Led for Desktop without pins. Only records the
+        duty cycle and the number of times it changed.
         """
 
         def __init__(self, pin):
-            pass
+            self.duty_cycle = None
+            self.writes = 0
 
         def deinit(self) -> None:
             pass
 
         def show(self, brightness: float) -> None:
-            pass
+            duty_cycle = int(MAX_DUTY * brightness)
+            if duty_cycle != self.duty_cycle:
+                self.duty_cycle = duty_cycle
+                self.writes += 1
 
 
     def __new_led_pin(pin) -> LedPin:
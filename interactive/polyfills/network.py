@@ -84,3 +84,27 @@ else:
 
 def new_server(debug: bool = False) -> Server:
     return Server(pool, debug=debug)
+
+
+def new_datagram_socket(host: str, port: int):
+    """
+    Returns a non-blocking UDP socket bound to the given host and port that is
+    able to send broadcast datagrams. CircuitPython and desktop Python both
+    provide the socket through the pool so the calls are the same on both.
+
+    :param host: The address to bind to, use "0.0.0.0" to listen on all interfaces.
+    :param port: The port to bind to.
+    """
+    sock = pool.socket(pool.AF_INET, pool.SOCK_DGRAM)
+
+    # Not every network stack exposes these options (CircuitPython does not always
+    # support SO_BROADCAST) so they are applied on a best effort basis.
+    try:
+        sock.setsockopt(pool.SOL_SOCKET, pool.SO_REUSEADDR, 1)
+        sock.setsockopt(pool.SOL_SOCKET, pool.SO_BROADCAST, 1)
+    except (AttributeError, OSError):
+        pass
+
+    sock.bind((host, port))
+    sock.setblocking(False)
+    return sock
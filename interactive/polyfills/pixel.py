@@ -16,10 +16,22 @@ if are_pins_available():
 else:
 
     class Pixels:
-        def __init__(self, pin, num_pixels: int, brightness: float):
+        """
+        Emulates a strip of NeoPixels on desktop. The colours are kept so animations
+        can be tested and benchmarked, and every show() can be recorded as a frame of
+        what the strip would display, see start_recording().
+        """
+
+        def __init__(self, pin, num_pixels: int, brightness: float = 1.0, auto_write: bool = True, bpp: int = 3):
             self.pin = pin
             self.num_pixels = num_pixels
             self.brightness = brightness
+            self.auto_write = auto_write
+            self.bpp = bpp
+            self.buffer = bytearray(num_pixels * bpp)
+            # The number of times the strip has been shown.
+            self.shows = 0
+            self.__recording = None
 
         def deinit(self) -> None:
             pass
@@ -32,30 +44,102 @@ else:
             return self.num_pixels
 
         def write(self) -> None:
-            pass
+            self.show()
 
         def show(self):
-            pass
+            self.shows += 1
+            if self.__recording is not None:
+                self.__recording.append(self.frame())
 
         def fill(self, color):
-            pass
+            self.buffer[:] = bytes(self.__parse_color(color)) * self.num_pixels
+            if self.auto_write:
+                self.show()
+
+        def __parse_color(self, color) -> tuple:
+            if isinstance(color, int):
+                rgb = ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+                return rgb + (0,) if self.bpp == 4 else rgb
+
+            if self.bpp == 4:
+                return color[0], color[1], color[2], color[3] if len(color) == 4 else 0
+
+            return color[0], color[1], color[2]
 
         def _set_item(self, index: int, r: int, g: int, b: int, w: int):
-            pass
+            self[index] = (r, g, b, w)
 
         def __setitem__(self, index, val):
-            pass
+            if isinstance(index, slice):
+                for i, color in zip(range(*index.indices(self.num_pixels)), val):
+                    self.__set(i, color)
+            else:
+                if index < 0:
+                    index += self.num_pixels
+                if index < 0 or index >= self.num_pixels:
+                    raise IndexError("Pixels: Index %s is out of bounds!" % index)
+                self.__set(index, val)
+
+            if self.auto_write:
+                self.show()
+
+        def __set(self, index: int, color) -> None:
+            i = index * self.bpp
+            self.buffer[i:i + self.bpp] = bytes(self.__parse_color(color))
 
         # noinspection PyMethodMayBeStatic
         def _getitem(self, index):
             return index
 
         def __getitem__(self, index):
-            return 0
+            if isinstance(index, slice):
+                return [self[i] for i in range(*index.indices(self.num_pixels))]
+
+            if index < 0:
+                index += self.num_pixels
+            if index < 0 or index >= self.num_pixels:
+                raise IndexError("Pixels: Index %s is out of bounds!" % index)
+
+            i = index * self.bpp
+            return tuple(self.buffer[i:i + self.bpp])
+
+        def frame(self) -> bytes:
+            """
+            Returns what the strip displays, three bytes per pixel with the brightness
+            applied and the white of RGBW strips added to each colour.
+            """
+            brightness = max(min(self.brightness, 1.0), 0.0)
+            frame = bytearray(self.num_pixels * 3)
+            for index in range(self.num_pixels):
+                i = index * self.bpp
+                white = self.buffer[i + 3] if self.bpp == 4 else 0
+                for channel in range(3):
+                    frame[index * 3 + channel] = int(min(self.buffer[i + channel] + white, 255) * brightness)
+
+            return bytes(frame)
+
+        def start_recording(self) -> None:
+            """
+            Records every frame shown until stop_recording().
+            """
+            self.__recording = []
+
+        def stop_recording(self):
+            """
+            Stops recording and returns the recorded frames as a FrameSequence, which
+            can be saved with FrameSequence.write() and replayed with a CachedAnimation,
+            or None if no frames were shown.
+            """
+            # Only loaded when recording as the frame cache is not otherwise needed.
+            from interactive.framecache import encode
+
+            frames = self.__recording
+            self.__recording = None
+            return encode(frames) if frames else None
 
 
     def __new_pixel(pin, num_pixels: int, brightness: float) -> Pixels:
-        return Pixels(pin, num_pixels, brightness=brightness)
+        return Pixels(pin, num_pixels, brightness=brightness, auto_write=False)
 
 
 def new_pixels(pin, num_pixels: int, brightness: float = 1.0) -> Pixels:
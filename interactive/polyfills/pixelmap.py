@@ -0,0 +1,10 @@
+# Provides the gridmap functions of adafruit_pixelmap, which return a function
+# mapping the x and y of a grid of pixels to the index of the pixel on the strip.
+# The bundled adafruit_pixelmap needs the _pixelmap module that is built into
+# CircuitPython, so where it is not available the same functions from the
+# adafruit_led_animation helper are used instead.
+try:
+    from adafruit_pixelmap import horizontal_strip_gridmap, vertical_strip_gridmap  # noqa: F401
+
+except ImportError:
+    from adafruit_led_animation.helper import horizontal_strip_gridmap, vertical_strip_gridmap  # noqa: F401
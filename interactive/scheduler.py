@@ -5,6 +5,7 @@ from interactive.control import (NS_PER_SECOND, ASYNC_LOOP_SLEEP_INTERVAL,
                                  SCHEDULER_DEFAULT_FREQUENCY, SCHEDULER_INTERNAL_LOOP_RATIO)
 from interactive.environment import is_running_on_desktop
 from interactive.log import debug
+from interactive.metrics import observe, are_task_timings_enabled, METRIC_TASK_SECONDS, METRIC_LOOP_LAG_SECONDS
 
 # collections.abc is not available in CircuitPython.
 if is_running_on_desktop():
@@ -42,6 +43,8 @@ def new_scheduled_task(
     desired frequency until the cancel_func returns True. The returned task can
     be added to a Runner so it is called regularly in the background.
 
+    When task timings are enabled each call records how long the task took.
+
     :param task: This is called once every cycle based on the callback frequency.
     :param frequency: The desired frequency to invoke the task.
     :param cancel_func: A function that returns whether to cancel the task or not.
@@ -63,7 +66,24 @@ def new_scheduled_task(
 
             await asyncio.sleep(sleep_interval)
 
-    return handler
+    if not are_task_timings_enabled():
+        return handler
+
+    labels = f'task="{getattr(task, "__name__", "task")}"'
+
+    async def timed_handler() -> None:
+        nonlocal next_callback_ns
+        while not cancel_func():
+            start_ns = time.monotonic_ns()
+            if start_ns >= next_callback_ns:
+                next_callback_ns += interval_ns
+                debug(f'Calling scheduled task {task}')
+                await task()
+                observe(METRIC_TASK_SECONDS, (time.monotonic_ns() - start_ns) / NS_PER_SECOND, labels)
+
+            await asyncio.sleep(sleep_interval)
+
+    return timed_handler
 
 
 def new_loop_task(
@@ -73,6 +93,10 @@ def new_loop_task(
     Returns an async task that just loops until the cancel_func returns True. This
     helps avoid having to write the same loop code endlessly.
 
+    When task timings are enabled each cycle records how long the task took and
+    how much later than requested the loop woke up; a growing loop lag means some
+    task is not yielding.
+
     :param task: This is called once every cycle.
     :param cancel_func: A function that returns whether to cancel the task or not.
     """
@@ -82,7 +106,22 @@ def new_loop_task(
             await asyncio.sleep(ASYNC_LOOP_SLEEP_INTERVAL)
             await task()
 
-    return handler
+    if not are_task_timings_enabled():
+        return handler
+
+    labels = f'task="{getattr(task, "__name__", "task")}"'
+    interval_ns = int(ASYNC_LOOP_SLEEP_INTERVAL * NS_PER_SECOND)
+
+    async def timed_handler() -> None:
+        while not cancel_func():
+            sleep_ns = time.monotonic_ns()
+            await asyncio.sleep(ASYNC_LOOP_SLEEP_INTERVAL)
+            start_ns = time.monotonic_ns()
+            observe(METRIC_LOOP_LAG_SECONDS, max(start_ns - sleep_ns - interval_ns, 0) / NS_PER_SECOND)
+            await task()
+            observe(METRIC_TASK_SECONDS, (time.monotonic_ns() - start_ns) / NS_PER_SECOND, labels)
+
+    return timed_handler
 
 
 class Triggerable:
@@ -110,7 +149,8 @@ def new_triggered_task(
         start: Callable[[], Awaitable[None]] = None,
         run: Callable[[], Awaitable[None]] = None,
         stop: Callable[[], Awaitable[None]] = None,
-        cancel_func: Callable[[], bool] = never_terminate) -> Callable[[], Awaitable[None]]:
+        cancel_func: Callable[[], bool] = never_terminate,
+        clock: Callable[[], float] = time.monotonic) -> Callable[[], Awaitable[None]]:
     """
     Returns an async task that will only invoke the functions start, stop and run if the
     trigger has been activated. The start function will be called once when the trigger
@@ -133,6 +173,7 @@ def new_triggered_task(
     :param run: This is called once every cycle when triggered.
     :param stop: This is called once when the trigger expires.
     :param cancel_func: A function that returns whether to cancel the task or not.
+    :param clock: Returns the current time in seconds, such as ClockSync.synced_now.
     """
 
     if start is None and run is None and stop is None:
@@ -144,7 +185,7 @@ def new_triggered_task(
     async def handler() -> None:
         nonlocal running, stop_time
 
-        now = time.monotonic()
+        now = clock()
 
         if triggerable.triggered and not running:
             debug("Start running trigger event")
@@ -183,6 +224,10 @@ class TriggerTimedEvents:
 
     A TriggerTimedEvents can be used in conjunction with a new_triggered_task() to generate
     the events based on an initial trigger event.
+
+    By default time is measured with time.monotonic(). Passing the synced_now function of
+    a ClockSync as the clock, and the same start_time to start(), keeps the events on
+    multiple nodes aligned with each other.
     """
 
     class Event:
@@ -190,23 +235,27 @@ class TriggerTimedEvents:
             self.trigger_time = trigger_time
             self.event = event
 
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
         self.__running = False
         self.__start_time = 0
         self.__events_remaining = None
         self.events = []
 
-    def start(self):
+    def start(self, start_time: float = None):
         """
         Starts the trigger which will result in the timed events being
         returned by the run() method. This method is safe to call
         multiple times when running and will not affect the triggered
         events whilst running.
+
+        :param start_time: The time, from the clock, the events are relative
+                           to. Defaults to now.
         """
         if self.__running:
             return
 
-        self.__start_time = time.monotonic()
+        self.__start_time = self.clock() if start_time is None else start_time
         self.__running = True
         self.__events_remaining = self.events.copy()
 
@@ -252,7 +301,7 @@ class TriggerTimedEvents:
             return []
 
         # Get all items that need to be fired.
-        now = time.monotonic()
+        now = self.clock()
         diff = now - self.__start_time
         events_to_fire = [event for event in self.__events_remaining if diff >= event.trigger_time]
 
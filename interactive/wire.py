@@ -0,0 +1,187 @@
+# This file contains a compact binary encoding for the messages that are sent
+# between nodes. It is an optional alternative to JSON that avoids building and
+# parsing dictionaries for every message; which allocates a lot of RAM on a
+# microcontroller. Over HTTP the encoding is selected by the Content-Type header
+# and for datagrams by the first byte which is always the WIRE_VERSION.
+#
+# Directory messages (register, unregister and heartbeat) are laid out as:
+#
+#   version (1) | type (1) | role id (1) | name length (1) | ip (4) | port (2) | name | [role length (1) | role]
+#
+# The role is only included when it has not been interned with add_roles().
+#
+# Trigger messages are laid out as:
+#
+#   version (1) | type (1) | delay (4, float) | start (8) | name length (1) | name
+#
+# where start is the time to start on the coordinator's monotonic clock in
+# nanoseconds, used by nodes with a synced clock, or 0 if it is not known.
+#
+# All multibyte values are little endian.
+import struct
+
+WIRE_VERSION = 1
+
+CONTENT_TYPE_BINARY = "application/x-interactive"
+
+MESSAGE_REGISTER = 1
+MESSAGE_UNREGISTER = 2
+MESSAGE_HEARTBEAT = 3
+MESSAGE_TRIGGER = 4
+
+FIELD_ADDRESS = "address"
+FIELD_NAME = "name"
+FIELD_ROLE = "role"
+FIELD_DELAY = "delay"
+FIELD_START_NS = "start_ns"
+FIELD_MESSAGE = "message"
+
+_DIRECTORY_FORMAT = "<BBBB4BH"
+_DIRECTORY_SIZE = struct.calcsize(_DIRECTORY_FORMAT)
+_TRIGGER_FORMAT = "<BBfqB"
+_TRIGGER_SIZE = struct.calcsize(_TRIGGER_FORMAT)
+
+# Role identifier 0 is reserved to mean the role is included in the message.
+_NO_ROLE_ID = 0
+_roles: [str] = [""]
+_role_ids: dict[str, int] = {}
+
+
+def add_roles(*roles: str) -> None:
+    """
+    Interns the given roles so they are sent as a single byte rather than as a
+    string. Every node must add the same roles in the same order for the
+    identifiers to match; roles that are not known are sent in full.
+    """
+    for role in roles:
+        role = role.strip().lower()
+        if role in _role_ids:
+            continue
+
+        if len(_roles) > 255:
+            raise ValueError("Too many roles")
+
+        _role_ids[role] = len(_roles)
+        _roles.append(role)
+
+
+def is_binary(data) -> bool:
+    """
+    Returns whether the data is a binary message rather than text or JSON.
+    """
+    return len(data) >= 2 and data[0] == WIRE_VERSION
+
+
+def _encode_address(address: str) -> (list[int], int):
+    """
+    Splits an address of the form "1.2.3.4:80" into the four IP bytes and port.
+    Raises a ValueError if the address is not an IPv4 address.
+    """
+    host, _, port = address.partition(":")
+    ip = [int(part) for part in host.split(".")]
+    if len(ip) != 4:
+        raise ValueError(f"Not an IPv4 address: {address}")
+
+    for part in ip:
+        if part < 0 or part > 255:
+            raise ValueError(f"Not an IPv4 address: {address}")
+
+    return ip, int(port) if port else 0
+
+
+def _encode_string(value: str) -> bytes:
+    value = value.encode("utf-8")
+    if len(value) > 255:
+        raise ValueError("String too long")
+
+    return value
+
+
+def encode_directory_message(message: int, name: str, role: str, address: str) -> bytes:
+    """
+    Encodes a register, unregister or heartbeat message. Raises a ValueError
+    if the message cannot be represented; in which case JSON should be used.
+    """
+    ip, port = _encode_address(address)
+    name = _encode_string(name)
+    role = role.strip().lower()
+    role_id = _role_ids.get(role, _NO_ROLE_ID)
+
+    data = struct.pack(_DIRECTORY_FORMAT, WIRE_VERSION, message, role_id, len(name), *ip, port) + name
+    if role_id == _NO_ROLE_ID:
+        role = _encode_string(role)
+        data += bytes((len(role),)) + role
+
+    return data
+
+
+def encode_trigger_message(name: str, delay: float = 0.0, start_ns: int = 0) -> bytes:
+    """
+    Encodes a trigger message from the named node that should start after the
+    given delay in seconds, or at start_ns on the sender's monotonic clock for
+    nodes whose clock is synced to it.
+    """
+    name = _encode_string(name)
+    return struct.pack(_TRIGGER_FORMAT, WIRE_VERSION, MESSAGE_TRIGGER, delay, start_ns, len(name)) + name
+
+
+def decode_message(data) -> dict:
+    """
+    Decodes a binary message into the same dictionary that the equivalent JSON
+    message would produce, with the addition of the message type. Raises a
+    ValueError if the data is not a valid message.
+    """
+    if not is_binary(data):
+        raise ValueError("Not a binary message")
+
+    data = memoryview(data)
+    message = data[1]
+
+    if message == MESSAGE_TRIGGER:
+        if len(data) < _TRIGGER_SIZE:
+            raise ValueError("Message too short")
+
+        _, _, delay, start_ns, name_length = struct.unpack_from(_TRIGGER_FORMAT, data)
+        end = _TRIGGER_SIZE + name_length
+        if len(data) < end:
+            raise ValueError("Message too short")
+
+        return {
+            FIELD_MESSAGE: message,
+            FIELD_NAME: str(data[_TRIGGER_SIZE:end], "utf-8"),
+            FIELD_DELAY: delay,
+            FIELD_START_NS: start_ns,
+        }
+
+    if message not in (MESSAGE_REGISTER, MESSAGE_UNREGISTER, MESSAGE_HEARTBEAT):
+        raise ValueError(f"Unknown message type: {message}")
+
+    if len(data) < _DIRECTORY_SIZE:
+        raise ValueError("Message too short")
+
+    _, _, role_id, name_length, a, b, c, d, port = struct.unpack_from(_DIRECTORY_FORMAT, data)
+    end = _DIRECTORY_SIZE + name_length
+    if len(data) < end:
+        raise ValueError("Message too short")
+
+    name = str(data[_DIRECTORY_SIZE:end], "utf-8")
+
+    if role_id == _NO_ROLE_ID:
+        if len(data) < end + 1 or len(data) < end + 1 + data[end]:
+            raise ValueError("Message too short")
+
+        role_length = data[end]
+        role = str(data[end + 1:end + 1 + role_length], "utf-8")
+    elif role_id < len(_roles):
+        role = _roles[role_id]
+    else:
+        raise ValueError(f"Unknown role: {role_id}")
+
+    address = f"{a}.{b}.{c}.{d}:{port}" if port else f"{a}.{b}.{c}.{d}"
+
+    return {
+        FIELD_MESSAGE: message,
+        FIELD_NAME: name,
+        FIELD_ROLE: role,
+        FIELD_ADDRESS: address,
+    }
@@ -0,0 +1,107 @@
+# Measures the cost of rendering a frame of every animation effect, drawn into the
+# emulated Pixels from interactive/polyfills/pixel.py. This is a desktop only
+# benchmark, run it from the root of the project with:
+#
+#   PYTHONPATH=. python tests/benchmarks/animation_render.py --frames 500 --lengths 8,60,300
+#
+# The effects in interactive/polyfills/animation.py are stubs on desktop, so the
+# real adafruit_led_animation classes they stand in for are used. Each effect is
+# drawn and shown for the number of frames at each strip length, calling draw()
+# directly so the speed of the animation does not matter. It reports the mean and
+# p99 time per frame and the frames per second that would allow. A recording of
+# each effect can be saved with --record to look at or replay later. Desktop
+# timings are much faster than a microcontroller but the relative difference is
+# what matters.
+import argparse
+import os
+import time
+
+from adafruit_led_animation.animation.blink import Blink
+from adafruit_led_animation.animation.chase import Chase
+from adafruit_led_animation.animation.colorcycle import ColorCycle
+from adafruit_led_animation.animation.comet import Comet
+from adafruit_led_animation.animation.pulse import Pulse
+from adafruit_led_animation.animation.rainbow import Rainbow
+from adafruit_led_animation.animation.rainbowchase import RainbowChase
+from adafruit_led_animation.animation.rainbowcomet import RainbowComet
+from adafruit_led_animation.animation.rainbowsparkle import RainbowSparkle
+from adafruit_led_animation.animation.sparkle import Sparkle
+
+from interactive.animation import Flicker, Flame, Lightning
+from interactive.framecache import CachedAnimation, record
+from interactive.polyfills.animation import AMBER, JADE, PINK, OLD_LACE, AQUA, GOLD, RAINBOW
+from interactive.polyfills.pixel import new_pixels
+
+EFFECTS = {
+    "Flicker": lambda pixels: Flicker(pixels, speed=0.1, color=AMBER),
+    "Flame": lambda pixels: Flame(pixels, speed=0.01),
+    "Lightning": lambda pixels: Lightning(pixels, speed=0.01),
+    "Blink": lambda pixels: Blink(pixels, speed=0.5, color=JADE),
+    "Chase": lambda pixels: Chase(pixels, speed=0.1, size=3, spacing=6, color=OLD_LACE),
+    "ColorCycle": lambda pixels: ColorCycle(pixels, 0.5, colors=RAINBOW),
+    "Comet": lambda pixels: Comet(pixels, speed=0.01, color=PINK, tail_length=7, bounce=True),
+    "Comet (cached)": lambda pixels: CachedAnimation(
+        pixels, 0.01, record(Comet(pixels, speed=0.01, color=PINK, tail_length=7, bounce=True), 2 * len(pixels))),
+    "Pulse": lambda pixels: Pulse(pixels, speed=0.1, color=AQUA, period=3),
+    "Sparkle": lambda pixels: Sparkle(pixels, speed=0.05, color=GOLD, num_sparkles=3),
+    "Rainbow": lambda pixels: Rainbow(pixels, speed=0.1, period=2),
+    "RainbowComet": lambda pixels: RainbowComet(pixels, speed=0.1, tail_length=7, bounce=True),
+    "RainbowChase": lambda pixels: RainbowChase(pixels, speed=0.1, size=5),
+    "RainbowSparkle": lambda pixels: RainbowSparkle(pixels, speed=0.1, num_sparkles=3),
+}
+
+
+def render(name: str, length: int, frames: int) -> list[float]:
+    """
+    Returns the time taken to draw and show each frame of the effect in seconds.
+    """
+    pixels = new_pixels(None, length)
+    animation = EFFECTS[name](pixels)
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        animation.draw()
+        animation.after_draw()
+        pixels.show()
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def save_recording(name: str, length: int, frames: int, directory: str) -> None:
+    """
+    Records the frames of the effect to a file. This is separate from timing as
+    recording a frame takes far longer than drawing it.
+    """
+    pixels = new_pixels(None, length)
+    animation = EFFECTS[name](pixels)
+    pixels.start_recording()
+    for _ in range(frames):
+        animation.draw()
+        animation.after_draw()
+        pixels.show()
+
+    pixels.stop_recording().write(os.path.join(directory, f"{name.replace(' ', '_')}_{length}.frames"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark rendering every animation effect.")
+    parser.add_argument("--frames", type=int, default=200, help="Number of frames to render for each effect.")
+    parser.add_argument("--lengths", default="8,60,300", help="Comma separated strip lengths.")
+    parser.add_argument("--record", default=None, help="Directory to save a recording of each effect to.")
+    args = parser.parse_args()
+
+    lengths = [int(length) for length in args.lengths.split(",")]
+    print(f"{'Effect':<16} {'Pixels':>8} {'Mean (us)':>10} {'p99 (us)':>10} {'Max FPS':>10}")
+    for name in EFFECTS:
+        for length in lengths:
+            times = sorted(render(name, length, args.frames))
+            mean = sum(times) / len(times)
+            p99 = times[min(int(len(times) * 0.99), len(times) - 1)]
+            print(f"{name:<16} {length:>8} {mean * 1_000_000:>10.1f} {p99 * 1_000_000:>10.1f} {1 / mean:>10.0f}")
+            if args.record:
+                save_recording(name, length, args.frames, args.record)
+
+
+if __name__ == '__main__':
+    main()
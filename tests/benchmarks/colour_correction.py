@@ -0,0 +1,82 @@
+# Compares writing a frame through the Compositor with no colour correction, with
+# the ColourCorrection lookup tables from interactive/correction.py, and with a
+# function called for every pixel to correct it. This is a desktop only benchmark,
+# run it from the root of the project with:
+#
+#   PYTHONPATH=. python tests/benchmarks/colour_correction.py
+#
+# Every pixel is written each frame. Desktop timings are much faster than a
+# microcontroller but the relative difference is what matters.
+import timeit
+from random import randrange
+
+from interactive.compositor import Compositor
+from interactive.control import COLOUR_GAMMA
+from interactive.correction import ColourCorrection
+
+PIXEL_COUNTS = [8, 60, 300]
+ITERATIONS = 2_000
+
+
+class ListPixels:
+    def __init__(self, size: int):
+        self.values = [0] * size
+        self.auto_write = False
+
+    def __len__(self):
+        return len(self.values)
+
+    def __setitem__(self, index: int, value) -> None:
+        self.values[index] = value
+
+    def show(self) -> None:
+        pass
+
+
+def correct(r: int, g: int, b: int) -> int:
+    """
+    Corrects a pixel the way it would be done without tables.
+    """
+    return (int(((r / 255) ** COLOUR_GAMMA) * 255 + 0.5) << 16) | (
+            int(((g / 255) ** COLOUR_GAMMA) * 255 + 0.5) << 8) | int(((b / 255) ** COLOUR_GAMMA) * 255 + 0.5)
+
+
+def write_with_function(strip) -> None:
+    buffer = strip.buffer
+    pixels = strip.pixels
+    for index in range(len(pixels)):
+        i = index * 3
+        pixels[index] = correct(buffer[i], buffer[i + 1], buffer[i + 2])
+    pixels.show()
+
+
+def new_strip(count: int, correction: [None, ColourCorrection]):
+    pixels = ListPixels(count)
+    compositor = Compositor()
+    compositor.new_layer(pixels)
+    compositor.set_correction(pixels, correction)
+    strip = compositor._strips[0]
+    strip.buffer[:] = bytes(randrange(256) for _ in range(count * 3))
+    return strip
+
+
+def time_write(strip) -> float:
+    def write() -> None:
+        strip.written = None
+        Compositor.write(strip)
+
+    return timeit.timeit(write, number=ITERATIONS) / ITERATIONS * 1_000_000
+
+
+def main() -> None:
+    print(f"{'Pixels':>8} {'None (us)':>12} {'Tables (us)':>12} {'Function (us)':>14}")
+    for count in PIXEL_COUNTS:
+        none = time_write(new_strip(count, None))
+        tables = time_write(new_strip(count, ColourCorrection()))
+        strip = new_strip(count, None)
+        function = timeit.timeit(lambda: write_with_function(strip), number=ITERATIONS) / ITERATIONS * 1_000_000
+        print(f"{count:>8} {none:>12.1f} {tables:>12.1f} {function:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
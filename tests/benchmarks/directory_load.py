@@ -0,0 +1,181 @@
+# Load tests a coordinator running a real DirectoryService and NetworkController on
+# localhost with a number of simulated nodes. This is a desktop only tool, run it
+# from the root of the project with:
+#
+#   PYTHONPATH=. python tests/benchmarks/directory_load.py --nodes 200 --duration 30
+#
+# Every simulated node registers, then sends heartbeats and role lookups at the
+# configured rates until the duration has elapsed and finally unregisters. The
+# nodes all run in one process using asyncio; the existing send_*_message functions
+# are blocking so each message is sent from a worker thread. The coordinator runs
+# in its own thread with its own Runner, exactly as it would on a real coordinator.
+#
+# It reports the throughput, p50/p99 latency and error rate for each message type
+# so the point where the coordinator saturates can be found by increasing the number
+# of nodes or the rates until the latency or errors climb.
+#
+# The network is put into test mode, as it is under pytest, so the coordinator is
+# started by the NetworkController itself on localhost at a port from _get_port().
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from random import random
+# Importing unittest before interactive puts the network into test mode.
+import unittest  # noqa: F401
+
+from interactive.directory import DirectoryService, send_register_message, send_heartbeat_message, \
+    send_unregister_message
+from interactive.log import set_log_level, ERROR
+from interactive.network import NetworkController, YES, send_message, _get_host
+from interactive.polyfills.network import new_server
+from interactive.runner import Runner
+
+OPERATIONS = ["register", "heartbeat", "lookup", "unregister"]
+
+
+class Coordinator:
+    """
+    Runs a coordinator in a background thread on the given port, or the port
+    chosen by the NetworkController when it is 0.
+    """
+
+    def __init__(self, port: int = 0):
+        self.port = port
+        # Tolerate failures in the same way as the Interactive framework.
+        self.runner = Runner()
+        self.runner.cancel_on_exception = False
+        self.runner.restart_on_exception = True
+        self.service = DirectoryService()
+        self.__thread = None
+
+    def start(self) -> None:
+        server = new_server()
+        if self.port:
+            server.start(host=_get_host(), port=self.port)
+        controller = NetworkController(server)
+        self.port = server.port
+        controller.register(self.runner)
+        server.add_routes(self.service.get_routes())
+        self.service.register(self.runner)
+
+        self.__thread = threading.Thread(target=self.runner.run, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.runner.cancel = True
+        self.__thread.join()
+
+
+class Results:
+    """
+    Collects the latency of every message and the number of failures.
+    """
+
+    def __init__(self):
+        self.latencies = dict((operation, []) for operation in OPERATIONS)
+        self.errors = dict((operation, 0) for operation in OPERATIONS)
+
+    def record(self, operation: str, start: float, success: bool) -> None:
+        self.latencies[operation].append(time.perf_counter() - start)
+        if not success:
+            self.errors[operation] += 1
+
+    def report(self, elapsed: float) -> None:
+        print(f"{'Operation':<12} {'Count':>8} {'Errors':>8} {'Error %':>8} {'Per sec':>10} "
+              f"{'p50 (ms)':>10} {'p99 (ms)':>10}")
+        for operation in OPERATIONS:
+            latencies = sorted(self.latencies[operation])
+            count = len(latencies)
+            if count == 0:
+                continue
+
+            errors = self.errors[operation]
+            p50 = latencies[int(count * 0.50)] * 1000
+            p99 = latencies[min(int(count * 0.99), count - 1)] * 1000
+            print(f"{operation:<12} {count:>8} {errors:>8} {errors / count * 100:>8.1f} "
+                  f"{count / elapsed:>10.1f} {p50:>10.2f} {p99:>10.2f}")
+
+
+def lookup_role(coordinator: str, role: str) -> bool:
+    try:
+        with send_message(host=coordinator, path=f"/lookup/role/{role}") as response:
+            return response.status_code == 200
+    except OSError:
+        return False
+
+
+async def timed(results: Results, operation: str, func, *args) -> None:
+    start = time.perf_counter()
+    success = await asyncio.to_thread(func, *args)
+    results.record(operation, start, success is True or success == YES)
+
+
+async def simulate_node(index: int, args, coordinator: str, results: Results) -> None:
+    details = {
+        "name": f"node-{index}",
+        "role": f"role-{index % args.roles}",
+        "address": f"10.0.{index // 250}.{index % 250 + 1}:80",
+    }
+
+    # Spread the nodes out so they do not all start at the same instant.
+    await asyncio.sleep(random() * args.ramp)
+    await timed(results, "register", send_register_message, coordinator, details)
+
+    end = time.monotonic() + args.duration
+    next_heartbeat = time.monotonic() + random() / args.heartbeat_rate
+    next_lookup = time.monotonic() + random() / args.lookup_rate if args.lookup_rate > 0 else end
+
+    while time.monotonic() < end:
+        now = time.monotonic()
+        if now >= next_heartbeat:
+            next_heartbeat += 1 / args.heartbeat_rate
+            await timed(results, "heartbeat", send_heartbeat_message, coordinator, details)
+        elif now >= next_lookup:
+            next_lookup += 1 / args.lookup_rate
+            await timed(results, "lookup", lookup_role, coordinator, details["role"])
+        else:
+            await asyncio.sleep(min(next_heartbeat, next_lookup, end) - now)
+
+    await timed(results, "unregister", send_unregister_message, coordinator, details)
+
+
+async def run_nodes(args, coordinator: str, results: Results) -> None:
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+    await asyncio.gather(*[simulate_node(index, args, coordinator, results) for index in range(args.nodes)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test a directory coordinator.")
+    parser.add_argument("--nodes", type=int, default=100, help="Number of simulated nodes.")
+    parser.add_argument("--roles", type=int, default=5, help="Number of distinct roles.")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds each node runs for.")
+    parser.add_argument("--ramp", type=float, default=2, help="Seconds over which the nodes start.")
+    parser.add_argument("--heartbeat-rate", type=float, default=1, help="Heartbeats per node per second.")
+    parser.add_argument("--lookup-rate", type=float, default=1, help="Role lookups per node per second.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum messages in flight.")
+    parser.add_argument("--port", type=int, default=0, help="Coordinator port, a random test port by default.")
+    args = parser.parse_args()
+
+    set_log_level(ERROR)
+
+    coordinator = Coordinator(args.port)
+    coordinator.start()
+    address = f"{_get_host()}:{coordinator.port}"
+
+    print(f"Simulating {args.nodes} nodes against {address} for {args.duration} seconds...")
+    results = Results()
+    start = time.perf_counter()
+    try:
+        asyncio.run(run_nodes(args, address, results))
+    finally:
+        elapsed = time.perf_counter() - start
+        coordinator.stop()
+
+    results.report(elapsed)
+    print(f"Endpoints left registered: {len(coordinator.service.directory.lookup_all_endpoints())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Measures the memory a coordinator's directory uses for 1k and 10k endpoints.
+# This is a desktop only benchmark, run it from the root of the project with:
+#
+#   PYTHONPATH=. python tests/benchmarks/directory_memory.py
+#
+# Each endpoint is registered with freshly created strings, as they would be when
+# parsed from a message, so strings that are shared rather than copied show up.
+# It reports the memory allocated for the endpoints themselves and then for the
+# cached lookups, both in total and per endpoint. Desktop object sizes are larger
+# than on CircuitPython but the relative difference is what matters.
+import tracemalloc
+
+from interactive.directory import DirectoryController
+
+COUNTS = [1_000, 10_000]
+ROLES = 5
+
+
+def register(controller: DirectoryController, count: int) -> None:
+    for index in range(count):
+        controller.register_endpoint(
+            "".join(["10.0.", str(index // 250), ".", str(index % 250 + 1), ":80"]),
+            "".join(["node-", str(index)]),
+            "".join(["role-", str(index % ROLES)]))
+
+
+def lookup(controller: DirectoryController) -> list:
+    results = [controller.lookup_all_endpoints()]
+    for role in range(ROLES):
+        results.append(controller.lookup_endpoints_by_role(f"role-{role}"))
+    return results
+
+
+def measure(count: int) -> (int, int):
+    tracemalloc.start()
+    controller = DirectoryController()
+    register(controller, count)
+    endpoints = tracemalloc.get_traced_memory()[0]
+
+    results = lookup(controller)
+    caches = tracemalloc.get_traced_memory()[0] - endpoints
+    tracemalloc.stop()
+
+    assert len(results[0]) == count
+    return endpoints, caches
+
+
+def main() -> None:
+    print(f"{'Endpoints':>10} {'Directory':>12} {'Per endpoint':>14} {'Lookups':>12} {'Per endpoint':>14}")
+    for count in COUNTS:
+        endpoints, caches = measure(count)
+        print(f"{count:>10} {endpoints:>12} {endpoints / count:>14.1f} {caches:>12} {caches / count:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Checks that drawing a frame of the Flame and Lightning animations from
+# interactive/animation.py fits within the frame budget. This is a desktop only
+# benchmark, run it from the root of the project with:
+#
+#   PYTHONPATH=. python tests/benchmarks/flame_lightning_fps.py
+#
+# The effects need to run at TARGET_FPS on strips of 100 or more pixels on an
+# RP2040, which leaves 1 / TARGET_FPS seconds per frame. CircuitPython on the
+# RP2040 runs Python roughly DEVICE_SLOWDOWN times slower than a desktop, so the
+# desktop budget is the frame time divided by that. It is only an estimate, so the
+# effects are expected to be well inside it. Frames are drawn into a list backed
+# stand in for the pixels so the time is spent in the animation rather than writing
+# to a strip, and the benchmark fails if the 99th percentile frame is over budget.
+import sys
+import timeit
+
+from interactive.animation import Flame, Lightning
+
+PIXEL_COUNTS = [60, 120, 300]
+BUDGET_PIXELS = 120
+FRAMES = 5_000
+TARGET_FPS = 60
+DEVICE_SLOWDOWN = 100
+BUDGET = 1 / TARGET_FPS / DEVICE_SLOWDOWN
+
+EFFECTS = {
+    "Flame": lambda pixels: Flame(pixels, speed=0.01),
+    "Lightning": lambda pixels: Lightning(pixels, speed=0.01),
+}
+
+
+class ListPixels:
+    def __init__(self, size: int):
+        self.values = [0] * size
+
+    def __len__(self):
+        return len(self.values)
+
+    def __setitem__(self, index: int, value) -> None:
+        self.values[index] = value
+
+
+def frame_times(name: str, count: int) -> list[float]:
+    """
+    Returns the time taken to draw each frame in seconds, sorted.
+    """
+    animation = EFFECTS[name](ListPixels(count))
+    timer = timeit.default_timer
+    times = []
+    for _ in range(FRAMES):
+        start = timer()
+        animation.draw()
+        times.append(timer() - start)
+
+    return sorted(times)
+
+
+def main() -> None:
+    print(f"Budget for {BUDGET_PIXELS} pixels: {BUDGET * 1_000_000:.1f} us per frame")
+    print(f"{'Effect':<10} {'Pixels':>8} {'Mean (us)':>10} {'p99 (us)':>10} {'Max FPS':>10}")
+    over = []
+    for name in EFFECTS:
+        for count in PIXEL_COUNTS:
+            times = frame_times(name, count)
+            mean = sum(times) / len(times)
+            p99 = times[int(len(times) * 0.99)]
+            print(f"{name:<10} {count:>8} {mean * 1_000_000:>10.1f} {p99 * 1_000_000:>10.1f} {1 / mean:>10.0f}")
+            if count <= BUDGET_PIXELS and p99 > BUDGET:
+                over.append(f"{name} with {count} pixels")
+
+    if over:
+        print("Over budget: " + ", ".join(over))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
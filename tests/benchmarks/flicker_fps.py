@@ -0,0 +1,65 @@
+# Compares the frames per second of the Flicker animation from
+# interactive/animation.py against the original per pixel floating point version.
+# This is a desktop only benchmark, run it from the root of the project with:
+#
+#   PYTHONPATH=. python tests/benchmarks/flicker_fps.py
+#
+# Frames are drawn into a list backed stand in for the pixels so the time is spent
+# in the animation rather than writing to a strip. Desktop timings are much faster
+# than a microcontroller but the relative difference is what matters.
+import random
+import timeit
+
+from interactive.animation import Flicker
+from interactive.polyfills.animation import AMBER
+
+PIXEL_COUNTS = [8, 60, 300]
+DURATION = 1.0
+
+
+class ListPixels:
+    def __init__(self, size: int):
+        self.values = [0] * size
+
+    def __len__(self):
+        return len(self.values)
+
+    def __setitem__(self, index: int, value) -> None:
+        self.values[index] = value
+
+
+class OriginalFlicker(Flicker):
+    """
+    The original draw, which scales every pixel using floating point.
+    """
+
+    def draw(self):
+        for i in range(0, self._size, self._spacing):
+            brightness = random.randint(0, self._flame)
+            r = int(self._red[i] * (self._base + brightness) / 255) & 0xFF
+            g = int(self._green[i] * (self._base + brightness) / 255) & 0xFF
+            b = int(self._blue[i] * (self._base + brightness) / 255) & 0xFF
+            self.pixel_object[i] = (r, g, b)
+
+
+def frames_per_second(flicker: Flicker) -> float:
+    frames = 0
+    timer = timeit.default_timer
+    end = timer() + DURATION
+    while timer() < end:
+        flicker.draw()
+        frames += 1
+
+    return frames / DURATION
+
+
+def main() -> None:
+    print(f"{'Pixels':>8} {'Original FPS':>14} {'Flicker FPS':>14} {'Speed up':>10}")
+    for count in PIXEL_COUNTS:
+        original = frames_per_second(OriginalFlicker(ListPixels(count), speed=0.1, color=AMBER))
+        flicker = frames_per_second(Flicker(ListPixels(count), speed=0.1, color=AMBER))
+        print(f"{count:>8} {original:>14.0f} {flicker:>14.0f} {flicker / original:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# Compares drawing frames in x and y on a serpentine grid through a wrapper that
+# calls the gridmap for every pixel set, as is done without a Grid, with drawing
+# them into a Grid from interactive/grid.py, which writes the strip through its
+# index tables. This is a desktop only benchmark, run it from the root of the
+# project with:
+#
+#   PYTHONPATH=. python tests/benchmarks/grid_write.py
+#
+# Two kinds of frame are drawn: every pixel changing, as a rainbow does, and the
+# whole grid redrawn with only a dot moving, as most animations do. Desktop
+# timings are much faster than a microcontroller but the relative difference is
+# what matters.
+import timeit
+
+from interactive.grid import Grid
+from interactive.polyfills.pixelmap import horizontal_strip_gridmap
+
+GRID_SIZES = [(8, 8), (16, 16), (32, 8)]
+ITERATIONS = 2_000
+
+
+class ListPixels:
+    def __init__(self, size: int):
+        self.values = [0] * size
+        self.auto_write = False
+
+    def __len__(self):
+        return len(self.values)
+
+    def __setitem__(self, index: int, value) -> None:
+        self.values[index] = value
+
+    def show(self) -> None:
+        pass
+
+
+class MappedPixels:
+    """
+    Maps each pixel as it is set by calling the gridmap. The bounds are checked as
+    the gridmap would map an x past the end of a row onto the next row.
+    """
+
+    def __init__(self, pixels, width: int, height: int, gridmap):
+        self.pixels = pixels
+        self.width = width
+        self.height = height
+        self.gridmap = gridmap
+
+    def __setitem__(self, index, value) -> None:
+        x, y = index
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            raise IndexError("(%s, %s) is out of bounds!" % (x, y))
+        self.pixels[self.gridmap(x, y)] = value
+
+    def show(self) -> None:
+        self.pixels.show()
+
+
+def every_pixel(target, width: int, height: int, frame: int) -> None:
+    for y in range(height):
+        for x in range(width):
+            target[x, y] = (frame + x + y) & 0xFF
+    target.show()
+
+
+def moving_dot(target, width: int, height: int, frame: int) -> None:
+    dot = frame % (width * height)
+    for y in range(height):
+        for x in range(width):
+            target[x, y] = 0xFF0000 if y * width + x == dot else 0x000010
+    target.show()
+
+
+def main() -> None:
+    print(f"{'Frame':<12} {'Grid':>6} {'gridmap (us)':>14} {'Grid (us)':>11} {'Speed up':>9}")
+    for draw in (every_pixel, moving_dot):
+        for width, height in GRID_SIZES:
+            pixels = ListPixels(width * height)
+            gridmap = horizontal_strip_gridmap(width)
+            mapped = MappedPixels(pixels, width, height, gridmap)
+            grid = Grid(pixels, width, height, gridmap)
+            frame = [0]
+
+            def step(target):
+                frame[0] += 1
+                draw(target, width, height, frame[0])
+
+            mapped_time = timeit.timeit(lambda: step(mapped), number=ITERATIONS) / ITERATIONS
+            grid_time = timeit.timeit(lambda: step(grid), number=ITERATIONS) / ITERATIONS
+            print(f"{draw.__name__:<12} {f'{width}x{height}':>6} {mapped_time * 1_000_000:>14.1f} "
+                  f"{grid_time * 1_000_000:>11.1f} {mapped_time / grid_time:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
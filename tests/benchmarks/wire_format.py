@@ -0,0 +1,60 @@
+# Compares the binary wire format from interactive/wire.py against the JSON
+# messages that are sent today. This is a desktop only benchmark, run it from
+# the root of the project with:
+#
+#   PYTHONPATH=. python tests/benchmarks/wire_format.py
+#
+# It reports the message size along with the time taken and the memory allocated
+# to encode and decode a heartbeat message. Desktop timings are much faster than
+# a microcontroller but the relative difference is what matters.
+import json
+import timeit
+import tracemalloc
+
+from interactive.wire import MESSAGE_HEARTBEAT, add_roles, encode_directory_message, decode_message
+
+ITERATIONS = 100_000
+
+DETAILS = {
+    "name": "skull-path-3",
+    "role": "path",
+    "coordinator": "192.168.1.10",
+    "address": "192.168.1.23:80",
+}
+
+
+def encode_json() -> bytes:
+    return json.dumps(DETAILS).encode("utf-8")
+
+
+def encode_binary() -> bytes:
+    return encode_directory_message(MESSAGE_HEARTBEAT, DETAILS["name"], DETAILS["role"], DETAILS["address"])
+
+
+def allocated(func, *args) -> int:
+    """
+    Returns the number of bytes allocated by calling func once.
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def report(name: str, encode, decode) -> None:
+    data = encode()
+    encode_time = timeit.timeit(encode, number=ITERATIONS) / ITERATIONS * 1_000_000
+    decode_time = timeit.timeit(lambda: decode(data), number=ITERATIONS) / ITERATIONS * 1_000_000
+    print(f"{name:<16} {len(data):>6} {encode_time:>12.2f} {decode_time:>12.2f} "
+          f"{allocated(encode):>12} {allocated(decode, data):>12}")
+
+
+if __name__ == '__main__':
+    print(f"{'Format':<16} {'Bytes':>6} {'Encode (us)':>12} {'Decode (us)':>12} "
+          f"{'Encode (B)':>12} {'Decode (B)':>12}")
+    report("JSON", encode_json, json.loads)
+    report("Binary", encode_binary, decode_message)
+    add_roles(DETAILS["role"])
+    report("Binary (role)", encode_binary, decode_message)
@@ -0,0 +1,33 @@
+from interactive.compositor import colour_to_rgb
+
+
+class MockPixels:
+    """
+    Stands in for a strip of pixels. Records the values set as 0xRRGGBB integers,
+    or as given, the index of every pixel set and the number of times the strip
+    is shown.
+    """
+
+    def __init__(self, size: int = 0, bpp: int = 3):
+        self.values = [0] * size
+        self.auto_write = True
+        self.bpp = bpp
+        self.writes = []
+        self.shows = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def __setitem__(self, index: int, value) -> None:
+        self.values[index] = value
+        self.writes.append(index)
+
+    def __getitem__(self, index: int):
+        return self.values[index]
+
+    def fill(self, colour) -> None:
+        r, g, b = colour_to_rgb(colour)
+        self.values = [(r << 16) | (g << 8) | b] * len(self.values)
+
+    def show(self) -> None:
+        self.shows += 1
@@ -1,8 +1,167 @@
-import pytest
+import array
+import random
+
+from interactive import animation
+from interactive.animation import Flicker, Flame, Lightning
+
+
+class MockPixels:
+    """
+    Records the value written to each pixel.
+    """
+
+    def __init__(self, size: int):
+        self.values = [None] * size
+
+    def __len__(self):
+        return len(self.values)
+
+    def __setitem__(self, index: int, value) -> None:
+        self.values[index] = value
+
+
+def unpack(value: int) -> (int, int, int):
+    return value >> 16, (value >> 8) & 0xFF, value & 0xFF
 
 
 class TestFlicker:
 
-    @pytest.mark.skip(reason="tests not implemented yet")
-    def test_write_tests(self) -> None:
-        assert False
+    def test_set_and_get(self) -> None:
+        pixels = MockPixels(4)
+        flicker = Flicker(pixels, speed=0.1, color=(255, 128, 1))
+        assert len(flicker) == 4
+        assert pixels.values == [(255, 128, 1)] * 4
+
+        flicker[2] = (1, 2, 3)
+        assert flicker[2] == (1, 2, 3)
+        assert pixels.values[2] == (1, 2, 3)
+
+    def test_draw_matches_brightness(self) -> None:
+        """
+        Validates that each drawn pixel is the colour scaled by a brightness between
+        base and (base + flame), exactly as integer division by 255 would give.
+        """
+        random.seed(1)
+        pixels = MockPixels(300)
+        flicker = Flicker(pixels, speed=0.1, color=(255, 128, 7), base=100, flame=50)
+
+        for _ in range(10):
+            flicker.draw()
+            levels = set()
+            for value in pixels.values:
+                r, g, b = unpack(value)
+                level = next(level for level in range(100, 151) if r == 255 * level // 255)
+                assert (g, b) == (128 * level // 255, 7 * level // 255)
+                levels.add(level)
+
+            assert len(levels) > 10
+
+    def test_brightness_is_limited(self) -> None:
+        pixels = MockPixels(8)
+        flicker = Flicker(pixels, speed=0.1, color=(255, 255, 255), base=200, flame=200)
+        flicker.draw()
+        assert all(200 <= unpack(value)[0] <= 255 for value in pixels.values)
+
+    def test_spacing(self) -> None:
+        pixels = MockPixels(6)
+        flicker = Flicker(pixels, speed=0.1, color=(10, 20, 30), spacing=2)
+        pixels.values = [None] * 6
+        flicker.draw()
+        assert [value is None for value in pixels.values] == [False, True] * 3
+
+    def test_every_pixel_uses_a_different_scale(self, monkeypatch) -> None:
+        """
+        Validates that the odd stride means no scale is reused within a frame as long
+        as there are no more pixels than scales.
+        """
+        monkeypatch.setattr(animation, 'FLICKER_SCALES', 16)
+        monkeypatch.setattr(random, 'randint', lambda a, b: b)
+        pixels = MockPixels(16)
+        flicker = Flicker(pixels, speed=0.1, color=(255, 255, 255))
+        flicker._scales = array.array("I", [level << 12 for level in range(16)])
+
+        flicker.draw()
+        assert len(set(pixels.values)) == 16
+
+
+class TestFlame:
+
+    def test_draws_the_heat(self) -> None:
+        random.seed(1)
+        pixels = MockPixels(30)
+        flame = Flame(pixels, speed=0.1, color=(255, 40, 0))
+
+        bottom = top = 0
+        for _ in range(100):
+            flame.draw()
+            assert pixels.values == [flame._palette[heat] for heat in flame._heat]
+            bottom += sum(flame._heat[:10])
+            top += sum(flame._heat[20:])
+
+        # The bottom of the flame is hotter than the top.
+        assert bottom > top
+
+    def test_reverse(self) -> None:
+        random.seed(1)
+        pixels = MockPixels(30)
+        flame = Flame(pixels, speed=0.1, reverse=True)
+
+        flame.draw()
+        assert pixels.values == [flame._palette[heat] for heat in reversed(flame._heat)]
+
+    def test_no_sparks_is_dark(self) -> None:
+        pixels = MockPixels(10)
+        flame = Flame(pixels, speed=0.1, sparking=0)
+
+        for _ in range(10):
+            flame.draw()
+        assert pixels.values == [0] * 10
+
+    def test_empty_strip(self) -> None:
+        """
+        Validates that a flame, and lightning, on a strip with no pixels draws nothing
+        rather than dividing by zero.
+        """
+        pixels = MockPixels(0)
+        flame = Flame(pixels, speed=0.1, sparking=255)
+        lightning = Lightning(pixels, speed=0.1, delay=0)
+
+        for _ in range(10):
+            flame.draw()
+            lightning.draw()
+        assert pixels.values == []
+
+    def test_palette(self) -> None:
+        flame = Flame(MockPixels(1), speed=0.1, color=(255, 40, 0))
+
+        assert unpack(flame._palette[0]) == (0, 0, 0)
+        assert unpack(flame._palette[127]) == (255, 40, 0)
+        assert unpack(flame._palette[255]) == (255, 255, 255)
+
+
+class TestLightning:
+
+    def test_strike(self, monkeypatch) -> None:
+        """
+        Validates that a strike waits, lights the flash, fades it and then clears it.
+        """
+        monkeypatch.setattr(random, 'randint', lambda a, b: a)
+        pixels = MockPixels(8)
+        lightning = Lightning(pixels, speed=0.1, color=(255, 255, 255), flashes=1, delay=2, decay=128)
+        lightning._noise[:] = bytes([255]) * len(lightning._noise)
+
+        # The first draw starts a strike after a wait of one draw.
+        lightning.draw()
+        lightning.draw()
+        assert pixels.values == [None] * 8
+
+        # The flash starts at the first pixel and lights a quarter of the strip plus one.
+        lightning.draw()
+        assert pixels.values == [0xBFBFBF] * 3 + [None] * 5
+
+        lightning.draw()
+        assert pixels.values == [0x5F5F5F] * 3 + [None] * 5
+
+        for _ in range(3):
+            lightning.draw()
+        assert pixels.values == [0] * 3 + [None] * 5
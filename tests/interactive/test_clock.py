@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from interactive.clock import ClockSync
+from interactive.control import NS_PER_SECOND
+
+MS = NS_PER_SECOND // 1000
+
+
+def sample(local_ns: int, offset_ns: int, there_ns: int, back_ns: int) -> (int, int, int, int):
+    """
+    Returns the four timestamps for a request sent at local_ns to a clock that is
+    offset_ns ahead, taking there_ns to arrive and back_ns for the response.
+    """
+    t1 = local_ns
+    t2 = t1 + there_ns + offset_ns
+    t3 = t2 + MS
+    t4 = t3 - offset_ns + back_ns
+    return t1, t2, t3, t4
+
+
+class TestClockSync:
+
+    def test_invalid_sample_count(self) -> None:
+        with pytest.raises(ValueError):
+            ClockSync(0)
+
+    def test_not_synced(self) -> None:
+        """
+        Validates that before any samples the clock is the local clock.
+        """
+        clock = ClockSync()
+        assert not clock.synced
+        assert clock.offset == 0
+        assert clock.delay is None
+
+        before = time.monotonic()
+        now = clock.synced_now()
+        assert before <= now <= time.monotonic()
+        assert clock.to_local(12.5) == 12.5
+
+    def test_first_sample_sets_offset(self) -> None:
+        """
+        Validates that a symmetric sample gives the exact offset.
+        """
+        clock = ClockSync()
+        clock.add_sample(*sample(1_000 * MS, 250 * MS, 5 * MS, 5 * MS))
+        assert clock.synced
+        assert clock.offset == pytest.approx(0.25)
+        assert clock.delay == pytest.approx(0.01)
+
+        now = clock.synced_now()
+        assert now - time.monotonic() == pytest.approx(0.25, abs=0.001)
+        assert clock.to_local(now) == pytest.approx(now - 0.25)
+
+    def test_nanoseconds_are_exact(self) -> None:
+        """
+        Validates that offsets are whole nanoseconds, so times far from zero are
+        converted without losing any precision.
+        """
+        clock = ClockSync()
+        clock.add_sample(*sample(1_000 * MS, 250 * MS + 1, 5 * MS, 5 * MS))
+        assert isinstance(clock.synced_now_ns(), int)
+
+        synced_ns = 10 ** 18 + 7
+        assert clock.to_local_ns(synced_ns) == synced_ns - 250 * MS - 1
+
+    def test_shortest_delay_wins(self) -> None:
+        """
+        Validates that asymmetric slow samples do not move the offset when a
+        recent sample had a shorter delay.
+        """
+        clock = ClockSync()
+        clock.add_sample(*sample(1_000 * MS, 250 * MS, 2 * MS, 2 * MS))
+        for i in range(1, 5):
+            clock.add_sample(*sample((1_000 + i * 100) * MS, 250 * MS, 80 * MS, 2 * MS))
+            assert clock.offset == pytest.approx(0.25)
+
+        # Once the good sample has dropped out of the window the best of the
+        # slow samples is used, but only part of its error is applied. The
+        # samples are taken in the recent past so any drift is not exaggerated.
+        base = time.monotonic_ns() // MS - 1_000
+        clock = ClockSync(2)
+        clock.add_sample(*sample(base * MS, 250 * MS, 2 * MS, 2 * MS))
+        for i in range(1, 3):
+            clock.add_sample(*sample((base + i * 100) * MS, 250 * MS, 80 * MS, 2 * MS))
+        assert 0.25 < clock.offset < 0.25 + 0.039
+
+    def test_tracks_drift(self) -> None:
+        """
+        Validates that the clock converges on a remote clock that runs faster
+        than the local clock.
+        """
+        drift = 0.0001  # 100ppm
+        clock = ClockSync()
+        for i in range(200):
+            local_ns = i * 2 * NS_PER_SECOND
+            clock.add_sample(*sample(local_ns, int(local_ns * drift) + 250 * MS, 3 * MS, 3 * MS))
+
+        assert clock.drift == pytest.approx(drift, rel=0.1)
+
+    def test_ignores_impossible_samples(self) -> None:
+        clock = ClockSync()
+        clock.add_sample(1_000, 5_000, 6_000, 1_500)
+        assert not clock.synced
+
+    def test_reset(self) -> None:
+        clock = ClockSync()
+        clock.add_sample(*sample(1_000 * MS, 250 * MS, 5 * MS, 5 * MS))
+        clock.reset()
+        assert not clock.synced
+        assert clock.offset == 0
+        assert clock.drift == 0
+        assert clock.delay is None
@@ -0,0 +1,263 @@
+import asyncio
+
+import pytest
+
+from interactive.compositor import Compositor, Layer, PaletteLayer, BLEND_OVER, BLEND_ADD, BLEND_MAX, BLEND_MASK
+from mock_pixels import MockPixels
+
+
+class MockAnimation:
+    """
+    Fills its pixels with a colour and shows them, as the animations do.
+    """
+
+    def __init__(self, pixel_object, colour):
+        self.pixel_object = pixel_object
+        self.colour = colour
+        self.due = True
+
+    def animate(self, show=True) -> bool:
+        if not self.due:
+            return False
+
+        self.pixel_object.fill(self.colour)
+        if show:
+            self.pixel_object.show()
+        return True
+
+
+class TestLayer:
+
+    def test_pixel_interface(self) -> None:
+        layer = Layer(4)
+        assert len(layer) == 4
+        assert layer.n == 4
+
+        layer[0] = (1, 2, 3)
+        layer[-1] = 0x040506
+        layer[1:3] = [(7, 8, 9, 0), 0x0A0B0C]
+        assert layer[:] == [(1, 2, 3), (7, 8, 9), (10, 11, 12), (4, 5, 6)]
+        assert layer.changed
+
+        layer.fill((255, 0, 1))
+        assert layer[2] == (255, 0, 1)
+
+        with pytest.raises(IndexError):
+            layer[4] = (0, 0, 0)
+
+
+class TestPaletteLayer:
+
+    def test_pixel_interface(self) -> None:
+        """
+        Validates that colours are added to the palette as they are used and that
+        each pixel is stored as one byte.
+        """
+        layer = PaletteLayer(4)
+        assert len(layer.indices) == 4
+        assert layer[0] == (0, 0, 0)
+
+        layer[0] = (1, 2, 3)
+        layer[1:3] = [0x010203, (4, 5, 6, 7)]
+        assert layer[:] == [(1, 2, 3), (1, 2, 3), (4, 5, 6), (0, 0, 0)]
+        assert list(layer.indices) == [1, 1, 2, 0]
+        assert layer.changed
+
+        layer.fill((4, 5, 6))
+        assert list(layer.indices) == [2, 2, 2, 2]
+
+    def test_palette(self) -> None:
+        layer = PaletteLayer(3, colours=2)
+        layer[0] = (9, 9, 9)
+        # Every entry is in use, so the nearest colour is used.
+        layer[1] = (8, 8, 8)
+        assert layer[1] == (9, 9, 9)
+
+        # Changing a palette colour changes every pixel using it.
+        layer.set_colour(1, (7, 7, 7))
+        assert layer[0] == (7, 7, 7)
+        assert layer.index_of((7, 7, 7)) == 1
+        layer[2] = (200, 0, 0)
+        assert layer[2] == (7, 7, 7)
+
+        # Once a colour is no longer used its entry is reused.
+        layer.blend_into(bytearray(9))
+        layer.fill((1, 1, 1))
+        layer[0] = (255, 255, 255)
+        assert layer[:] == [(255, 255, 255), (1, 1, 1), (1, 1, 1)]
+
+        # Entries are only looked for once a frame.
+        layer[1:3] = [(255, 255, 255)] * 2
+        layer[0] = (3, 3, 3)
+        assert layer[0] == (1, 1, 1)
+        layer[0] = (255, 255, 255)
+        layer.blend_into(bytearray(9))
+        layer[0] = (3, 3, 3)
+        assert layer[:] == [(3, 3, 3), (255, 255, 255), (255, 255, 255)]
+
+        with pytest.raises(IndexError):
+            layer.set_colour(2, (0, 0, 0))
+        with pytest.raises(ValueError):
+            PaletteLayer(3, colours=257)
+
+    def test_colours_that_keep_changing(self) -> None:
+        """
+        Validates that an animation drawing new colours every frame, many more than
+        fit in the palette, is drawn exactly whilst each frame fits in the palette
+        and with the nearest colours when it does not.
+        """
+        pixels = MockPixels(30)
+        compositor = Compositor()
+        layer = compositor.new_palette_layer(pixels)
+        for frame in range(1000):
+            colours = [((frame * 7 + i) & 0xFF, (frame * 3) & 0xFF, i) for i in range(30)]
+            layer[:] = colours
+            compositor.animate()
+            assert pixels.values == [(r << 16) | (g << 8) | b for r, g, b in colours]
+
+        layer = PaletteLayer(30, colours=8)
+        for frame in range(100):
+            colours = [((frame + i * 8) & 0xFF, 0, 0) for i in range(30)]
+            layer[:] = colours
+            layer.blend_into(bytearray(90))
+            palette = set(tuple(layer.palette[i:i + 3]) for i in range(0, 24, 3))
+            for colour, drawn in zip(colours, layer[:]):
+                assert drawn in palette
+                assert drawn == colour or colour not in palette
+
+    def test_blends_match_layer(self) -> None:
+        """
+        Validates that blending straight from the palette gives the same frame as
+        blending the same colours from a Layer, in every blend mode.
+        """
+        colours = [(0, 0, 0), (200, 10, 90), (255, 255, 255), (30, 0, 255)]
+        for blend in [BLEND_OVER, BLEND_ADD, BLEND_MAX, BLEND_MASK]:
+            frames = []
+            for new_layer in [Compositor.new_layer, Compositor.new_palette_layer]:
+                pixels = MockPixels(4)
+                compositor = Compositor()
+                compositor.new_layer(pixels).fill((100, 100, 100))
+                new_layer(compositor, pixels, blend)[:] = colours
+                compositor.animate()
+                frames.append(pixels.values)
+            assert frames[0] == frames[1]
+
+        for layer in [Layer(2, blend=99), PaletteLayer(2, blend=99)]:
+            with pytest.raises(ValueError):
+                layer.blend_into(bytearray(6))
+
+    def test_blended_by_compositor(self) -> None:
+        pixels = MockPixels(3)
+        compositor = Compositor()
+        compositor.new_layer(pixels).fill((200, 100, 50))
+        top = compositor.new_palette_layer(pixels, BLEND_ADD, colours=4)
+        top[1] = (0, 0, 255)
+        mask = compositor.new_palette_layer(pixels, BLEND_MASK, colours=4)
+        mask.fill((255, 255, 255))
+        mask[2] = (0, 0, 0)
+
+        compositor.animate()
+        assert pixels.values == [0xC86432, 0xC864FF, 0]
+
+
+class TestCompositor:
+
+    def test_one_write_per_strip_per_frame(self) -> None:
+        """
+        Validates that several animations on one strip, and animations on several
+        strips, result in each strip being shown once per frame.
+        """
+        first = MockPixels(3)
+        second = MockPixels(2)
+        compositor = Compositor()
+        animations = [
+            MockAnimation(compositor.new_layer(first), (10, 0, 0)),
+            MockAnimation(compositor.new_layer(first, BLEND_ADD), (0, 20, 0)),
+            MockAnimation(compositor.new_layer(second), (0, 0, 30)),
+        ]
+        for animation in animations:
+            compositor.add_animation(animation)
+
+        assert not first.auto_write
+        compositor.animate()
+        assert (first.shows, second.shows) == (1, 1)
+        assert first.values == [0x0A1400] * 3
+        assert second.values == [0x00001E] * 2
+
+        # Strips are only written when one of their layers was drawn.
+        animations[0].colour = (11, 0, 0)
+        animations[2].due = False
+        compositor.animate()
+        assert (first.shows, second.shows) == (2, 1)
+
+    def test_unchanged_frames_are_not_written(self) -> None:
+        """
+        Validates that a frame the same as the last one is not written and that
+        otherwise only the pixels that changed are set.
+        """
+        pixels = MockPixels(4)
+        compositor = Compositor()
+        layer = compositor.new_layer(pixels)
+        layer.fill((1, 2, 3))
+        compositor.animate()
+        assert (pixels.shows, pixels.writes) == (1, [0, 1, 2, 3])
+
+        layer.fill((1, 2, 3))
+        compositor.animate()
+        assert (pixels.shows, pixels.writes) == (1, [0, 1, 2, 3])
+
+        layer[2] = (1, 2, 4)
+        compositor.animate()
+        assert (pixels.shows, pixels.writes[4:]) == (2, [2])
+        assert pixels.values[2] == 0x010204
+
+    @pytest.mark.parametrize("blend, expected", [
+        (BLEND_OVER, [(0, 0, 255), (200, 100, 50), (128, 128, 128)]),
+        (BLEND_ADD, [(200, 100, 255), (200, 100, 50), (255, 228, 178)]),
+        (BLEND_MAX, [(200, 100, 255), (200, 100, 50), (200, 128, 128)]),
+        (BLEND_MASK, [(0, 0, 50), (0, 0, 0), (100, 50, 25)]),
+    ])
+    def test_blend_modes(self, blend, expected) -> None:
+        pixels = MockPixels(3)
+        compositor = Compositor()
+        compositor.new_layer(pixels).fill((200, 100, 50))
+        top = compositor.new_layer(pixels, blend)
+        top[:] = [(0, 0, 255), (0, 0, 0), (128, 128, 128)]
+
+        compositor.animate()
+        assert [((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF) for value in pixels.values] == expected
+
+    def test_hidden_layers(self) -> None:
+        pixels = MockPixels(1)
+        compositor = Compositor()
+        compositor.new_layer(pixels).fill((1, 2, 3))
+        top = compositor.new_layer(pixels)
+        top.fill((4, 5, 6))
+        compositor.animate()
+        assert pixels.values == [0x040506]
+
+        top.visible = False
+        compositor.animate()
+        assert pixels.values == [0x010203]
+        assert pixels.shows == 2
+
+    def test_registering_with_runner(self) -> None:
+        class MockRunner:
+            def __init__(self):
+                self.cancel = False
+                self.tasks = []
+
+            def add_loop_task(self, task) -> None:
+                self.tasks.append(task)
+
+        pixels = MockPixels(2)
+        compositor = Compositor()
+        compositor.add_animation(MockAnimation(compositor.new_layer(pixels), (1, 1, 1)))
+        runner = MockRunner()
+        compositor.register(runner)
+
+        asyncio.run(runner.tasks[0]())
+        assert pixels.shows == 1
+        runner.cancel = True
+        asyncio.run(runner.tasks[0]())
+        assert pixels.shows == 1
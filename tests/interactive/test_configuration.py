@@ -47,6 +47,24 @@ class TestNode:
         config = configuration.get_node_config(network=True, directory=True)
         assert config.directory
 
+        # The directory is only journaled when a path is given.
+        assert defaults.directory_journal is None
+        assert config.directory_journal is None
+        monkeypatch.setattr(configuration, 'DIRECTORY_JOURNAL', "/tmp/directory")
+        config = configuration.get_node_config(network=True, directory=True)
+        assert config.directory_journal == "/tmp/directory"
+        config = configuration.get_node_config(network=True)
+        assert config.directory_journal is None
+
+        assert not defaults.datagram
+        # Can't enable the datagram service if the network is not enabled.
+        config = configuration.get_node_config(network=False, datagram=True)
+        assert not config.datagram
+        config = configuration.get_node_config(network=True)
+        assert not config.datagram
+        config = configuration.get_node_config(network=True, datagram=True)
+        assert config.datagram
+
         config = configuration.get_node_config(button=False)
         assert config.button_pin == defaults.button_pin
 
@@ -0,0 +1,52 @@
+import pytest
+
+from interactive.compositor import Compositor
+from interactive.correction import ColourCorrection, new_correction_table
+from mock_pixels import MockPixels
+
+
+class TestColourCorrection:
+
+    def test_tables(self) -> None:
+        assert new_correction_table(1.0) == bytes(range(256))
+
+        table = new_correction_table(2.0)
+        assert (table[0], table[128], table[255]) == (0, 64, 255)
+
+        table = new_correction_table(1.0, 0.5)
+        assert (table[0], table[255]) == (0, 128)
+        assert new_correction_table(1.0, 2.0) == bytes(range(256))
+
+        with pytest.raises(ValueError):
+            new_correction_table(0)
+
+    def test_correct(self) -> None:
+        """
+        Validates that colours are corrected in the form they are given, including
+        the white of RGBW colours.
+        """
+        correction = ColourCorrection(1.0, red=0.5, green=1.0, blue=0.0, white=0.5)
+        assert correction.correct(0xFFFFFF) == 0x80FF00
+        assert correction.correct((255, 255, 255)) == (128, 255, 0)
+        assert correction.correct((255, 255, 255, 255)) == (128, 255, 0, 128)
+
+    def test_applied_by_compositor(self) -> None:
+        pixels = MockPixels(2)
+        compositor = Compositor()
+        compositor.new_layer(pixels).fill((128, 255, 64))
+        compositor.animate()
+        assert pixels.values == [0x80FF40] * 2
+
+        # Setting the correction writes the whole strip again, corrected.
+        compositor.set_correction(pixels, ColourCorrection(2.0, blue=0.5))
+        compositor.animate()
+        assert pixels.values == [0x40FF08] * 2
+
+        # Greys are written to the white LED of RGBW strips through the white table.
+        pixels = MockPixels(3, bpp=4)
+        layer = compositor.new_layer(pixels)
+        compositor.set_correction(pixels, ColourCorrection(1.0, red=0.5, white=0.5))
+        layer[0] = (200, 200, 200)
+        layer[1] = (200, 200, 100)
+        compositor.animate()
+        assert pixels.values == [(0, 0, 0, 100), 0x64C864, (0, 0, 0, 0)]
@@ -0,0 +1,355 @@
+import asyncio
+import socket
+import time
+from collections.abc import Callable, Awaitable
+from random import randint
+
+from adafruit_httpserver import GET, OK_200, BAD_REQUEST_400, NOT_FOUND_404
+
+import interactive.datagram as datagram
+from interactive.datagram import DatagramService, encode_datagram, decode_datagram
+from interactive.datagram import DATAGRAM_REGISTER, DATAGRAM_UNREGISTER, DATAGRAM_HEARTBEAT
+from interactive.datagram import DATAGRAM_DISCOVER, DATAGRAM_COORDINATOR, DATAGRAM_TRIGGER
+from interactive.clock import ClockSync
+from interactive.directory import DirectoryController
+from interactive.runner import Runner
+from interactive.wire import MESSAGE_REGISTER, MESSAGE_UNREGISTER, encode_directory_message, encode_trigger_message
+from test_network import MockRequest
+
+
+def get_ports() -> (int, int):
+    """
+    Returns two different random ports to use for a coordinator and a node.
+    """
+    port = randint(5001, 50000)
+    return port, port + 1
+
+
+class TestDatagrams:
+
+    def test_encode_decode(self) -> None:
+        """
+        Validates that datagrams round trip through encoding and decoding.
+        """
+        data = encode_datagram(DATAGRAM_REGISTER, "alpha", "path", "1.2.3.4:80")
+        assert data == b"R\talpha\tpath\t1.2.3.4:80"
+        assert decode_datagram(data) == [DATAGRAM_REGISTER, "alpha", "path", "1.2.3.4:80"]
+        assert decode_datagram(memoryview(data)) == [DATAGRAM_REGISTER, "alpha", "path", "1.2.3.4:80"]
+
+        assert decode_datagram(encode_datagram(DATAGRAM_DISCOVER)) == [DATAGRAM_DISCOVER]
+
+    def test_registering_with_runner(self) -> None:
+        """
+        Validates the DatagramService registers with the Runner, with and
+        without discovery enabled.
+        """
+        add_task_count: int = 0
+
+        class TestRunner(Runner):
+            def add_loop_task(self, task: Callable[[], Awaitable[None]]) -> None:
+                nonlocal add_task_count
+                add_task_count += 1
+
+            def add_task(self, task: Callable[[], Awaitable[None]]) -> None:
+                nonlocal add_task_count
+                add_task_count += 1
+
+        port, _ = get_ports()
+        service = DatagramService(port=port)
+        assert add_task_count == 0
+        service.register(TestRunner())
+        assert add_task_count == 2
+
+        add_task_count = 0
+        service = DatagramService(discover=True, port=port + 2)
+        service.register(TestRunner())
+        assert add_task_count == 3
+
+    def test_coordinator_receives_messages(self) -> None:
+        """
+        Validates that a coordinator feeds register, heartbeat and unregister
+        messages into its directory. Nodes ignore these messages.
+        """
+        directory = DirectoryController()
+        coordinator = DatagramService(directory)
+        sender = ("1.2.3.4", 5002)
+
+        coordinator.receive_datagram(encode_datagram(DATAGRAM_REGISTER, "AlPhA", "Path", "1.2.3.4:80"), sender)
+        assert directory.lookup_all_endpoints() == {"alpha": "1.2.3.4:80"}
+        assert directory.lookup_endpoints_by_role("path") == {"alpha": "1.2.3.4:80"}
+
+        coordinator.receive_datagram(encode_datagram(DATAGRAM_HEARTBEAT, "beta", "witch", "a.b.c.d:80"), sender)
+        assert directory.lookup_all_endpoints() == {"alpha": "1.2.3.4:80", "beta": "a.b.c.d:80"}
+
+        # Malformed datagrams are ignored.
+        coordinator.receive_datagram(encode_datagram(DATAGRAM_REGISTER, "gamma"), sender)
+        assert len(directory.lookup_all_endpoints()) == 2
+
+        coordinator.receive_datagram(encode_datagram(DATAGRAM_UNREGISTER, "alpha", "path", "1.2.3.4:80"), sender)
+        assert directory.lookup_all_endpoints() == {"beta": "a.b.c.d:80"}
+
+        # A node has no directory so simply ignores them.
+        node = DatagramService()
+        node.receive_datagram(encode_datagram(DATAGRAM_REGISTER, "alpha", "path", "1.2.3.4:80"), sender)
+
+    def test_coordinator_receives_binary_messages(self) -> None:
+        """
+        Validates that a coordinator accepts binary datagrams alongside the text ones.
+        """
+        directory = DirectoryController()
+        coordinator = DatagramService(directory)
+        sender = ("1.2.3.4", 5002)
+
+        coordinator.receive_datagram(encode_directory_message(MESSAGE_REGISTER, "alpha", "path", "1.2.3.4:80"), sender)
+        assert directory.lookup_all_endpoints() == {"alpha": "1.2.3.4:80"}
+
+        # Binary messages that are not directory messages are ignored.
+        coordinator.receive_datagram(encode_trigger_message("alpha"), sender)
+        assert directory.lookup_all_endpoints() == {"alpha": "1.2.3.4:80"}
+
+        coordinator.receive_datagram(encode_directory_message(MESSAGE_UNREGISTER, "alpha", "path", "1.2.3.4"), sender)
+        assert directory.lookup_all_endpoints() == {}
+
+    def test_unencodable_binary_messages_are_sent_as_text(self, monkeypatch) -> None:
+        """
+        Validates that a node whose details do not fit the binary encoding falls
+        back to the text datagram rather than failing to send.
+        """
+        monkeypatch.setattr(datagram, 'BINARY_MESSAGES', True)
+        monkeypatch.setattr(datagram, 'get_address', lambda: "1.2.3.4:70000")
+        sent = []
+        node = DatagramService(coordinator="127.0.0.1")
+        monkeypatch.setattr(node, 'send_datagram', lambda data, address: sent.append(data))
+
+        node._DatagramService__send_to_coordinator(DATAGRAM_REGISTER)
+        assert decode_datagram(sent[0])[0] == DATAGRAM_REGISTER
+        assert decode_datagram(sent[0])[3] == "1.2.3.4:70000"
+
+    def test_removed_nodes_are_forgotten(self) -> None:
+        """
+        Validates that the datagram address of a node is forgotten once the
+        directory removes it, however it is removed.
+        """
+        directory = DirectoryController()
+        coordinator = DatagramService(directory)
+        endpoints = coordinator._DatagramService__endpoints
+        for name in ["alpha", "beta"]:
+            coordinator.receive_datagram(
+                encode_datagram(DATAGRAM_REGISTER, name, "path", "1.2.3.4:80"), ("1.2.3.4", 5002))
+        assert sorted(endpoints.keys()) == ["alpha", "beta"]
+
+        directory.unregister_endpoint("ALPHA")
+        assert list(endpoints.keys()) == ["beta"]
+
+    def test_node_learns_coordinator(self) -> None:
+        """
+        Validates that a node takes the first coordinator that responds.
+        """
+        node = DatagramService(coordinator=None, discover=True)
+        assert node.coordinator is None
+
+        node.receive_datagram(encode_datagram(DATAGRAM_COORDINATOR, "1.2.3.4:80"), ("1.2.3.4", 5002))
+        assert node.coordinator == "1.2.3.4:80"
+
+        node.receive_datagram(encode_datagram(DATAGRAM_COORDINATOR, "5.6.7.8:80"), ("5.6.7.8", 5002))
+        assert node.coordinator == "1.2.3.4:80"
+
+    def test_coordinator_answers_discovery(self) -> None:
+        """
+        Validates a coordinator responds to a discovery request sent to its port.
+        """
+        port, _ = get_ports()
+
+        called_count: int = 0
+
+        async def callback():
+            nonlocal called_count
+            called_count += 1
+            runner.cancel = called_count >= 5
+
+        runner = Runner()
+        coordinator = DatagramService(DirectoryController(), port=port)
+        coordinator.register(runner)
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client:
+            client.settimeout(2)
+            client.sendto(encode_datagram(DATAGRAM_DISCOVER), ("127.0.0.1", port))
+            runner.run(callback)
+
+            data, _ = client.recvfrom(256)
+            fields = decode_datagram(data)
+            assert fields[0] == DATAGRAM_COORDINATOR
+            # Under test the port in the address is random so only check the host.
+            assert fields[1].startswith("127.0.0.1:")
+
+    def test_node_discovers_and_registers_with_coordinator(self, monkeypatch) -> None:
+        """
+        Runs a coordinator and a node together. The node discovers the coordinator,
+        registers with it, sends heartbeats and then unregisters on cancellation.
+        """
+        monkeypatch.setattr(datagram, 'NETWORK_HEARTBEAT_FREQUENCY', 10)
+        monkeypatch.setattr(datagram, 'DATAGRAM_DISCOVERY_FREQUENCY', 10)
+
+        coordinator_port, node_port = get_ports()
+
+        registered = False
+        called_count: int = 0
+
+        async def callback():
+            nonlocal called_count, registered
+            called_count += 1
+            if len(directory.lookup_all_endpoints()) > 0:
+                registered = True
+            runner.cancel = called_count >= 10
+
+        runner = Runner()
+        directory = DirectoryController()
+        coordinator = DatagramService(directory, port=coordinator_port)
+        coordinator.register(runner)
+        node = DatagramService(
+            coordinator=None, discover=True, port=node_port,
+            coordinator_port=coordinator_port, broadcast="127.0.0.1")
+        node.register(runner)
+
+        runner.run(callback)
+
+        assert node.coordinator.startswith("127.0.0.1:")
+        assert registered
+        # The node will have unregistered during cancellation but the coordinator
+        # may not have processed it before it also shutdown.
+        assert len(directory.lookup_all_endpoints()) <= 1
+
+    def test_node_receives_trigger(self) -> None:
+        """
+        Validates that text and binary trigger datagrams call the trigger callback.
+        """
+        triggered_count: int = 0
+
+        def trigger():
+            nonlocal triggered_count
+            triggered_count += 1
+
+        port, _ = get_ports()
+        service = DatagramService(port=port, trigger_callback=trigger)
+        service.receive_datagram(encode_datagram(DATAGRAM_TRIGGER, "coordinator", "0"), ("127.0.0.1", 5002))
+        assert triggered_count == 1
+        service.receive_datagram(encode_trigger_message("coordinator"), ("127.0.0.1", 5002))
+        assert triggered_count == 2
+
+        # Without a trigger callback, trigger datagrams are ignored.
+        service = DatagramService(port=port + 2)
+        service.receive_datagram(encode_datagram(DATAGRAM_TRIGGER, "coordinator", "0"), ("127.0.0.1", 5002))
+        assert triggered_count == 2
+
+    def test_coordinator_triggers_role(self, monkeypatch) -> None:
+        """
+        Runs a coordinator and a node together. Once the node has registered the
+        coordinator triggers its role and the node is triggered after the delay.
+        """
+        monkeypatch.setattr(datagram, 'NETWORK_HEARTBEAT_FREQUENCY', 10)
+
+        coordinator_port, node_port = get_ports()
+
+        triggered_count: int = 0
+        sent_count: int = 0
+        called_count: int = 0
+
+        def trigger():
+            nonlocal triggered_count
+            triggered_count += 1
+
+        async def callback():
+            nonlocal called_count, sent_count
+            called_count += 1
+            if sent_count == 0 and len(directory.lookup_all_endpoints()) > 0:
+                sent_count = coordinator.trigger_role(role, 0.05)
+            runner.cancel = triggered_count > 0 or called_count >= 100
+
+        role = datagram.configuration.details()[datagram.configuration.FIELD_ROLE]
+        runner = Runner()
+        directory = DirectoryController()
+        coordinator = DatagramService(directory, port=coordinator_port)
+        coordinator.register(runner)
+        node = DatagramService(
+            coordinator="127.0.0.1", port=node_port, coordinator_port=coordinator_port, trigger_callback=trigger)
+        node.register(runner)
+
+        runner.run(callback)
+
+        assert sent_count == 1
+        assert triggered_count == 1
+        assert coordinator.trigger_role("unknown") == 0
+
+    def test_trigger_role_route(self) -> None:
+        """
+        Validates that the trigger route rejects a delay that is not a number and
+        is only available on a coordinator.
+        """
+        coordinator = DatagramService(DirectoryController(), port=get_ports()[0])
+        response = datagram.trigger_role(MockRequest(GET, "/trigger/role/path?delay=1.5"), coordinator, "path")
+        assert response._status == OK_200
+
+        response = datagram.trigger_role(MockRequest(GET, "/trigger/role/path?delay=soon"), coordinator, "path")
+        assert response._status == BAD_REQUEST_400
+
+        node = DatagramService(port=get_ports()[1])
+        response = datagram.trigger_role(MockRequest(GET, "/trigger/role/path"), node, "path")
+        assert response._status == NOT_FOUND_404
+
+    def test_node_syncs_clock_with_coordinator(self, monkeypatch) -> None:
+        """
+        Runs a coordinator and a node with a clock together. Both use the same
+        monotonic clock so once synced the offset should be close to zero.
+        """
+        monkeypatch.setattr(datagram, 'NETWORK_HEARTBEAT_FREQUENCY', 10)
+        monkeypatch.setattr(datagram, 'CLOCK_SYNC_FREQUENCY', 20)
+
+        coordinator_port, node_port = get_ports()
+
+        called_count: int = 0
+
+        async def callback():
+            nonlocal called_count
+            called_count += 1
+            runner.cancel = called_count >= 10
+
+        runner = Runner()
+        coordinator = DatagramService(DirectoryController(), port=coordinator_port)
+        coordinator.register(runner)
+        clock = ClockSync()
+        node = DatagramService(coordinator="127.0.0.1", port=node_port, coordinator_port=coordinator_port, clock=clock)
+        node.register(runner)
+
+        runner.run(callback)
+
+        assert clock.synced
+        assert abs(clock.offset) < 0.002
+
+    def test_synced_node_uses_trigger_start_time(self) -> None:
+        """
+        Validates that a node with a synced clock starts a trigger at the start
+        time in the datagram rather than after the delay.
+        """
+        triggered_count: int = 0
+
+        def trigger():
+            nonlocal triggered_count
+            triggered_count += 1
+
+        now = time.monotonic_ns()
+        clock = ClockSync()
+        clock.add_sample(now, now, now, now)
+
+        async def receive_trigger():
+            port, _ = get_ports()
+            service = DatagramService(port=port, trigger_callback=trigger, clock=clock)
+            start = time.monotonic_ns() + 50_000_000
+            service.receive_datagram(
+                encode_datagram(DATAGRAM_TRIGGER, "coordinator", "10", str(start)), ("127.0.0.1", 5002))
+            # Binary trigger messages carry the start time too.
+            start = time.monotonic_ns() + 50_000_000
+            service.receive_datagram(encode_trigger_message("coordinator", 10, start), ("127.0.0.1", 5002))
+            await asyncio.sleep(0.1)
+
+        asyncio.run(receive_trigger())
+        assert triggered_count == 2
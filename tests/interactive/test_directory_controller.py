@@ -208,6 +208,174 @@ class TestDirectoryController:
         assert time.monotonic() >= end_time
         assert len(controller.lookup_all_endpoints()) == 0
 
+    def test_lookups_never_return_expired_endpoints(self, monkeypatch) -> None:
+        """
+        Validates that lookups check for expiry themselves so do not depend on
+        the expiry task having run, and that re-registering extends the expiry.
+        """
+        monkeypatch.setattr(directory, 'DIRECTORY_EXPIRY_DURATION', 0.1)
+
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "alpha", "role")
+        controller.register_endpoint("1.2.3.5", "beta", "role")
+        time.sleep(0.06)
+        controller.register_endpoint("1.2.3.5", "beta", "role")
+        time.sleep(0.06)
+
+        # Alpha has expired, beta was re-registered so has not.
+        assert controller.lookup_endpoint_by_name("alpha") is None
+        assert controller.lookup_endpoint_by_name("beta") == "1.2.3.5"
+        assert controller.lookup_endpoints_by_role("role") == {"beta": "1.2.3.5"}
+        assert controller.lookup_all_endpoints() == {"beta": "1.2.3.5"}
+
+        time.sleep(0.06)
+        assert controller.lookup_all_endpoints() == {}
+        assert len(controller._expiry_heap) == 0
+
+    def test_expiry_heap_does_not_grow_with_heartbeats(self) -> None:
+        """
+        Validates that the stale heap entries left by heartbeats are cleared out.
+        """
+        controller = DirectoryController()
+        for _ in range(100):
+            controller.heartbeat_from_endpoint("1.2.3.4", "alpha", "role")
+            controller.heartbeat_from_endpoint("1.2.3.5", "beta", "role")
+            controller.lookup_all_endpoints()
+
+        assert len(controller._expiry_heap) <= 4 * 2 + 16
+        assert controller.lookup_all_endpoints() == {"alpha": "1.2.3.4", "beta": "1.2.3.5"}
+
+    def test_role_index(self) -> None:
+        """
+        Validates that the role index follows endpoints being registered,
+        changing role, unregistering and expiring.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "alpha", "path")
+        controller.register_endpoint("1.2.3.5", "beta", "path")
+        controller.register_endpoint("1.2.3.6", "gamma", "witch")
+        assert controller._role_index == {
+            "path": {"alpha": "1.2.3.4", "beta": "1.2.3.5"}, "witch": {"gamma": "1.2.3.6"}}
+
+        # Changing role and address moves the endpoint.
+        controller.register_endpoint("1.2.3.7", "beta", "witch")
+        assert controller._role_index == {
+            "path": {"alpha": "1.2.3.4"}, "witch": {"gamma": "1.2.3.6", "beta": "1.2.3.7"}}
+
+        # Empty roles are removed.
+        controller.unregister_endpoint("alpha")
+        assert controller._role_index == {"witch": {"gamma": "1.2.3.6", "beta": "1.2.3.7"}}
+        assert controller.lookup_endpoints_by_role("path") == {}
+
+    def test_lookups_are_cached_until_changed(self) -> None:
+        """
+        Validates that lookups return the same cached dictionary until the
+        directory changes, and that heartbeats with no changes keep the cache.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "alpha", "path")
+        all_endpoints = controller.lookup_all_endpoints()
+        role_endpoints = controller.lookup_endpoints_by_role("path")
+        assert controller.lookup_all_endpoints() is all_endpoints
+        assert controller.lookup_endpoints_by_role("PATH") is role_endpoints
+
+        controller.heartbeat_from_endpoint("1.2.3.4", "alpha", "path")
+        assert controller.lookup_all_endpoints() is all_endpoints
+        assert controller.lookup_endpoints_by_role("path") is role_endpoints
+
+        controller.heartbeat_from_endpoint("1.2.3.5", "alpha", "path")
+        assert controller.lookup_all_endpoints() == {"alpha": "1.2.3.5"}
+        assert controller.lookup_endpoints_by_role("path") == {"alpha": "1.2.3.5"}
+
+        # The previously returned dictionaries are never modified.
+        assert all_endpoints == {"alpha": "1.2.3.4"}
+        assert role_endpoints == {"alpha": "1.2.3.4"}
+
+        # Unknown roles are not cached.
+        assert controller.lookup_endpoints_by_role("unknown") == {}
+        assert "unknown" not in controller._role_cache
+
+    def test_refresh_endpoint(self) -> None:
+        """
+        Validates that refreshing only extends the expiry of an endpoint registered
+        with exactly the same name and, if given, address and role.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "alpha", "path")
+        expiry_time = controller._directory["alpha"].expiry_time
+        version = controller.version
+
+        time.sleep(0.01)
+        assert controller.refresh_endpoint("alpha")
+        assert controller._directory["alpha"].expiry_time > expiry_time
+        assert controller.refresh_endpoint("alpha", "1.2.3.4", "path")
+        assert controller.version == version
+
+        assert not controller.refresh_endpoint("ALPHA")
+        assert not controller.refresh_endpoint("beta")
+        assert not controller.refresh_endpoint("alpha", "1.2.3.5", "path")
+        assert not controller.refresh_endpoint("alpha", "1.2.3.4", "witch")
+
+        # Heartbeats with different details fall back to registering.
+        controller.heartbeat_from_endpoint("1.2.3.5", "ALPHA", "path")
+        assert controller.lookup_endpoint_by_name("alpha") == "1.2.3.5"
+        assert controller.version == version + 1
+
+    def test_changes_since(self, monkeypatch) -> None:
+        """
+        Validates the version and the changes returned since a version, with
+        and without a role, and that old versions are not known.
+        """
+        controller = DirectoryController()
+        start = controller.version
+        assert controller.changes_since(start) == {"version": start, "added": {}, "removed": []}
+
+        controller.register_endpoint("1.2.3.4", "alpha", "path")
+        controller.register_endpoint("1.2.3.5", "beta", "path")
+        controller.heartbeat_from_endpoint("1.2.3.5", "beta", "path")
+        assert controller.version == start + 2
+
+        controller.register_endpoint("1.2.3.6", "beta", "witch")
+        controller.unregister_endpoint("alpha")
+        # Endpoints added and then removed are still reported as removed.
+        assert controller.changes_since(start) == {
+            "version": start + 5, "added": {"beta": "1.2.3.6"}, "removed": ["alpha"]}
+        assert controller.changes_since(start + 2) == {
+            "version": start + 5, "added": {"beta": "1.2.3.6"}, "removed": ["alpha"]}
+        assert controller.changes_since(start + 2, "PATH") == {
+            "version": start + 5, "added": {}, "removed": ["beta", "alpha"]}
+        assert controller.role_version("witch") == start + 4
+        assert controller.changes_since(start + 4, "witch") == {"version": start + 4, "added": {}, "removed": []}
+
+        # Versions in the future, or older than the change log, are not known.
+        assert controller.changes_since(start + 6) is None
+        monkeypatch.setattr(directory, 'DIRECTORY_CHANGE_LOG_SIZE', 2)
+        controller.register_endpoint("1.2.3.7", "gamma", "path")
+        assert controller.changes_since(start + 3) is None
+        assert controller.changes_since(start + 4) == {
+            "version": start + 6, "added": {"gamma": "1.2.3.7"}, "removed": ["alpha"]}
+
+    def test_empty_role_versions_are_removed(self, monkeypatch) -> None:
+        """
+        Validates that the version of a role with no endpoints is forgotten once
+        its last change has left the change log, so roles do not build up.
+        """
+        monkeypatch.setattr(directory, 'DIRECTORY_CHANGE_LOG_SIZE', 2)
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "alpha", "path")
+        controller.register_endpoint("1.2.3.5", "beta", "witch")
+        controller.unregister_endpoint("alpha")
+        assert controller.role_version("path") == controller.version
+
+        controller.register_endpoint("1.2.3.6", "gamma", "witch")
+        assert controller.role_version("path") == controller.version - 1
+        controller.register_endpoint("1.2.3.7", "delta", "witch")
+        assert controller.role_version("path") == 0
+        assert controller._role_versions == {"witch": controller.version}
+        # Nothing has changed for the role since any version still in the log.
+        assert controller.changes_since(controller.version - 1, "path") == {
+            "version": controller.version - 1, "added": {}, "removed": []}
+
     def test_heartbeat_endpoint(self) -> None:
         """
         Validates that the heartbeat_from_endpoint() function just forwards
@@ -287,3 +455,22 @@ class TestDirectoryController:
         assert controller.lookup_endpoints_by_role("spiders") == {}
         assert controller.lookup_endpoints_by_role("PATH") == {"alpha": "1.2.3.4", "gamma": "7.8.9.0"}
         assert controller.lookup_endpoints_by_role("wItCh") == {"beta": "a.b.c.d"}
+
+    def test_roles_are_shared(self) -> None:
+        """
+        Validates that endpoints with the same role share one role string, which is
+        released once no endpoint has the role.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "alpha", " Path")
+        controller.register_endpoint("1.2.3.5", "beta", "PATH ")
+        controller.heartbeat_from_endpoint("1.2.3.6", "gamma", "path")
+
+        roles = [endpoint.role for endpoint in controller._directory.values()]
+        assert roles == ["path", "path", "path"]
+        assert roles[0] is roles[1] is roles[2]
+        assert not hasattr(controller._directory["alpha"], "__dict__")
+
+        for name in ["alpha", "beta", "gamma"]:
+            controller.unregister_endpoint(name)
+        assert controller._roles == {}
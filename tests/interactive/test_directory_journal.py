@@ -0,0 +1,190 @@
+import json
+import time
+
+import pytest
+
+from interactive import journal as journal_module
+from interactive.control import DIRECTORY_EXPIRY_DURATION, DIRECTORY_JOURNAL_SNAPSHOT_PERIOD
+from interactive.directory import DirectoryController, DirectoryService
+from interactive.journal import DirectoryJournal
+
+
+class MockWallClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    return str(tmp_path / "directory")
+
+
+def remaining(controller: DirectoryController, name: str) -> float:
+    return controller._directory[name].expiry_time - time.monotonic()
+
+
+class TestDirectoryJournal:
+
+    def test_nothing_to_restore(self, path) -> None:
+        controller = DirectoryController()
+        assert DirectoryJournal(path).attach(controller) == 0
+        assert controller.lookup_all_endpoints() == {}
+
+    def test_restore_from_journal(self, path) -> None:
+        """
+        Validates that registrations, heartbeats and removals written to the journal
+        are replayed into a new directory.
+        """
+        controller = DirectoryController()
+        journal = DirectoryJournal(path)
+        journal.attach(controller)
+
+        controller.register_endpoint("1.2.3.4:80", "Alpha", "Path")
+        controller.register_endpoint("1.2.3.5:80", "beta", "path")
+        controller.heartbeat_from_endpoint("1.2.3.6:80", "beta", "witch")
+        controller.register_endpoint("1.2.3.7:80", "gamma", "path")
+        controller.unregister_endpoint("gamma")
+        journal.flush()
+
+        restored = DirectoryController()
+        assert DirectoryJournal(path).attach(restored) == 2
+        assert restored.lookup_all_endpoints() == {"alpha": "1.2.3.4:80", "beta": "1.2.3.6:80"}
+        assert restored.lookup_endpoints_by_role("witch") == {"beta": "1.2.3.6:80"}
+
+    def test_unflushed_changes_are_not_written(self, path) -> None:
+        controller = DirectoryController()
+        journal = DirectoryJournal(path)
+        journal.attach(controller)
+
+        controller.register_endpoint("1.2.3.4:80", "alpha", "path")
+        assert DirectoryJournal(path).load() == {}
+
+        journal.close()
+        assert list(DirectoryJournal(path).load().keys()) == ["alpha"]
+
+    def test_expiry_is_preserved(self, path) -> None:
+        """
+        Validates that endpoints are restored with the time they had left and that
+        endpoints which expired whilst the coordinator was stopped are not restored.
+        """
+        wall_clock = MockWallClock()
+        controller = DirectoryController()
+        journal = DirectoryJournal(path, wall_clock)
+        journal.attach(controller)
+        controller.register_endpoint("1.2.3.4:80", "alpha", "path")
+        wall_clock.now += 50
+        controller.register_endpoint("1.2.3.5:80", "beta", "path")
+        journal.close()
+
+        # The coordinator restarts 30 seconds later.
+        wall_clock.now += 30
+        restored = DirectoryController()
+        DirectoryJournal(path, wall_clock).attach(restored)
+        assert DIRECTORY_EXPIRY_DURATION - 81 < remaining(restored, "alpha") <= DIRECTORY_EXPIRY_DURATION - 80
+        assert DIRECTORY_EXPIRY_DURATION - 31 < remaining(restored, "beta") <= DIRECTORY_EXPIRY_DURATION - 30
+
+        wall_clock.now += DIRECTORY_EXPIRY_DURATION - 50
+        restored = DirectoryController()
+        DirectoryJournal(path, wall_clock).attach(restored)
+        assert restored.lookup_all_endpoints() == {"beta": "1.2.3.5:80"}
+
+    def test_compaction(self, path, monkeypatch) -> None:
+        """
+        Validates that once the journal is large a snapshot is written and the
+        journal is truncated, and that restoring uses both.
+        """
+        monkeypatch.setattr(journal_module, 'DIRECTORY_JOURNAL_COMPACT_SIZE', 3)
+        controller = DirectoryController()
+        journal = DirectoryJournal(path)
+        journal.attach(controller)
+
+        controller.register_endpoint("1.2.3.4:80", "alpha", "path")
+        controller.register_endpoint("1.2.3.5:80", "beta", "path")
+        journal.flush()
+        controller.register_endpoint("1.2.3.6:80", "gamma", "path")
+        journal.flush()
+
+        with open(journal.journal_path) as file:
+            assert file.read() == ""
+        with open(journal.snapshot_path) as file:
+            assert sorted(json.load(file).keys()) == ["alpha", "beta", "gamma"]
+
+        controller.unregister_endpoint("alpha")
+        journal.close()
+        restored = DirectoryController()
+        DirectoryJournal(path).attach(restored)
+        assert restored.lookup_all_endpoints() == {"beta": "1.2.3.5:80", "gamma": "1.2.3.6:80"}
+
+    def test_heartbeats_are_not_journaled(self, path) -> None:
+        """
+        Validates that heartbeats which change nothing do not write to the journal,
+        and that the expiry times they extend are saved by the periodic snapshot.
+        """
+        wall_clock = MockWallClock()
+        controller = DirectoryController()
+        journal = DirectoryJournal(path, wall_clock)
+        journal.attach(controller)
+        controller.register_endpoint("1.2.3.4:80", "alpha", "path")
+        journal.flush()
+        with open(journal.journal_path) as file:
+            size = len(file.read())
+
+        controller.heartbeat_from_endpoint("1.2.3.4:80", "alpha", "path")
+        controller.refresh_endpoint("alpha")
+        journal.flush()
+        with open(journal.journal_path) as file:
+            assert len(file.read()) == size
+
+        # A heartbeat that moves the endpoint is journaled.
+        controller.heartbeat_from_endpoint("1.2.3.5:80", "alpha", "path")
+        journal.flush()
+        with open(journal.journal_path) as file:
+            assert len(file.read()) > size
+
+        wall_clock.now += DIRECTORY_JOURNAL_SNAPSHOT_PERIOD
+        journal.flush()
+        with open(journal.journal_path) as file:
+            assert file.read() == ""
+        with open(journal.snapshot_path) as file:
+            address, _, expires = json.load(file)["alpha"]
+        assert address == "1.2.3.5:80"
+        assert expires > wall_clock.now + DIRECTORY_EXPIRY_DURATION - 1
+
+    def test_unreadable_lines_are_ignored(self, path) -> None:
+        """
+        Validates that a journal with a partly written last line can be restored.
+        """
+        expires = time.time() + 60
+        with open(path + ".journal", "w") as file:
+            file.write(json.dumps(["s", "alpha", "1.2.3.4:80", "path", expires]) + "\n")
+            file.write(json.dumps(["x"]) + "\n")
+            file.write('["s", "beta", "1.2.')
+
+        restored = DirectoryController()
+        assert DirectoryJournal(path).attach(restored) == 1
+        assert restored.lookup_all_endpoints() == {"alpha": "1.2.3.4:80"}
+
+    def test_directory_service_uses_journal(self, path) -> None:
+        """
+        Validates that the DirectoryService restores the directory when registered.
+        """
+        controller = DirectoryController()
+        journal = DirectoryJournal(path)
+        journal.attach(controller)
+        controller.register_endpoint("1.2.3.4:80", "alpha", "path")
+        journal.close()
+
+        class MockRunner:
+            def add_task(self, task) -> None:
+                pass
+
+            def add_loop_task(self, task) -> None:
+                pass
+
+        service = DirectoryService(DirectoryJournal(path))
+        service.register(MockRunner())
+        assert service.directory.lookup_all_endpoints() == {"alpha": "1.2.3.4:80"}
+        assert service.directory.journal is service.journal
@@ -5,15 +5,17 @@ from types import TracebackType
 from typing import Optional, Type
 
 import pytest
-from adafruit_httpserver import GET, POST, PUT, OK_200, Request, BAD_REQUEST_400, Status
+from adafruit_httpserver import GET, POST, PUT, OK_200, Request, BAD_REQUEST_400, Status, NOT_FOUND_404
 from adafruit_requests import Response
 
 from interactive import directory
 from interactive.directory import DirectoryController, lookup_all, lookup_name
 from interactive.directory import receive_register_message, receive_unregister_message, receive_heartbeat_message
-from interactive.directory import register, unregister, heartbeat, lookup_role
+from interactive.directory import register, unregister, heartbeat, lookup_role, NOT_MODIFIED_304, CONTENT_TYPE_NAME
 from interactive.directory import send_register_message, send_unregister_message, send_heartbeat_message
 from interactive.network import YES, OK
+from interactive.wire import CONTENT_TYPE_BINARY, MESSAGE_REGISTER, MESSAGE_HEARTBEAT, encode_directory_message, \
+    decode_message
 from test_network import validate_methods, MockRequest
 
 # This is used to mock out the network.send_message function to avoid us actually sending
@@ -27,6 +29,7 @@ class MockResponse:
     def __init__(self, status: Status) -> None:
         self.encoding = "utf-8"
         self._status = status
+        self.status_code = status.code
 
     def __enter__(self):
         return self
@@ -39,12 +42,16 @@ class MockResponse:
         pass
 
 
+msg_content_type: str = ""
+
+
 def mock_send_message(path: str, host: str = "<default>", protocol: str = "http", method="GET", data=None,
-                      json=None) -> Response:
-    global msg_url, msg_data, msg_json
+                      json=None, content_type=None) -> Response:
+    global msg_url, msg_data, msg_json, msg_content_type
     msg_url = f"{method} {protocol}://{host}/{path}"
     msg_data = data
     msg_json = json_module.dumps(json)
+    msg_content_type = content_type
 
     return MockResponse(OK_200)
 
@@ -64,6 +71,10 @@ class TestRoutes:
     def fix_ip_address(self, monkeypatch):
         monkeypatch.setattr(directory, 'get_address', lambda: "w.x.y.z")
 
+    @pytest.fixture(autouse=True)
+    def nothing_registered(self, monkeypatch):
+        monkeypatch.setattr(directory, '_registered', {})
+
     @staticmethod
     def check_directory_method_conforms(
             monkeypatch, route: str, func: Callable[[Request, DirectoryController], Response]) -> None:
@@ -121,7 +132,7 @@ class TestRoutes:
         response = register(request, controller)
         assert response._body == YES
         assert response._status == OK_200
-        assert msg_url == "GET http://node//register"
+        assert msg_url == "POST http://node//register"
         assert msg_data == None
         assert msg_json == '{"name": "<hostname>", "role": "<host role>", "coordinator": null, "address": "w.x.y.z"}'
         assert len(controller._directory) == 0
@@ -193,7 +204,7 @@ class TestRoutes:
         response = unregister(request, controller)
         assert response._body == YES
         assert response._status == OK_200
-        assert msg_url == "GET http://node//unregister"
+        assert msg_url == "POST http://node//unregister"
         assert msg_data == None
         assert msg_json == '{"name": "<hostname>", "role": "<host role>", "coordinator": null, "address": "w.x.y.z"}'
         assert len(controller._directory) == 0
@@ -258,13 +269,13 @@ class TestRoutes:
 
         validate_methods({GET, POST, PUT}, "/heartbeat", heartbeat, controller)
 
+        # validate_methods() has already sent the details so only the name is sent.
         request = MockRequest(GET, "/heartbeat")
         response = heartbeat(request, controller)
         assert response._body == YES
         assert response._status == OK_200
-        assert msg_url == "GET http://node//heartbeat"
-        assert msg_data == None
-        assert msg_json == '{"name": "<hostname>", "role": "<host role>", "coordinator": null, "address": "w.x.y.z"}'
+        assert msg_url == "POST http://node//heartbeat"
+        assert msg_data == b"<hostname>"
         assert len(controller._directory) == 0
 
         # Validate that a new item was registered after a heartbeat
@@ -341,6 +352,59 @@ class TestRoutes:
         assert response._data == {'my_node': 'a.b.c.d', 'node_1': '1.2.3.4', 'node_2': '6.7.8.9'}
         assert response._status == OK_200
 
+    def test_lookup_all_versioned(self) -> None:
+        """
+        Validates that lookup_all() returns the version as an ETag, a 304 when it
+        has not changed and just the changes when given a since version.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "node_1", "role_1")
+        version = controller.version
+
+        response = lookup_all(MockRequest(GET, "/lookup/all"), controller)
+        assert response._headers["ETag"] == f'"{version}"'
+
+        request = MockRequest(GET, "/lookup/all", headers=f'If-None-Match: "{version}"\r\n')
+        response = lookup_all(request, controller)
+        assert response._status == NOT_MODIFIED_304
+        assert response._body == ""
+
+        controller.register_endpoint("6.7.8.9", "node_2", "role_2")
+        controller.unregister_endpoint("node_1")
+        response = lookup_all(request, controller)
+        assert response._status == OK_200
+        assert response._data == {"node_2": "6.7.8.9"}
+
+        response = lookup_all(MockRequest(GET, f"/lookup/all?since={version}"), controller)
+        assert response._data == {"version": version + 2, "added": {"node_2": "6.7.8.9"}, "removed": ["node_1"]}
+
+        # Versions that are not known return everything.
+        response = lookup_all(MockRequest(GET, f"/lookup/all?since={version + 10}"), controller)
+        assert response._data == {"node_2": "6.7.8.9"}
+
+        response = lookup_all(MockRequest(GET, "/lookup/all?since=abc"), controller)
+        assert response._status == BAD_REQUEST_400
+
+    def test_lookup_role_versioned(self) -> None:
+        """
+        Validates that lookup_role() uses the role version as the ETag so that
+        changes to other roles do not change it.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "node_1", "role_1")
+        response = lookup_role(MockRequest(GET, "/lookup/role/role_1"), controller, "role_1")
+        etag = response._headers["ETag"]
+
+        controller.register_endpoint("6.7.8.9", "node_2", "role_2")
+        request = MockRequest(GET, "/lookup/role/role_1", headers=f"If-None-Match: {etag}\r\n")
+        response = lookup_role(request, controller, "role_1")
+        assert response._status == NOT_MODIFIED_304
+
+        since = etag.strip('"')
+        controller.register_endpoint("6.7.8.9", "node_2", "role_1")
+        response = lookup_role(MockRequest(GET, f"/lookup/role/role_1?since={since}"), controller, "role_1")
+        assert response._data == {"version": controller.version, "added": {"node_2": "6.7.8.9"}, "removed": []}
+
     def test_lookup_name(self) -> None:
         """
         Validates that lookup_name() returns NOT_IMPLEMENTED_501 with no additional headers.
@@ -412,6 +476,10 @@ class TestMessages:
     def fix_ip_address(self, monkeypatch):
         monkeypatch.setattr(directory, 'get_address', lambda: "w.x.y.z")
 
+    @pytest.fixture(autouse=True)
+    def nothing_registered(self, monkeypatch):
+        monkeypatch.setattr(directory, '_registered', {})
+
     @staticmethod
     def check_receive_method_conforms(
             route: str, func: Callable[[Request, DirectoryController], Response],
@@ -462,10 +530,31 @@ class TestMessages:
         Very simple test to check the correct format is being sent.
         """
         assert send_register_message("coordinator") == YES
-        assert msg_url == "GET http://coordinator//register"
+        assert msg_url == "POST http://coordinator//register"
         assert msg_data == None
         assert msg_json == '{"name": "<hostname>", "role": "<host role>", "coordinator": null, "address": "w.x.y.z"}'
 
+    def test_send_register_message_binary(self, monkeypatch) -> None:
+        """
+        Validates the binary encoding is sent when enabled and that it falls back
+        to JSON when the address cannot be encoded.
+        """
+        monkeypatch.setattr(directory, 'BINARY_MESSAGES', True)
+        monkeypatch.setattr(directory, 'get_address', lambda: "1.2.3.4:80")
+
+        assert send_register_message("coordinator") == YES
+        assert msg_url == "POST http://coordinator//register"
+        assert msg_content_type == CONTENT_TYPE_BINARY
+        assert msg_json == 'null'
+        assert decode_message(msg_data) == {
+            "message": MESSAGE_REGISTER, "name": "<hostname>", "role": "<host role>", "address": "1.2.3.4:80"}
+
+        monkeypatch.setattr(directory, 'get_address', lambda: "w.x.y.z")
+        assert send_register_message("coordinator") == YES
+        assert msg_content_type is None
+        assert msg_data is None
+        assert msg_json == '{"name": "<hostname>", "role": "<host role>", "coordinator": null, "address": "w.x.y.z"}'
+
     def test_receive_register_errors_correctly(self) -> None:
         """
         Validates the register method correctly errors when the network request
@@ -520,12 +609,38 @@ class TestMessages:
         assert controller._directory["node_2"].role == "role_2"
         assert controller._directory["node_2"].address == "6.7.8.9"
 
+    def test_receive_register_message_binary(self) -> None:
+        """
+        Validates the register method decodes a binary body when the content type
+        says so, and rejects a body that is not valid.
+        """
+        headers = f"Content-Type: {CONTENT_TYPE_BINARY}\r\n"
+        body = encode_directory_message(MESSAGE_REGISTER, "NODE_1", "role_1", "1.2.3.4:80")
+        controller = DirectoryController()
+
+        response = receive_register_message(MockRequest(POST, "/register", body=body, headers=headers), controller)
+        assert response._body == OK
+        assert response._status == OK_200
+        assert controller.lookup_all_endpoints() == {"node_1": "1.2.3.4:80"}
+        assert controller.lookup_endpoints_by_role("role_1") == {"node_1": "1.2.3.4:80"}
+
+        # Binary heartbeats are handled in exactly the same way.
+        body = encode_directory_message(MESSAGE_HEARTBEAT, "node_2", "role_2", "5.6.7.8")
+        response = receive_heartbeat_message(MockRequest(POST, "/heartbeat", body=body, headers=headers), controller)
+        assert response._status == OK_200
+        assert controller.lookup_all_endpoints() == {"node_1": "1.2.3.4:80", "node_2": "5.6.7.8"}
+
+        body = '{"name":"node_3", "role":"role_3", "address":"1.2.3.4"}'
+        response = receive_register_message(MockRequest(POST, "/register", body=body, headers=headers), controller)
+        assert response._body == "FAILED_TO_PARSE_BODY"
+        assert response._status == BAD_REQUEST_400
+
     def test_send_unregister_message(self) -> None:
         """
         Very simple test to check the correct format is being sent.
         """
         assert send_unregister_message("coordinator") == YES
-        assert msg_url == "GET http://coordinator//unregister"
+        assert msg_url == "POST http://coordinator//unregister"
         assert msg_data == None
         assert msg_json == '{"name": "<hostname>", "role": "<host role>", "coordinator": null, "address": "w.x.y.z"}'
 
@@ -595,10 +710,73 @@ class TestMessages:
         Very simple test to check the correct format is being sent.
         """
         assert send_heartbeat_message("coordinator") == YES
-        assert msg_url == "GET http://coordinator//heartbeat"
+        assert msg_url == "POST http://coordinator//heartbeat"
         assert msg_data == None
         assert msg_json == '{"name": "<hostname>", "role": "<host role>", "coordinator": null, "address": "w.x.y.z"}'
 
+    def test_send_heartbeat_message_name_only(self, monkeypatch) -> None:
+        """
+        Validates that only the name is sent once the details have been accepted,
+        and that the details are sent again if they change or the name is unknown.
+        """
+        assert send_register_message("coordinator") == YES
+        assert send_heartbeat_message("coordinator") == YES
+        assert msg_url == "POST http://coordinator//heartbeat"
+        assert msg_data == b"<hostname>"
+        assert msg_content_type == CONTENT_TYPE_NAME
+
+        # A different coordinator has not accepted the details.
+        assert send_heartbeat_message("other") == YES
+        assert msg_data == None
+        assert send_heartbeat_message("other") == YES
+        assert msg_data == b"<hostname>"
+
+        monkeypatch.setattr(directory, 'get_address', lambda: "a.b.c.d")
+        assert send_heartbeat_message("coordinator") == YES
+        assert msg_data == None
+        assert '"address": "a.b.c.d"' in msg_json
+
+        sent = []
+
+        def unknown_name(path: str, host: str = "<default>", method="GET", data=None, json=None, content_type=None):
+            sent.append(content_type)
+            mock_send_message(path, host, method=method, data=data, json=json, content_type=content_type)
+            return MockResponse(NOT_FOUND_404 if content_type == CONTENT_TYPE_NAME else OK_200)
+
+        monkeypatch.setattr(directory, 'send_message', unknown_name)
+        assert send_heartbeat_message("coordinator") == YES
+        assert sent == [CONTENT_TYPE_NAME, None]
+
+        assert send_unregister_message("coordinator") == YES
+        sent.clear()
+        assert send_heartbeat_message("coordinator") == YES
+        assert sent == [None]
+
+    def test_receive_heartbeat_message_name_only(self) -> None:
+        """
+        Validates that a heartbeat with just the name extends the expiry of a
+        registered node without changing it, and is rejected for unknown names.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "node_1", "role_1")
+        expiry_time = controller._directory["node_1"].expiry_time
+        version = controller.version
+
+        time.sleep(0.01)
+        headers = f"Content-Type: {CONTENT_TYPE_NAME}\r\n"
+        response = receive_heartbeat_message(MockRequest(POST, "/heartbeat", body="node_1", headers=headers),
+                                             controller)
+        assert response._body == OK
+        assert response._status == OK_200
+        assert controller._directory["node_1"].expiry_time > expiry_time
+        assert controller.version == version
+
+        # Names are not normalised so must be sent as registered.
+        response = receive_heartbeat_message(MockRequest(POST, "/heartbeat", body="NODE_1", headers=headers),
+                                             controller)
+        assert response._body == "UNKNOWN_NAME"
+        assert response._status == NOT_FOUND_404
+
     def test_receive_heartbeat_errors_correctly(self) -> None:
         """
         Validates the heartbeat method correctly errors when the network request
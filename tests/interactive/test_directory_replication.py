@@ -0,0 +1,254 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from interactive import directory
+from interactive.control import DIRECTORY_EXPIRY_DURATION
+from interactive.directory import DirectoryController, DirectoryService, send_register_message, \
+    send_unregister_message, send_heartbeat_message
+from interactive.log import set_log_level, ERROR, INFO
+from interactive.network import NetworkController, YES, NO
+from interactive.polyfills.network import new_server
+from interactive.runner import Runner
+
+HOST = "127.0.0.1"
+
+
+def get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def details(name: str, address: str = "10.0.0.1:80", role: str = "path") -> dict:
+    return {"name": name, "role": role, "address": address}
+
+
+class Coordinator:
+    """
+    Runs a coordinator with a real server on localhost in a background thread.
+    """
+
+    def __init__(self, port: int, peers: list[str]):
+        self.address = f"{HOST}:{port}"
+        self.port = port
+        self.runner = Runner()
+        self.runner.cancel_on_exception = False
+        self.runner.restart_on_exception = True
+        self.service = DirectoryService(peers=peers)
+        self.__thread = None
+
+    def start(self) -> None:
+        server = new_server()
+        server.start(host=HOST, port=self.port)
+        NetworkController(server).register(self.runner)
+        server.add_routes(self.service.get_routes())
+        self.service.register(self.runner)
+        self.__thread = threading.Thread(target=self.runner.run, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.runner.cancel = True
+        self.__thread.join()
+
+    def endpoints(self) -> dict[str, str]:
+        return self.service.directory.lookup_all_endpoints()
+
+
+def wait_until(condition, timeout: float = 5) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.05)
+
+    return condition()
+
+
+class TestDirectoryControllerReplica:
+
+    def test_replica_since(self) -> None:
+        """
+        Validates that only endpoints and removals received since the time are returned.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4:80", "alpha", "path")
+        controller.register_endpoint("1.2.3.5:80", "beta", "path")
+
+        replica = controller.replica_since(0)
+        assert sorted(replica["endpoints"].keys()) == ["alpha", "beta"]
+        address, role, updated, remaining = replica["endpoints"]["alpha"]
+        assert (address, role) == ("1.2.3.4:80", "path")
+        assert updated <= replica["now"]
+        assert DIRECTORY_EXPIRY_DURATION - 1 < remaining <= DIRECTORY_EXPIRY_DURATION
+        assert replica["removed"] == {}
+
+        time.sleep(0.01)
+        controller.heartbeat_from_endpoint("1.2.3.5:80", "beta", "path")
+        controller.unregister_endpoint("alpha")
+        changes = controller.replica_since(replica["now"])
+        assert list(changes["endpoints"].keys()) == ["beta"]
+        assert list(changes["removed"].keys()) == ["alpha"]
+        assert controller.replica_since(changes["now"] + 1) == {
+            "now": pytest.approx(time.time(), abs=1), "endpoints": {}, "removed": {}}
+
+    def test_merge_keeps_newest(self) -> None:
+        """
+        Validates that the most recently updated endpoint wins, whichever
+        coordinator it came from, and that merging is idempotent.
+        """
+        first = DirectoryController()
+        second = DirectoryController()
+        first.register_endpoint("1.2.3.4:80", "alpha", "path")
+        time.sleep(0.01)
+        second.register_endpoint("5.6.7.8:80", "alpha", "witch")
+        second.register_endpoint("5.6.7.9:80", "beta", "witch")
+
+        first.merge_replica(second.replica_since(0))
+        second.merge_replica(first.replica_since(0))
+        assert first.lookup_all_endpoints() == {"alpha": "5.6.7.8:80", "beta": "5.6.7.9:80"}
+        assert second.lookup_all_endpoints() == {"alpha": "5.6.7.8:80", "beta": "5.6.7.9:80"}
+        assert first.lookup_endpoints_by_role("path") == {}
+
+        version = first.version
+        first.merge_replica(second.replica_since(0))
+        assert first.version == version
+
+    def test_merge_preserves_expiry(self) -> None:
+        first = DirectoryController()
+        second = DirectoryController()
+        second.register_endpoint("1.2.3.4:80", "alpha", "path")
+        replica = second.replica_since(0)
+        replica["endpoints"]["alpha"][3] = 30
+        replica["endpoints"]["beta"] = ["1.2.3.5:80", "path", time.time(), 0]
+
+        first.merge_replica(replica)
+        assert first.lookup_all_endpoints() == {"alpha": "1.2.3.4:80"}
+        assert 29 < first._directory["alpha"].expiry_time - time.monotonic() <= 30
+
+    def test_merge_removals(self) -> None:
+        """
+        Validates removals are merged and that the tombstone stops an older copy
+        of the endpoint coming back, but not a newer registration.
+        """
+        first = DirectoryController()
+        second = DirectoryController()
+        first.register_endpoint("1.2.3.4:80", "alpha", "path")
+        second.merge_replica(first.replica_since(0))
+        stale = first.replica_since(0)
+
+        time.sleep(0.01)
+        first.unregister_endpoint("alpha")
+        second.merge_replica(first.replica_since(0))
+        assert second.lookup_all_endpoints() == {}
+
+        second.merge_replica(stale)
+        assert second.lookup_all_endpoints() == {}
+
+        time.sleep(0.01)
+        first.register_endpoint("1.2.3.4:80", "alpha", "path")
+        second.merge_replica(first.replica_since(0))
+        assert second.lookup_all_endpoints() == {"alpha": "1.2.3.4:80"}
+
+    def test_restored_endpoints_lose_to_peers(self) -> None:
+        first = DirectoryController()
+        second = DirectoryController()
+        first.restore_endpoint("1.2.3.4:80", "alpha", "path", 60)
+        second.register_endpoint("5.6.7.8:80", "alpha", "path")
+
+        first.merge_replica(second.replica_since(0))
+        assert first.lookup_all_endpoints() == {"alpha": "5.6.7.8:80"}
+
+
+class TestDirectoryServiceFailOver:
+
+    def test_fail_over_to_next_coordinator(self, monkeypatch) -> None:
+        """
+        Validates that a node registers with the next coordinator when its
+        coordinator stops answering heartbeats or registrations.
+        """
+        monkeypatch.setattr(directory, 'NODE_COORDINATOR', "coordinator_1")
+        monkeypatch.setattr(directory, 'NODE_COORDINATORS', ["coordinator_1", "coordinator_2", "coordinator_3"])
+
+        available = {"coordinator_1": YES, "coordinator_2": NO, "coordinator_3": YES}
+        sent = []
+
+        def send(message: str):
+            def send_message(node: str) -> str:
+                sent.append(f"{message} {node}")
+                return available[node]
+
+            return send_message
+
+        monkeypatch.setattr(directory, 'send_register_message', send("register"))
+        monkeypatch.setattr(directory, 'send_heartbeat_message', send("heartbeat"))
+        monkeypatch.setattr(directory, 'send_unregister_message', send("unregister"))
+
+        service = DirectoryService()
+        heartbeat = service._DirectoryService__heartbeat
+        asyncio.run(heartbeat())
+        asyncio.run(heartbeat())
+        assert sent == ["register coordinator_1", "heartbeat coordinator_1"]
+
+        available["coordinator_1"] = NO
+        # The registration with the second coordinator also fails so the third is next.
+        asyncio.run(heartbeat())
+        assert service.coordinator == "coordinator_3"
+        assert sent[2:] == ["heartbeat coordinator_1", "register coordinator_2"]
+
+        asyncio.run(heartbeat())
+        asyncio.run(heartbeat())
+        assert service.coordinator == "coordinator_3"
+        assert sent[4:] == ["register coordinator_3", "heartbeat coordinator_3"]
+
+
+class TestReplicatedCoordinators:
+
+    @pytest.fixture
+    def coordinators(self, monkeypatch):
+        monkeypatch.setattr(directory, 'DIRECTORY_REPLICATION_FREQUENCY', 20)
+        monkeypatch.setattr(directory, 'DIRECTORY_REPLICATION_BACKOFF', 0.2)
+        set_log_level(ERROR)
+
+        ports = [get_free_port() for _ in range(3)]
+        addresses = [f"{HOST}:{port}" for port in ports]
+        coordinators = [Coordinator(port, [address for address in addresses if address != f"{HOST}:{port}"])
+                        for port in ports]
+        for coordinator in coordinators:
+            coordinator.start()
+
+        yield coordinators
+
+        for coordinator in coordinators:
+            if not coordinator.runner.cancel:
+                coordinator.stop()
+        set_log_level(INFO)
+
+    def test_replication(self, coordinators) -> None:
+        """
+        Validates that registrations, heartbeats and removals at any coordinator
+        reach every coordinator and that the others keep answering when one stops.
+        """
+        first, second, third = coordinators
+
+        assert send_register_message(first.address, details("alpha", "10.0.0.1:80")) == YES
+        assert send_register_message(second.address, details("beta", "10.0.0.2:80")) == YES
+        both = {"alpha": "10.0.0.1:80", "beta": "10.0.0.2:80"}
+        assert wait_until(lambda: all(coordinator.endpoints() == both for coordinator in coordinators))
+
+        # A node that moves to another coordinator and changes address.
+        assert send_heartbeat_message(third.address, details("alpha", "10.0.0.3:80")) == YES
+        moved = {"alpha": "10.0.0.3:80", "beta": "10.0.0.2:80"}
+        assert wait_until(lambda: all(coordinator.endpoints() == moved for coordinator in coordinators))
+
+        assert send_unregister_message(second.address, details("beta")) == YES
+        assert wait_until(lambda: all(coordinator.endpoints() == {"alpha": "10.0.0.3:80"}
+                                      for coordinator in coordinators))
+
+        # The remaining coordinators carry on replicating when one stops.
+        first.stop()
+        assert send_register_message(second.address, details("gamma", "10.0.0.4:80")) == YES
+        assert wait_until(lambda: "gamma" in third.endpoints())
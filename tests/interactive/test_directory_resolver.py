@@ -0,0 +1,230 @@
+import asyncio
+
+import pytest
+from adafruit_httpserver import OK_200, NOT_FOUND_404
+
+from interactive import directory
+from interactive.control import DIRECTORY_RESOLVER_TTL, DIRECTORY_RESOLVER_NEGATIVE_TTL, DIRECTORY_EXPIRY_DURATION, \
+    DIRECTORY_RESOLVER_REFRESH_AHEAD
+from interactive.directory import DirectoryResolver, send_lookup_name_message
+from test_directory_messages import MockResponse
+
+
+class MockCoordinator:
+    """
+    Records the lookups and returns the addresses it has been given.
+    """
+
+    def __init__(self):
+        self.addresses = {}
+        self.lookups = []
+        self.reachable = True
+
+    def lookup(self, node: str, name: str):
+        self.lookups.append((node, name))
+        if not self.reachable:
+            raise OSError("unreachable")
+
+        return self.addresses.get(name)
+
+
+class MockClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def new_resolver() -> (DirectoryResolver, MockCoordinator, MockClock):
+    coordinator = MockCoordinator()
+    clock = MockClock()
+    return DirectoryResolver("coordinator", coordinator.lookup, clock), coordinator, clock
+
+
+def refresh(resolver: DirectoryResolver) -> None:
+    asyncio.run(resolver._DirectoryResolver__refresh())
+
+
+class TestDirectoryResolver:
+
+    def test_invalid_names(self) -> None:
+        resolver, coordinator, _ = new_resolver()
+        assert resolver.resolve(None) is None
+        assert resolver.resolve("") is None
+        assert resolver.resolve("   ") is None
+        assert coordinator.lookups == []
+
+    def test_positive_results_are_cached_until_ttl(self) -> None:
+        """
+        Validates that an address is only looked up once within the TTL and that
+        names are normalised.
+        """
+        resolver, coordinator, clock = new_resolver()
+        coordinator.addresses["node"] = "1.2.3.4:80"
+
+        assert resolver.resolve("node") == "1.2.3.4:80"
+        assert resolver.resolve(" NODE ") == "1.2.3.4:80"
+        clock.now += DIRECTORY_RESOLVER_TTL - 0.1
+        assert resolver.resolve("node") == "1.2.3.4:80"
+        assert coordinator.lookups == [("coordinator", "node")]
+
+        coordinator.addresses["node"] = "5.6.7.8:80"
+        clock.now += 0.1
+        assert resolver.resolve("node") == "5.6.7.8:80"
+        assert len(coordinator.lookups) == 2
+
+    def test_negative_results_are_cached_briefly(self) -> None:
+        resolver, coordinator, clock = new_resolver()
+
+        assert resolver.resolve("node") is None
+        assert resolver.resolve("node") is None
+        assert len(coordinator.lookups) == 1
+
+        coordinator.addresses["node"] = "1.2.3.4:80"
+        clock.now += DIRECTORY_RESOLVER_NEGATIVE_TTL
+        assert resolver.resolve("node") == "1.2.3.4:80"
+        assert len(coordinator.lookups) == 2
+
+    def test_stale_address_is_used_when_coordinator_is_unreachable(self) -> None:
+        """
+        Validates the last known address is used until the node could have expired
+        and that the coordinator is not asked again for the negative TTL.
+        """
+        resolver, coordinator, clock = new_resolver()
+        coordinator.addresses["node"] = "1.2.3.4:80"
+        resolver.resolve("node")
+
+        coordinator.reachable = False
+        clock.now += DIRECTORY_RESOLVER_TTL
+        assert resolver.resolve("node") == "1.2.3.4:80"
+        assert resolver.resolve("node") == "1.2.3.4:80"
+        assert len(coordinator.lookups) == 2
+
+        clock.now += DIRECTORY_EXPIRY_DURATION - DIRECTORY_RESOLVER_TTL
+        assert resolver.resolve("node") is None
+        assert len(coordinator.lookups) == 3
+
+        # Unknown names are also negatively cached when the coordinator is unreachable.
+        assert resolver.resolve("other") is None
+        assert resolver.resolve("other") is None
+        assert len(coordinator.lookups) == 4
+
+    def test_invalidate(self) -> None:
+        resolver, coordinator, _ = new_resolver()
+        coordinator.addresses["alpha"] = "1.2.3.4:80"
+        coordinator.addresses["beta"] = "5.6.7.8:80"
+        resolver.resolve("alpha")
+        resolver.resolve("beta")
+
+        resolver.invalidate("ALPHA")
+        resolver.resolve("alpha")
+        resolver.resolve("beta")
+        assert len(coordinator.lookups) == 3
+
+        resolver.invalidate()
+        assert resolver._cache == {}
+
+    def test_size_is_bounded(self, monkeypatch) -> None:
+        """
+        Validates that when full the entry that expires soonest is replaced.
+        """
+        monkeypatch.setattr(directory, 'DIRECTORY_RESOLVER_SIZE', 3)
+        resolver, coordinator, clock = new_resolver()
+        coordinator.addresses = {"alpha": "1.1.1.1:80", "beta": "2.2.2.2:80", "gamma": "3.3.3.3:80"}
+
+        resolver.resolve("alpha")
+        clock.now += 1
+        resolver.resolve("missing")
+        resolver.resolve("beta")
+        resolver.resolve("gamma")
+        assert sorted(resolver._cache.keys()) == ["alpha", "beta", "gamma"]
+
+        clock.now += 1
+        resolver.resolve("delta")
+        assert sorted(resolver._cache.keys()) == ["beta", "delta", "gamma"]
+
+    def test_refresh_ahead(self) -> None:
+        """
+        Validates that only used addresses are refreshed before they expire, one
+        per refresh, and that entries that can no longer be used are removed.
+        """
+        resolver, coordinator, clock = new_resolver()
+        coordinator.addresses = {"alpha": "1.1.1.1:80", "beta": "2.2.2.2:80"}
+        resolver.resolve("alpha")
+        resolver.resolve("beta")
+        resolver.resolve("missing")
+        assert len(coordinator.lookups) == 3
+
+        refresh(resolver)
+        assert len(coordinator.lookups) == 3
+
+        clock.now += DIRECTORY_RESOLVER_TTL - DIRECTORY_RESOLVER_REFRESH_AHEAD + 0.1
+        refresh(resolver)
+        assert "missing" not in resolver._cache
+        assert coordinator.lookups[3:] == [("coordinator", "alpha")]
+        refresh(resolver)
+        assert coordinator.lookups[4:] == [("coordinator", "beta")]
+        refresh(resolver)
+        assert len(coordinator.lookups) == 5
+
+        # Refreshed addresses are served from the cache past the original TTL.
+        clock.now += DIRECTORY_RESOLVER_REFRESH_AHEAD
+        coordinator.addresses["alpha"] = "9.9.9.9:80"
+        assert resolver.resolve("alpha") == "1.1.1.1:80"
+        assert len(coordinator.lookups) == 5
+
+        # Addresses that were not used since they were refreshed just expire.
+        clock.now += DIRECTORY_RESOLVER_TTL - DIRECTORY_RESOLVER_REFRESH_AHEAD
+        refresh(resolver)
+        assert coordinator.lookups[5:] == [("coordinator", "alpha")]
+        refresh(resolver)
+        assert len(coordinator.lookups) == 6
+
+    def test_refresh_pauses_when_coordinator_is_unreachable(self) -> None:
+        """
+        Validates that after a lookup fails the background refresh does not wait on
+        the coordinator again until the negative TTL has passed.
+        """
+        resolver, coordinator, clock = new_resolver()
+        coordinator.addresses = {"alpha": "1.1.1.1:80", "beta": "2.2.2.2:80"}
+        resolver.resolve("alpha")
+        resolver.resolve("beta")
+
+        coordinator.reachable = False
+        clock.now += DIRECTORY_RESOLVER_TTL - DIRECTORY_RESOLVER_REFRESH_AHEAD + 0.1
+        refresh(resolver)
+        assert coordinator.lookups[2:] == [("coordinator", "alpha")]
+        refresh(resolver)
+        clock.now += DIRECTORY_RESOLVER_NEGATIVE_TTL - 0.1
+        refresh(resolver)
+        assert len(coordinator.lookups) == 3
+
+        coordinator.reachable = True
+        clock.now += 0.1
+        refresh(resolver)
+        assert coordinator.lookups[3:] == [("coordinator", "beta")]
+
+
+class TestLookupNameMessage:
+
+    def test_send_lookup_name_message(self, monkeypatch) -> None:
+        sent = []
+
+        class JsonResponse(MockResponse):
+            def json(self):
+                return {"name": "node", "address": "1.2.3.4:80"}
+
+        def mock_send_message(path: str, host: str, **kwargs):
+            sent.append(f"{host}/{path}")
+            return JsonResponse(OK_200)
+
+        monkeypatch.setattr(directory, 'send_message', mock_send_message)
+        assert send_lookup_name_message("coordinator", "node") == "1.2.3.4:80"
+        assert sent == ["coordinator//lookup/name/node"]
+
+    def test_send_lookup_name_message_fails(self, monkeypatch) -> None:
+        monkeypatch.setattr(directory, 'send_message', lambda path, host, **kwargs: MockResponse(NOT_FOUND_404))
+
+        with pytest.raises(ValueError):
+            send_lookup_name_message("coordinator", "node")
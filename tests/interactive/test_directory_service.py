@@ -5,6 +5,7 @@ import pytest
 from adafruit_httpserver import GET, POST
 
 import interactive.directory as directory
+from interactive import metrics
 from interactive.control import RUNNER_DEFAULT_CALLBACK_FREQUENCY
 from interactive.directory import DirectoryService
 from interactive.runner import Runner
@@ -24,7 +25,7 @@ class TestDirectoryService:
         """
         service = DirectoryService()
 
-        assert len(service.get_routes()) == 6
+        assert len(service.get_routes()) == 8
         assert [route for route in service.get_routes() if route.path == "/register" and route.methods == {GET, POST}]
         assert [route for route in service.get_routes() if route.path == "/unregister" and route.methods == {GET, POST}]
         assert [route for route in service.get_routes() if route.path == "/heartbeat" and route.methods == {GET, POST}]
@@ -33,6 +34,8 @@ class TestDirectoryService:
                 route.path == "/lookup/name/<name>" and route.methods == {GET}]
         assert [route for route in service.get_routes() if
                 route.path == "/lookup/role/<role>" and route.methods == {GET}]
+        assert [route for route in service.get_routes() if route.path == "/replicate" and route.methods == {GET}]
+        assert [route for route in service.get_routes() if route.path == "/subscribe" and route.methods == {GET}]
 
     def test_service_routes_configured_correctly(self, monkeypatch) -> None:
         """
@@ -51,11 +54,8 @@ class TestDirectoryService:
             for route in service.get_routes():
                 request = MockRequest(GET, route.path)
 
-                # We need to handle the methods that have parameters differently
-                if route.path == "/lookup/name/<name>" or route.path == "/lookup/role/<role>":
-                    route.handler(request, "single parameter")
-                else:
-                    route.handler(request)
+                # The server passes route parameters as keyword arguments.
+                route.handler(request, **dict((name, "parameter") for name in route.parameters_names))
 
         asyncio.run(__execute())
 
@@ -79,7 +79,28 @@ class TestDirectoryService:
         service = DirectoryService()
         assert add_task_count == 0
         service.register(runner)
-        assert add_task_count == 2
+        assert add_task_count == 3
+
+    def test_metrics_collector_is_removed_on_cancel(self) -> None:
+        """
+        Validates the directory size stops being collected once the runner is
+        cancelled, so a discarded DirectoryService is not kept alive.
+        """
+        metrics.reset()
+        called_count: int = 0
+
+        async def callback():
+            nonlocal called_count
+            called_count += 1
+            runner.cancel = called_count >= 5
+
+        runner = Runner()
+        service = DirectoryService()
+        service.register(runner)
+        assert len(metrics._collectors) == 1
+
+        runner.run(callback)
+        assert metrics._collectors == []
 
     def test_registering_with_runner_with_coordinator(self, monkeypatch) -> None:
         """
@@ -109,7 +130,7 @@ class TestDirectoryService:
         service = DirectoryService()
         assert add_task_count == 0
         service.register(runner)
-        assert add_task_count == 3
+        assert add_task_count == 4
 
     def test_heartbeats(self, monkeypatch) -> None:
         """
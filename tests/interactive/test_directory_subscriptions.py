@@ -0,0 +1,188 @@
+import asyncio
+import json
+
+import pytest
+import requests
+from adafruit_httpserver import GET, BAD_REQUEST_400, SERVICE_UNAVAILABLE_503, NOT_FOUND_404, POST
+
+from interactive import directory
+from interactive.directory import DirectoryController, DirectorySubscriptions, subscribe, send_register_message, \
+    send_unregister_message
+from interactive.network import NO
+from test_directory_replication import Coordinator, get_free_port, details
+from test_network import MockRequest
+
+
+class MockSSEResponse:
+    """
+    Records the events rather than sending them.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.events = []
+        self.closed = False
+        self.fail = False
+
+    def send_event(self, data: str, event: str = None, id: int = None) -> None:
+        if self.fail:
+            raise OSError("Broken pipe")
+
+        self.events.append((event, json.loads(data) if data else None, id))
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def send_events(subscriptions: DirectorySubscriptions) -> None:
+    asyncio.run(subscriptions._DirectorySubscriptions__send_events())
+
+
+class TestDirectorySubscriptions:
+
+    @pytest.fixture(autouse=True)
+    def mock_sse_response(self, monkeypatch):
+        monkeypatch.setattr(directory, 'SSEResponse', MockSSEResponse)
+
+    def test_snapshot_then_changes(self) -> None:
+        """
+        Validates a subscriber is sent a snapshot followed by each change, with the
+        version as the event id.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "alpha", "path")
+        subscriptions = DirectorySubscriptions(controller)
+        response = subscriptions.subscribe(MockRequest(GET, "/subscribe"))
+        version = controller.version
+
+        send_events(subscriptions)
+        assert response.events == [
+            ("snapshot", {"version": version, "endpoints": {"alpha": "1.2.3.4"}}, version)]
+
+        controller.register_endpoint("1.2.3.5", "beta", "witch")
+        controller.register_endpoint("1.2.3.6", "alpha", "path")
+        controller.heartbeat_from_endpoint("1.2.3.6", "alpha", "path")
+        controller.unregister_endpoint("beta")
+        send_events(subscriptions)
+        assert response.events[1:] == [
+            ("added", {"name": "beta", "role": "witch", "address": "1.2.3.5"}, version + 1),
+            ("added", {"name": "alpha", "role": "path", "address": "1.2.3.6"}, version + 2),
+            ("removed", {"name": "beta", "role": "witch"}, version + 3),
+        ]
+
+        send_events(subscriptions)
+        assert len(response.events) == 4
+
+    def test_role_filter(self) -> None:
+        controller = DirectoryController()
+        subscriptions = DirectorySubscriptions(controller)
+        response = subscriptions.subscribe(MockRequest(GET, "/subscribe"), "path")
+        send_events(subscriptions)
+        assert response.events == [("snapshot", {"version": controller.version, "endpoints": {}}, controller.version)]
+
+        controller.register_endpoint("1.2.3.4", "alpha", "path")
+        controller.register_endpoint("1.2.3.5", "beta", "witch")
+        controller.register_endpoint("1.2.3.4", "alpha", "witch")
+        send_events(subscriptions)
+        assert [(event, data["name"]) for event, data, _ in response.events[1:]] == [
+            ("added", "alpha"), ("removed", "alpha")]
+
+    def test_resume_from_version(self) -> None:
+        """
+        Validates that resuming from a known version sends just the changes since,
+        and that an unknown version sends a snapshot.
+        """
+        controller = DirectoryController()
+        controller.register_endpoint("1.2.3.4", "alpha", "path")
+        since = controller.version
+        controller.register_endpoint("1.2.3.5", "beta", "path")
+
+        subscriptions = DirectorySubscriptions(controller)
+        resumed = subscriptions.subscribe(MockRequest(GET, "/subscribe"), since=since)
+        unknown = subscriptions.subscribe(MockRequest(GET, "/subscribe"), since=since + 10)
+        send_events(subscriptions)
+
+        assert resumed.events == [
+            ("changes", {"version": since + 1, "added": {"beta": "1.2.3.5"}, "removed": []}, since + 1)]
+        assert unknown.events[0][0] == "snapshot"
+
+    def test_keep_alive_and_closed_connections(self, monkeypatch) -> None:
+        """
+        Validates that idle subscribers are sent a ping and that subscribers whose
+        connection has closed are removed.
+        """
+        monkeypatch.setattr(directory, 'DIRECTORY_SUBSCRIPTION_KEEPALIVE', 0)
+        controller = DirectoryController()
+        subscriptions = DirectorySubscriptions(controller)
+        first = subscriptions.subscribe(MockRequest(GET, "/subscribe"))
+        second = subscriptions.subscribe(MockRequest(GET, "/subscribe"))
+        send_events(subscriptions)
+        send_events(subscriptions)
+        assert [event for event, _, _ in first.events] == ["snapshot", "ping"]
+
+        second.fail = True
+        send_events(subscriptions)
+        assert second.closed
+        assert subscriptions._subscribers[0].response is first
+
+        subscriptions.close()
+        assert first.closed
+        assert subscriptions._subscribers == []
+
+    def test_nothing_queued_without_subscribers(self) -> None:
+        controller = DirectoryController()
+        subscriptions = DirectorySubscriptions(controller)
+        controller.register_endpoint("1.2.3.4", "alpha", "path")
+        assert subscriptions._pending == []
+
+    def test_subscribe_route(self, monkeypatch) -> None:
+        """
+        Validates the route parses the role and version and limits the number of subscribers.
+        """
+        monkeypatch.setattr(directory, 'DIRECTORY_MAX_SUBSCRIBERS', 2)
+        subscriptions = DirectorySubscriptions(DirectoryController())
+
+        response = subscribe(MockRequest(POST, "/subscribe"), subscriptions)
+        assert response._body == NO
+        assert response._status == NOT_FOUND_404
+
+        response = subscribe(MockRequest(GET, "/subscribe?since=abc"), subscriptions)
+        assert response._status == BAD_REQUEST_400
+
+        subscribe(MockRequest(GET, "/subscribe?role=Path&since=12"), subscriptions)
+        subscribe(MockRequest(GET, "/subscribe", headers="Last-Event-ID: 34\r\n"), subscriptions)
+        assert [(subscriber.role, subscriber.since) for subscriber in subscriptions._subscribers] == [
+            ("path", 12), (None, 34)]
+
+        response = subscribe(MockRequest(GET, "/subscribe"), subscriptions)
+        assert response._status == SERVICE_UNAVAILABLE_503
+
+
+class TestSubscribeOverNetwork:
+
+    def test_stream(self) -> None:
+        """
+        Validates the events are streamed by a real server.
+        """
+        coordinator = Coordinator(get_free_port(), [])
+        coordinator.start()
+        try:
+            with requests.get(f"http://{coordinator.address}/subscribe", stream=True, timeout=5) as response:
+                assert response.headers["Content-Type"] == "text/event-stream"
+                # Read a byte at a time as the stream is never complete.
+                lines = response.iter_lines(chunk_size=1, decode_unicode=True)
+                assert next(lines).startswith("data: ")
+                assert next(lines) == "event: snapshot"
+
+                send_register_message(coordinator.address, details("alpha", "10.0.0.1:80"))
+                send_unregister_message(coordinator.address, details("alpha"))
+                events = []
+                for line in lines:
+                    if line.startswith("event: "):
+                        events.append(line)
+                        if len(events) == 2:
+                            break
+
+                assert events == ["event: added", "event: removed"]
+        finally:
+            coordinator.stop()
@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+from interactive import frame, metrics
+from interactive.frame import FrameClock
+from interactive.metrics import METRIC_FRAMES_SKIPPED, METRIC_FRAMES_PER_SECOND
+from mock_pixels import MockPixels
+
+
+class MockClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class MockAnimation:
+    """
+    Draws every time it is animated, unless paused, and shows when asked to.
+    """
+
+    def __init__(self, pixel_object):
+        self.pixel_object = pixel_object
+        self.paused = False
+        self.draws = 0
+
+    def animate(self, show=True) -> bool:
+        if self.paused:
+            return False
+
+        self.draws += 1
+        if show:
+            self.pixel_object.show()
+        return True
+
+
+class MockSequence:
+    def __init__(self, current_animation):
+        self.current_animation = current_animation
+
+    def animate(self, show=True) -> bool:
+        return self.current_animation.animate(show)
+
+
+class MockCompositor:
+    def __init__(self):
+        self.frames = 0
+
+    def animate(self) -> None:
+        self.frames += 1
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class TestFrameClock:
+
+    def test_invalid_fps(self) -> None:
+        with pytest.raises(ValueError):
+            FrameClock(0)
+
+    def test_frames_are_stepped_at_the_frame_rate(self) -> None:
+        clock = MockClock()
+        frame_clock = FrameClock(10, clock)
+        animation = MockAnimation(MockPixels())
+        frame_clock.add_animation(animation)
+
+        assert frame_clock.tick()
+        assert not frame_clock.tick()
+        clock.now += 0.05
+        assert not frame_clock.tick()
+        clock.now += 0.05
+        assert frame_clock.tick()
+        assert animation.draws == 2
+        assert frame_clock.frames == 2
+
+    def test_each_strip_is_shown_once(self) -> None:
+        """
+        Validates that animations on the same strip, including in a sequence, are
+        shown with a single show and that strips that were not drawn are not shown.
+        """
+        first = MockPixels()
+        second = MockPixels()
+        paused = MockAnimation(second)
+        paused.paused = True
+        compositor = MockCompositor()
+
+        frame_clock = FrameClock(10, MockClock())
+        frame_clock.add_animation(MockAnimation(first))
+        frame_clock.add_animation(MockSequence(MockAnimation(first)))
+        frame_clock.add_animation(paused)
+        frame_clock.add_compositor(compositor)
+        frame_clock.tick()
+
+        assert (first.shows, second.shows) == (1, 0)
+        assert compositor.frames == 1
+
+    def test_missed_frames_are_skipped(self) -> None:
+        clock = MockClock()
+        frame_clock = FrameClock(10, clock)
+        frame_clock.tick()
+
+        clock.now += 0.35
+        assert frame_clock.tick()
+        assert frame_clock.skipped == 2
+        assert metrics.get_value(METRIC_FRAMES_SKIPPED, 'clock="frame"') == 2
+
+        # The next frame is back on the original cadence.
+        clock.now += 0.04
+        assert not frame_clock.tick()
+        clock.now += 0.01
+        assert frame_clock.tick()
+        assert frame_clock.frames == 3
+
+    def test_stats(self, monkeypatch) -> None:
+        """
+        Validates the frame rate and frame time percentiles are measured over the
+        recent frames.
+        """
+        monkeypatch.setattr(frame, 'FRAME_SAMPLE_COUNT', 10)
+        clock = MockClock()
+        frame_clock = FrameClock(10, clock)
+        assert frame_clock.stats() == {"fps": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "frames": 0, "skipped": 0}
+
+        class SlowAnimation(MockAnimation):
+            def animate(self, show=True) -> bool:
+                clock.now += self.draws / 1000
+                return super().animate(show)
+
+        frame_clock.add_animation(SlowAnimation(MockPixels()))
+        for _ in range(20):
+            frame_clock.tick()
+            clock.now = frame_clock._FrameClock__next_frame
+
+        stats = frame_clock.stats()
+        assert stats["frames"] == 20
+        assert stats["fps"] == pytest.approx(10)
+        assert stats["p50"] == pytest.approx(0.015)
+        assert stats["p95"] == pytest.approx(0.019)
+        assert stats["p99"] == pytest.approx(0.019)
+
+    def test_registering_with_runner(self) -> None:
+        class MockRunner:
+            def __init__(self):
+                self.cancel = False
+                self.tasks = []
+
+            def add_loop_task(self, task) -> None:
+                self.tasks.append(task)
+
+        clock = MockClock()
+        frame_clock = FrameClock(10, clock)
+        animation = MockAnimation(MockPixels())
+        frame_clock.add_animation(animation)
+        runner = MockRunner()
+        frame_clock.register(runner)
+
+        asyncio.run(runner.tasks[0]())
+        list(metrics.render())
+        assert metrics.get_value(METRIC_FRAMES_PER_SECOND, 'clock="frame"') == 0.0
+
+        # Once cancelled the clock stops drawing and no longer collects its metrics.
+        runner.cancel = True
+        clock.now += 1
+        asyncio.run(runner.tasks[0]())
+        assert animation.draws == 1
+        assert metrics._collectors == []
+
+    def test_metrics_are_labelled_with_the_clock_name(self) -> None:
+        """
+        Validates that two clocks report their own frame rate.
+        """
+        clock = MockClock()
+        fast = FrameClock(8, clock, "fast")
+        slow = FrameClock(4, clock, "slow")
+        for _ in range(5):
+            fast.tick()
+            slow.tick()
+            clock.now += 0.125
+
+        fast._FrameClock__collect_metrics()
+        slow._FrameClock__collect_metrics()
+        assert metrics.get_value(METRIC_FRAMES_PER_SECOND, 'clock="fast"') == pytest.approx(8)
+        assert metrics.get_value(METRIC_FRAMES_PER_SECOND, 'clock="slow"') == pytest.approx(4)
+        assert metrics.get_value(METRIC_FRAMES_PER_SECOND) is None
@@ -0,0 +1,258 @@
+import pytest
+import adafruit_led_animation.animation
+import adafruit_led_animation.animation.rainbow
+from adafruit_led_animation.animation.colorcycle import ColorCycle
+from adafruit_led_animation.animation.comet import Comet
+from adafruit_led_animation.animation.rainbow import Rainbow
+
+from interactive import framecache
+from interactive.compositor import Layer
+from interactive.framecache import FrameSequence, FrameCache, CachedAnimation, record
+from mock_pixels import MockPixels
+
+
+class MockChase:
+    """
+    Lights one pixel, moving along one pixel each frame.
+    """
+
+    def __init__(self, pixel_object):
+        self.pixel_object = pixel_object
+        self.position = 0
+
+    def draw(self) -> None:
+        self.pixel_object.fill(0)
+        self.pixel_object[self.position] = (self.position, 2, 3)
+        self.position = (self.position + 1) % len(self.pixel_object)
+
+    def after_draw(self) -> None:
+        pass
+
+
+def play(animation: CachedAnimation, frames: int) -> list:
+    drawn = []
+    for _ in range(frames):
+        animation.draw()
+        drawn.append(animation.pixel_object[:])
+    return drawn
+
+
+def animate(new_animation, frames: int, monkeypatch) -> list:
+    """
+    Returns the frames drawn by the animation running live, with a clock that moves
+    on by its speed between frames.
+    """
+    now = [0]
+    for module in [adafruit_led_animation.animation, adafruit_led_animation.animation.rainbow]:
+        monkeypatch.setattr(module, 'monotonic_ms', lambda: now[0])
+
+    animation = new_animation()
+    drawn = []
+    for _ in range(frames):
+        assert animation.animate(show=False)
+        drawn.append(animation.pixel_object[:])
+        now[0] += int(animation.speed * 1000)
+    return drawn
+
+
+def draw(animation, frames: int) -> list:
+    drawn = []
+    for _ in range(frames):
+        animation.draw()
+        animation.after_draw()
+        drawn.append(animation.pixel_object[:])
+    return drawn
+
+
+class TestFrameSequence:
+
+    def test_record_and_play(self) -> None:
+        """
+        Validates that each frame only holds the pixels that changed and that
+        playback loops from the last frame to the first.
+        """
+        pixels = MockPixels(4)
+        sequence = record(MockChase(pixels), 4)
+        assert len(sequence) == 4
+        assert pixels.writes == []
+
+        # One pixel for the first frame, then one run of the two pixels that change
+        # and finally two runs, of one pixel each, to loop.
+        assert sequence.offsets.tolist() == [0, 7, 17, 27, 37, 51]
+        assert sequence.nbytes == 51 + 6 * 4
+
+        animation = CachedAnimation(pixels, 0.1, sequence)
+        for _ in range(6):
+            animation.draw()
+        assert pixels.values == [0, 0x010203, 0, 0]
+        pixels.writes.clear()
+        animation.draw()
+        assert pixels.values == [0, 0, 0x020203, 0]
+        assert len(pixels.writes) == 2
+
+    def test_playback_matches_animation(self) -> None:
+        """
+        Validates that a recorded Comet plays back exactly as it draws, through
+        more than one cycle, into a Layer.
+        """
+        comet = Comet(Layer(10), 0.1, (255, 0, 0), tail_length=4, bounce=True)
+        cycle = 30
+        sequence = record(comet, cycle)
+
+        expected = draw(Comet(Layer(10), 0.1, (255, 0, 0), tail_length=4, bounce=True), cycle * 2)
+        assert play(CachedAnimation(Layer(10), 0.1, sequence), cycle * 2) == expected
+
+    def test_timed_playback_matches_animation(self, monkeypatch) -> None:
+        """
+        Validates that a recorded Rainbow, which moves on with the clock rather than
+        each frame, and ColorCycle play back as they are drawn live.
+        """
+        # 50 frames to the period, with the rainbow repeating every 16 pixels.
+        rainbow = Rainbow(Layer(20), 0.1, period=5, step=16)
+        sequence = record(rainbow, 50)
+        assert rainbow._wheel_index == 15
+        recorded = play(CachedAnimation(Layer(20), 0.1, sequence), 100)
+        assert len(set(tuple(frame) for frame in recorded)) == 16
+        assert recorded == animate(lambda: Rainbow(Layer(20), 0.1, period=5, step=16), 100, monkeypatch)
+
+        sequence = record(ColorCycle(Layer(5), 0.2), 6)
+        assert play(CachedAnimation(Layer(5), 0.2, sequence), 12) == animate(
+            lambda: ColorCycle(Layer(5), 0.2), 12, monkeypatch)
+
+    def test_cycle_complete_and_reset(self) -> None:
+        animation = CachedAnimation(Layer(3), 0.1, record(MockChase(Layer(3)), 3))
+        play(animation, 3)
+        assert not getattr(animation, "cycle_complete", False)
+        animation.draw()
+        assert animation.cycle_complete
+
+        animation.reset()
+        animation.draw()
+        assert animation.pixel_object[:] == [(0, 2, 3), (0, 0, 0), (0, 0, 0)]
+
+    def test_restarts_when_active_again(self, monkeypatch) -> None:
+        """
+        Validates that playback starts again from black, rather than applying the
+        changes to another animation's pixels, when it is animated again after an
+        AnimationSequence has shown another animation, and when it is filled.
+        """
+        now_ns = [0]
+
+        class MockTime:
+            @staticmethod
+            def monotonic_ns() -> int:
+                return now_ns[0]
+
+        monkeypatch.setattr(framecache, 'time', MockTime)
+        monkeypatch.setattr(framecache, 'FRAME_CACHE_IDLE_RESTART', 0.5)
+
+        layer = Layer(3)
+        animation = CachedAnimation(layer, 0.1, record(MockChase(Layer(3)), 3))
+
+        def step(frames: int) -> None:
+            # The animation polyfill does not draw, so draw as animate() would.
+            for _ in range(frames):
+                animation.animate(show=False)
+                animation.draw()
+                now_ns[0] += 100_000_000
+
+        step(2)
+        assert layer[:] == [(0, 0, 0), (1, 2, 3), (0, 0, 0)]
+
+        # Another animation draws for a second without clearing the strip.
+        layer.fill((9, 9, 9))
+        now_ns[0] += 1_000_000_000
+        step(1)
+        assert layer[:] == [(0, 2, 3), (0, 0, 0), (0, 0, 0)]
+
+        step(1)
+        animation.fill((5, 5, 5))
+        step(1)
+        assert layer[:] == [(0, 2, 3), (0, 0, 0), (0, 0, 0)]
+
+    def test_long_runs(self) -> None:
+        """
+        Validates runs longer and skips further than fit in two bytes.
+        """
+        class Fill:
+            def __init__(self, pixel_object):
+                self.pixel_object = pixel_object
+                self.frame = 0
+
+            def draw(self) -> None:
+                self.frame += 1
+                if self.frame == 1:
+                    self.pixel_object.fill((1, 1, 1))
+                else:
+                    self.pixel_object[70000] = (2, 2, 2)
+
+            def after_draw(self) -> None:
+                pass
+
+        sequence = record(Fill(Layer(70001)), 2)
+        layer = Layer(70001)
+        sequence.play(0, layer)
+        assert layer.buffer == bytes([1]) * 70001 * 3
+        sequence.play(1, layer)
+        assert layer[70000] == (2, 2, 2)
+        assert layer[69999] == (1, 1, 1)
+
+    def test_write_and_read(self, tmp_path) -> None:
+        sequence = record(MockChase(Layer(5)), 5)
+        path = str(tmp_path / "chase.frames")
+        sequence.write(path)
+
+        loaded = FrameSequence.read(path)
+        assert (loaded.size, loaded.data, loaded.offsets) == (sequence.size, sequence.data, sequence.offsets)
+
+        for size in [30, len(sequence.data) + 40]:
+            with open(path, "r+b") as file:
+                file.truncate(size)
+            with pytest.raises(ValueError):
+                FrameSequence.read(path)
+
+    def test_size_must_match(self) -> None:
+        with pytest.raises(ValueError):
+            CachedAnimation(Layer(4), 0.1, record(MockChase(Layer(5)), 5))
+
+        with pytest.raises(ValueError):
+            record(MockChase(Layer(5)), 0)
+
+
+class TestFrameCache:
+
+    def test_get_renders_once(self) -> None:
+        cache = FrameCache()
+        rendered = []
+
+        def render() -> FrameSequence:
+            rendered.append(True)
+            return record(MockChase(Layer(5)), 5)
+
+        first = cache.get("chase", render)
+        assert cache.get("chase", render) is first
+        assert len(rendered) == 1
+        assert cache.nbytes == first.nbytes
+        assert cache.get("missing") is None
+
+    def test_least_recently_used_are_removed(self) -> None:
+        """
+        Validates that sequences are removed, least recently used first, to stay
+        within the budget and that sequences larger than the budget are not kept.
+        """
+        sequence = record(MockChase(Layer(5)), 5)
+        cache = FrameCache(sequence.nbytes * 2)
+        cache.add("a", sequence)
+        cache.add("b", record(MockChase(Layer(5)), 5))
+        cache.get("a")
+        cache.add("c", record(MockChase(Layer(5)), 5))
+        assert ("a" in cache, "b" in cache, "c" in cache) == (True, False, True)
+        assert cache.nbytes == sequence.nbytes * 2
+
+        cache.add("large", record(MockChase(Layer(50)), 50))
+        assert "large" not in cache
+        assert cache.nbytes == sequence.nbytes * 2
+
+        cache.remove("a")
+        cache.remove("a")
+        assert cache.nbytes == sequence.nbytes
@@ -0,0 +1,82 @@
+import pytest
+
+from interactive.compositor import Compositor
+from interactive.grid import Grid
+from interactive.polyfills.pixelmap import vertical_strip_gridmap, horizontal_strip_gridmap
+from mock_pixels import MockPixels
+
+
+class TestGrid:
+
+    def test_serpentine_rows(self):
+        pixels = MockPixels(6)
+        grid = Grid(pixels, 3, 2)
+
+        for i in range(6):
+            grid[i] = i + 1
+        grid.show()
+
+        # The second row runs right to left.
+        assert pixels.values == [1, 2, 3, 6, 5, 4]
+        assert pixels.shows == 1
+        assert not pixels.auto_write
+
+    def test_x_and_y(self):
+        pixels = MockPixels(6)
+        grid = Grid(pixels, 3, 2, vertical_strip_gridmap(2, alternating=False))
+
+        grid[2, 1] = 0x010203
+        grid.show()
+
+        assert grid[2, 1] == 0x010203
+        assert grid[5] == 0x010203
+        assert pixels.values == [0, 0, 0, 0, 0, 0x010203]
+
+    def test_several_strips(self):
+        strips = [MockPixels(4), MockPixels(4)]
+        grid = Grid(strips, 4, 2, horizontal_strip_gridmap(4, alternating=False))
+
+        grid[0, 1] = 0x0000FF
+        grid[3, 0] = 0xFF0000
+        grid.show()
+
+        assert strips[0].values == [0, 0, 0, 0xFF0000]
+        assert strips[1].values == [0x0000FF, 0, 0, 0]
+
+    def test_fill(self):
+        strips = [MockPixels(4), MockPixels(4)]
+        Grid(strips, 4, 2).fill(0x100000)
+        pixels = MockPixels(8)
+        Grid(pixels, 3, 2).fill(0x200000)
+
+        assert strips[0].values == strips[1].values == [0x100000] * 4
+        # Only the pixels in the grid are filled.
+        assert pixels.values == [0x200000] * 6 + [0, 0]
+
+    def test_compositor(self):
+        pixels = MockPixels(4)
+        grid = Grid(pixels, 2, 2)
+        compositor = Compositor()
+        layer = compositor.new_layer(grid)
+        layer[grid.index_of(1, 1)] = 0x00FF00
+        layer[2] = 0x0000FF
+        compositor.animate()
+
+        assert pixels.values == [0, 0, 0x00FF00, 0x0000FF]
+        assert pixels.shows == 1
+
+    def test_out_of_bounds(self):
+        grid = Grid(MockPixels(6), 3, 2)
+
+        with pytest.raises(IndexError):
+            grid[3, 0] = 0
+        with pytest.raises(IndexError):
+            _ = grid[0, 2]
+
+    def test_invalid_layouts(self):
+        with pytest.raises(ValueError):
+            Grid(MockPixels(5), 3, 2)
+        with pytest.raises(ValueError):
+            Grid(MockPixels(6), 3, 2, lambda x, y: x)
+        with pytest.raises(ValueError):
+            Grid(MockPixels(6), 3, 2, lambda x, y: y * 3 + x + 1)
@@ -0,0 +1,51 @@
+import heapq
+import random
+
+import pytest
+
+from interactive.polyfills.heap import _heappush, _heappop
+
+
+def is_heap(heap: list) -> bool:
+    return all(heap[(index - 1) >> 1] <= heap[index] for index in range(1, len(heap)))
+
+
+class TestHeap:
+
+    def test_matches_heapq(self) -> None:
+        """
+        Validates that random sequences of pushes and pops pop the same items as
+        heapq, including duplicate items, and always leave a valid heap. The layout
+        can differ from heapq after a pop as heapq sifts differently.
+        """
+        random.seed(1)
+        for _ in range(200):
+            heap = []
+            expected = []
+            for _ in range(random.randint(1, 100)):
+                if expected and random.random() < 0.4:
+                    assert _heappop(heap) == heapq.heappop(expected)
+                else:
+                    item = random.randint(0, 20)
+                    _heappush(heap, item)
+                    heapq.heappush(expected, item)
+                assert is_heap(heap)
+                assert sorted(heap) == sorted(expected)
+
+            while expected:
+                assert _heappop(heap) == heapq.heappop(expected)
+            assert heap == []
+
+    def test_tuples(self) -> None:
+        """
+        Validates the (time, name) tuples the directory keeps are popped in order.
+        """
+        heap = []
+        for item in [(3.0, "c"), (1.0, "b"), (2.0, "a"), (1.0, "a")]:
+            _heappush(heap, item)
+
+        assert [_heappop(heap) for _ in range(4)] == [(1.0, "a"), (1.0, "b"), (2.0, "a"), (3.0, "c")]
+
+    def test_pop_empty(self) -> None:
+        with pytest.raises(IndexError):
+            _heappop([])
@@ -1,8 +1,41 @@
-import pytest
+from interactive.led import Led
+from interactive.polyfills.led import LedPin, MAX_DUTY
 
 
 class TestLed:
 
-    @pytest.mark.skip(reason="tests not implemented yet")
-    def test_write_tests(self) -> None:
-        assert False
+    def test_fill_writes_once(self) -> None:
+        pin = LedPin(None)
+        led = Led(pin)
+        led.fill((0, 0, 0, 0x80))
+        assert pin.duty_cycle == int(MAX_DUTY * 0x80 / 0xFF)
+        assert pin.writes == 1
+
+    def test_unchanged_brightness_is_not_written(self) -> None:
+        """
+        Validates that showing the same brightness, or a brightness with the same
+        duty cycle, does not write to the pin again.
+        """
+        pin = LedPin(None)
+        led = Led(pin, auto_write=False)
+        led.show()
+        led.show()
+        assert (pin.duty_cycle, pin.writes) == (MAX_DUTY, 1)
+
+        led.fill(0)
+        led.show()
+        led.fill((0, 0, 0))
+        led.show()
+        assert (pin.duty_cycle, pin.writes) == (0, 2)
+
+        pin.show(0.000001)
+        assert pin.writes == 2
+
+    def test_brightness(self) -> None:
+        pin = LedPin(None)
+        led = Led(pin, brightness=0.5)
+        assert pin.writes == 1
+        led.on()
+        led.on()
+        led.off()
+        assert (pin.duty_cycle, pin.writes) == (0, 3)
@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from interactive import metrics
+from interactive.metrics import increment, set_gauge, observe, get_value, add_collector, remove_collector, render, \
+    set_task_timings, COUNTER, GAUGE, SUMMARY
+from interactive.scheduler import new_loop_task, new_scheduled_task
+
+
+class TestMetrics:
+
+    @pytest.fixture(autouse=True)
+    def clear_metrics(self):
+        metrics.reset()
+        yield
+        metrics.reset()
+
+    def test_counter(self) -> None:
+        increment("test_total")
+        increment("test_total", 2)
+        increment("test_total", labels='node="a"')
+        assert get_value("test_total") == 3
+        assert get_value("test_total", 'node="a"') == 1
+        assert get_value("unknown_total") is None
+
+    def test_gauge(self) -> None:
+        set_gauge("test_gauge", 5)
+        set_gauge("test_gauge", 2)
+        assert get_value("test_gauge") == 2
+
+    def test_summary(self) -> None:
+        observe("test_seconds", 0.5)
+        observe("test_seconds", 1.5)
+        observe("test_seconds", 1.0)
+        assert get_value("test_seconds") == [3, 3.0, 1.5]
+
+    def test_render(self) -> None:
+        """
+        Validates the text exposition format, one chunk per metric, and that
+        collectors are called before rendering.
+        """
+        increment("test_total", labels='node="a"')
+        observe("test_seconds", 0.25, 'task="blink"')
+        add_collector(lambda: set_gauge("test_gauge", 7))
+
+        chunks = list(render())
+        assert f"# TYPE test_total {COUNTER}\ntest_total{{node=\"a\"}} 1\n" in chunks
+        assert (f"# TYPE test_seconds {SUMMARY}\n"
+                f"test_seconds_count{{task=\"blink\"}} 1\n"
+                f"test_seconds_sum{{task=\"blink\"}} 0.25\n"
+                f"test_seconds{{task=\"blink\",quantile=\"1\"}} 0.25\n") in chunks
+        assert f"# TYPE test_gauge {GAUGE}\ntest_gauge 7\n" in chunks
+
+    def test_remove_collector(self) -> None:
+        """
+        Validates that a removed collector is no longer called, and that removing
+        one that was never added is ignored.
+        """
+        collected = []
+        collector = lambda: collected.append(True)  # noqa: E731
+        add_collector(collector)
+        list(render())
+        remove_collector(collector)
+        remove_collector(collector)
+        list(render())
+
+        assert collected == [True]
+
+    def test_loop_task_records_timings(self) -> None:
+        """
+        Validates that loop tasks record their timings and the loop lag.
+        """
+        called_count = 0
+
+        async def counted_task() -> None:
+            nonlocal called_count
+            called_count += 1
+
+        asyncio.run(new_loop_task(counted_task, lambda: called_count >= 3)())
+        assert get_value(metrics.METRIC_TASK_SECONDS, 'task="counted_task"') is None
+
+        set_task_timings(True)
+        asyncio.run(new_loop_task(counted_task, lambda: called_count >= 6)())
+
+        timings = get_value(metrics.METRIC_TASK_SECONDS, 'task="counted_task"')
+        assert timings[0] == 3
+        assert get_value(metrics.METRIC_LOOP_LAG_SECONDS)[0] == 3
+
+    def test_scheduled_task_records_timings(self) -> None:
+        """
+        Validates that scheduled tasks record their timings when enabled.
+        """
+        called_count = 0
+
+        async def scheduled_task() -> None:
+            nonlocal called_count
+            called_count += 1
+
+        set_task_timings(True)
+        asyncio.run(new_scheduled_task(scheduled_task, lambda: called_count >= 2, frequency=100)())
+
+        assert get_value(metrics.METRIC_TASK_SECONDS, 'task="scheduled_task"')[0] == 2
+
+    def test_render_resets_maximum(self) -> None:
+        """
+        Validates that the maximum of a summary is the largest value since the last
+        render, while the count and sum keep growing.
+        """
+        observe("test_seconds", 1.5)
+        list(render())
+        observe("test_seconds", 0.5)
+
+        assert get_value("test_seconds") == [2, 2.0, 0.5]
@@ -34,11 +34,12 @@ class MockServer(Server):
 
 
 class MockRequest(Request):
-    def __init__(self, method, route: str, body: str = ""):
+    def __init__(self, method, route: str, body: [str, bytes] = "", headers: str = ""):
         server = MockServer()
         raw_request = bytes(
-            f"{method} {route} HTTP/1.1\r\nHost: 127.0.0.1:5001\r\nUser-Agent: test-framework\r\nAccept: */*\r\n\r\n{body}",
+            f"{method} {route} HTTP/1.1\r\nHost: 127.0.0.1:5001\r\nUser-Agent: test-framework\r\nAccept: */*\r\n{headers}\r\n",
             "utf-8")
+        raw_request += body if isinstance(body, bytes) else bytes(body, "utf-8")
         super().__init__(server, None, ('123.45.67.89', 12345), raw_request)
 
 
@@ -119,7 +120,7 @@ class TestNetwork:
 
         # Check there are some routes. We check for the presence of some of the well
         # known standard ones.
-        assert len(server._routes) == 13
+        assert len(server._routes) == 14
         assert [route for route in server._routes if route.path == "/" and route.methods == {GET}]
         assert [route for route in server._routes if route.path == "/index.html" and route.methods == {GET}]
         assert [route for route in server._routes if route.path == "/inspect" and route.methods == {GET}]
@@ -128,6 +129,7 @@ class TestNetwork:
         assert [route for route in server._routes if route.path == "/name" and route.methods == {GET}]
         assert [route for route in server._routes if route.path == "/role" and route.methods == {GET}]
         assert [route for route in server._routes if route.path == "/details" and route.methods == {GET}]
+        assert [route for route in server._routes if route.path == "/metrics" and route.methods == {GET}]
         assert [route for route in server._routes if route.path == "/blink" and route.methods == {GET}]
         assert [route for route in server._routes if route.path == "/led/blink" and route.methods == {GET}]
         assert [route for route in server._routes if route.path == "/led/<state>" and route.methods == {GET, POST}]
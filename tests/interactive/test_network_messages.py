@@ -1,9 +1,10 @@
 import asyncio
 import os
 
-from adafruit_httpserver import GET, Request, OK_200
+from adafruit_httpserver import GET, Request, OK_200, BAD_REQUEST_400
 
 from interactive import configuration
+from interactive import metrics
 from interactive import network
 from interactive.network import NO, TRIGGERED, NetworkController
 from interactive.polyfills import cpu
@@ -48,6 +49,20 @@ class TestRoutes:
         assert response._status == OK_200
         assert len(response._headers) == 0
 
+    def test_metrics(self) -> None:
+        """
+        Validates that the metrics are returned as a chunked text response.
+        """
+        validate_methods({GET}, "/metrics", network.metrics)
+
+        metrics.increment(metrics.METRIC_REQUESTS)
+        request = MockRequest(GET, "/metrics")
+        response = network.metrics(request)
+        assert response._status == OK_200
+        assert response._content_type == network.CONTENT_TYPE_METRICS
+        body = "".join(response._body())
+        assert f"# TYPE {metrics.METRIC_REQUESTS} counter\n" in body
+
     def test_inspect(self) -> None:
         """
         Validates that the inspect web page is returned with no additional headers.
@@ -242,6 +257,32 @@ class TestRoutes:
         assert len(response._headers) == 0
         assert callback_called_count == 2
 
+    def test_trigger_with_delay(self):
+        """
+        Validates that the trigger is called after the delay and that an
+        invalid delay is rejected.
+        """
+        callback_called_count = 0
+
+        def callback() -> None:
+            nonlocal callback_called_count
+            callback_called_count += 1
+
+        async def trigger_with_delay():
+            response = network.trigger(MockRequest(GET, "/trigger?delay=0.05"), callback)
+            assert response._body == TRIGGERED
+            assert response._status == OK_200
+            assert callback_called_count == 0
+            await asyncio.sleep(0.1)
+            assert callback_called_count == 1
+
+        asyncio.run(trigger_with_delay())
+
+        response = network.trigger(MockRequest(GET, "/trigger?delay=soon"), callback)
+        assert response._body == NO
+        assert response._status == BAD_REQUEST_400
+        assert callback_called_count == 1
+
 
 class TestMessages:
 
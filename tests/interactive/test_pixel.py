@@ -0,0 +1,63 @@
+import pytest
+
+from interactive.framecache import CachedAnimation, FrameSequence
+from interactive.polyfills.pixel import Pixels, new_pixels
+
+
+class TestPixels:
+
+    def test_colours_are_kept(self) -> None:
+        pixels = new_pixels(None, 4, brightness=2)
+        assert (len(pixels), pixels.n, pixels.brightness, pixels.auto_write) == (4, 4, 1.0, False)
+
+        pixels[0] = (1, 2, 3)
+        pixels[-1] = 0x040506
+        pixels[1:3] = [(7, 8, 9), 0x0A0B0C]
+        assert pixels[:] == [(1, 2, 3), (7, 8, 9), (10, 11, 12), (4, 5, 6)]
+        assert pixels.shows == 0
+
+        pixels.fill((255, 0, 0))
+        assert pixels[2] == (255, 0, 0)
+
+        with pytest.raises(IndexError):
+            pixels[4] = (0, 0, 0)
+
+    def test_auto_write(self) -> None:
+        pixels = Pixels(None, 2, auto_write=True)
+        pixels[0] = (1, 1, 1)
+        pixels.fill(0)
+        pixels.write()
+        assert pixels.shows == 3
+
+    def test_frame(self) -> None:
+        """
+        Validates the frame is what would be displayed, with the brightness applied
+        and the white of RGBW strips added.
+        """
+        pixels = Pixels(None, 2, brightness=0.5, auto_write=False, bpp=4)
+        pixels[0] = (100, 200, 255, 10)
+        pixels[1] = 0x102030
+        assert pixels[0] == (100, 200, 255, 10)
+        assert pixels.frame() == bytes([55, 105, 127, 8, 16, 24])
+
+    def test_record_and_replay(self, tmp_path) -> None:
+        pixels = new_pixels(None, 3)
+        assert pixels.stop_recording() is None
+
+        pixels.start_recording()
+        for index in range(3):
+            pixels.fill(0)
+            pixels[index] = (index, 2, 3)
+            pixels.show()
+        sequence = pixels.stop_recording()
+        pixels.show()
+        assert len(sequence) == 3
+
+        path = str(tmp_path / "recording.frames")
+        sequence.write(path)
+        replay = new_pixels(None, 3)
+        animation = CachedAnimation(replay, 0.1, FrameSequence.read(path))
+        for index in range(3):
+            animation.draw()
+            replay.show()
+            assert replay[:] == [(i, 2, 3) if i == index else (0, 0, 0) for i in range(3)]
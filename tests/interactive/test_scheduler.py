@@ -643,6 +643,34 @@ class TestTriggerTimedEvents:
         assert trigger.running
         assert len(trigger.events) == 0
 
+    def test_custom_clock_and_start_time(self) -> None:
+        """
+        Validates that events are timed from the provided clock and that the
+        start time can be in the past or the future.
+        """
+        now = 1000.0
+
+        def clock() -> float:
+            return now
+
+        trigger = TriggerTimedEvents(clock)
+        trigger.add_event(1, 1)
+        trigger.add_event(2, 2)
+
+        # Started in the future, nothing fires until then.
+        trigger.start(1001.5)
+        assert trigger.run() == []
+        now = 1002.5
+        assert [event.event for event in trigger.run()] == [1]
+        now = 1003.5
+        assert [event.event for event in trigger.run()] == [2]
+        assert not trigger.running
+
+        # Started in the past, everything elapsed fires immediately.
+        now = 1000.0
+        trigger.start(998.0)
+        assert sorted(event.event for event in trigger.run()) == [1, 2]
+
     def test_calling_start_multiple_times(self) -> None:
         """
         Validates that calling start works when called once, twice or more times.
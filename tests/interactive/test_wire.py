@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+import interactive.wire as wire
+from interactive.wire import MESSAGE_REGISTER, MESSAGE_UNREGISTER, MESSAGE_HEARTBEAT, MESSAGE_TRIGGER, WIRE_VERSION
+from interactive.wire import add_roles, is_binary, encode_directory_message, encode_trigger_message, decode_message
+
+
+class TestWire:
+
+    @pytest.fixture(autouse=True)
+    def clear_roles(self, monkeypatch):
+        monkeypatch.setattr(wire, '_roles', [""])
+        monkeypatch.setattr(wire, '_role_ids', {})
+
+    def test_directory_messages_round_trip(self) -> None:
+        """
+        Validates that each directory message decodes to the same values as
+        the equivalent JSON message.
+        """
+        for message in [MESSAGE_REGISTER, MESSAGE_UNREGISTER, MESSAGE_HEARTBEAT]:
+            data = encode_directory_message(message, "node_1", "Role_1", "192.168.1.20:5001")
+            assert data[0] == WIRE_VERSION
+            assert data[1] == message
+            assert is_binary(data)
+            assert decode_message(data) == {
+                "message": message, "name": "node_1", "role": "role_1", "address": "192.168.1.20:5001"}
+
+        # Addresses without a port are supported.
+        data = encode_directory_message(MESSAGE_REGISTER, "node_1", "role_1", "10.0.0.1")
+        assert decode_message(data)["address"] == "10.0.0.1"
+
+    def test_directory_message_is_smaller_than_json(self) -> None:
+        """
+        The point of the binary encoding is to be smaller than the JSON.
+        """
+        details = {"name": "node_1", "role": "role_1", "coordinator": "192.168.1.1", "address": "192.168.1.20:5001"}
+        data = encode_directory_message(MESSAGE_HEARTBEAT, details["name"], details["role"], details["address"])
+        assert len(data) < len(json.dumps(details)) / 2
+
+        # Interning the role makes it smaller again.
+        add_roles("role_1")
+        interned = encode_directory_message(MESSAGE_HEARTBEAT, details["name"], details["role"], details["address"])
+        assert len(interned) == len(data) - len("role_1") - 1
+        assert decode_message(interned)["role"] == "role_1"
+
+    def test_interned_roles(self) -> None:
+        """
+        Validates that roles are interned once, in order and case-insensitively.
+        """
+        add_roles("Path", "witch", "PATH")
+        assert wire._roles == ["", "path", "witch"]
+        assert wire._role_ids == {"path": 1, "witch": 2}
+
+        data = encode_directory_message(MESSAGE_REGISTER, "node_1", "WITCH", "1.2.3.4:80")
+        assert data[2] == 2
+        assert decode_message(data)["role"] == "witch"
+
+        # A role identifier that is not known cannot be decoded.
+        data = bytearray(data)
+        data[2] = 99
+        with pytest.raises(ValueError):
+            decode_message(data)
+
+    def test_trigger_message_round_trip(self) -> None:
+        """
+        Validates the trigger message including the delay and start time.
+        """
+        data = encode_trigger_message("node_1", 1.5, 123_456_789_012_345)
+        assert is_binary(data)
+        assert decode_message(data) == {
+            "message": MESSAGE_TRIGGER, "name": "node_1", "delay": 1.5, "start_ns": 123_456_789_012_345}
+
+        # Without a start time, the start is 0 so only the delay is used.
+        decoded = decode_message(encode_trigger_message("node_1"))
+        assert decoded["delay"] == 0.0
+        assert decoded["start_ns"] == 0
+
+    def test_invalid_messages(self) -> None:
+        """
+        Validates values that cannot be encoded and data that cannot be decoded
+        raise a ValueError.
+        """
+        with pytest.raises(ValueError):
+            encode_directory_message(MESSAGE_REGISTER, "node_1", "role_1", "a.b.c.d")
+
+        with pytest.raises(ValueError):
+            encode_directory_message(MESSAGE_REGISTER, "node_1", "role_1", "1.2.3:80")
+
+        with pytest.raises(ValueError):
+            encode_directory_message(MESSAGE_REGISTER, "node_1", "role_1", "1.2.3.256:80")
+
+        with pytest.raises(ValueError):
+            encode_directory_message(MESSAGE_REGISTER, "n" * 256, "role_1", "1.2.3.4:80")
+
+        assert not is_binary(b'{"name": "node_1"}')
+        assert not is_binary(b"R\tnode_1")
+
+        with pytest.raises(ValueError):
+            decode_message(b'{"name": "node_1"}')
+
+        with pytest.raises(ValueError):
+            decode_message(bytes([WIRE_VERSION, 99, 0, 0]))
+
+        with pytest.raises(ValueError):
+            decode_message(bytes([WIRE_VERSION, MESSAGE_REGISTER, 0]))
+
+    def test_truncated_messages(self) -> None:
+        """
+        Validates that every message cut short anywhere raises a ValueError rather
+        than decoding a partial name or role or raising an IndexError.
+        """
+        add_roles("role_1")
+        messages = [
+            encode_directory_message(MESSAGE_REGISTER, "node_1", "role_2", "1.2.3.4:80"),
+            encode_directory_message(MESSAGE_HEARTBEAT, "node_1", "role_1", "1.2.3.4:80"),
+            encode_trigger_message("node_1", 1.5),
+        ]
+        for data in messages:
+            for length in range(len(data)):
+                with pytest.raises(ValueError):
+                    decode_message(data[:length])